@@ -27,6 +27,49 @@ class SeuratOptionsPropertyGroup(bpy.types.PropertyGroup):
         description='Number of unique view groups used by seurat'
     )
 
+    camera_sampler: bpy.props.EnumProperty(
+        items=[('HAMMERSLEY', 'Hammersley', 'Hammersley point set, the point set used by Seurat'),
+               ('HALTON', 'Scrambled Halton', 'Halton sequence with scrambled digits'),
+               ('SOBOL', 'Sobol', 'Sobol sequence, lowest discrepancy at power of two view group counts'),
+               ('JITTER', 'Stratified jitter', 'Random positions in the cells of a regular grid')],
+        name='Camera sampler',
+        default='HAMMERSLEY',
+        description='Point set used to place the view groups inside the capture box'
+    )
+
+    camera_placement: bpy.props.EnumProperty(
+        items=[('GEOMETRIC', 'Geometric', 'Use the configured number of view groups, spread evenly through the capture box'),
+               ('COVERAGE', 'Coverage', 'Pick the view groups that see the most of the scene, at most the configured number')],
+        name='Camera placement',
+        default='GEOMETRIC',
+        description='How the view group positions are chosen'
+    )
+
+    coverage_candidates: bpy.props.IntProperty(
+        name='Candidates',
+        default=256,
+        min=2,
+        max=4096,
+        description='Number of candidate positions evaluated by coverage placement'
+    )
+
+    coverage_probes: bpy.props.IntProperty(
+        name='Probe rays',
+        default=512,
+        min=16,
+        max=16384,
+        description='Number of visibility rays cast from every candidate position'
+    )
+
+    coverage_min_gain: bpy.props.FloatProperty(
+        name='Minimum gain',
+        default=0.005,
+        min=0.0,
+        max=1.0,
+        subtype='FACTOR',
+        description='Stop adding view groups when the next one adds less than this fraction of the seen surface'
+    )
+
     image_resolution: bpy.props.EnumProperty(
         items=[('256', '256', 'TODO'),
                ('512', '512', 'TODO'),
@@ -39,6 +82,78 @@ class SeuratOptionsPropertyGroup(bpy.types.PropertyGroup):
         description='Seurat image resolution in [px]'
     )
 
+    capture_mode: bpy.props.EnumProperty(
+        items=[('FACES', 'Per face', 'Render every cube face in a separate render job'),
+               ('MULTIVIEW', 'Multi-view', 'Render all six cube faces of a view group in a single multi-view render job')],
+        name='Capture mode',
+        default='FACES',
+        description='How the cube faces of a view group are rendered'
+    )
+
+    capture_workers: bpy.props.IntProperty(
+        name='Capture workers',
+        default=2,
+        min=1,
+        description='Number of background Blender processes used for distributed capturing'
+    )
+
+    capture_worker_retries: bpy.props.IntProperty(
+        name='Worker retries',
+        default=1,
+        min=0,
+        description='Number of times a failed capture worker is restarted'
+    )
+
+    write_queue_depth: bpy.props.IntProperty(
+        name='Write queue',
+        default=0,
+        min=0,
+        max=64,
+        description='Number of captured faces that are moved to the output path in the background while the next faces render, 0 writes directly to the output path. Use it for slow or network storage, every queued face needs space in the staging directory (about 1.3 GB at 8192 px)'
+    )
+
+    staging_path: bpy.props.StringProperty(
+        name='Staging path',
+        default="",
+        subtype='DIR_PATH',
+        description='Local directory the images are written to before they are moved to the output path, the system temporary directory when empty'
+    )
+
+    exr_packing: bpy.props.EnumProperty(
+        items=[('SEPARATE', 'Separate', 'Write color and depth to separate OpenEXR images'),
+               ('MULTILAYER', 'Multilayer', 'Write color and depth as layers of a single multilayer OpenEXR image')],
+        name='Image packing',
+        default='SEPARATE',
+        description='How the color and depth of a face are stored'
+    )
+
+    exr_codec: bpy.props.EnumProperty(
+        items=[('NONE', 'None', 'No compression'),
+               ('ZIP', 'ZIP', 'Lossless, compresses 16 scanlines at a time'),
+               ('ZIPS', 'ZIPS', 'Lossless, compresses single scanlines'),
+               ('PIZ', 'PIZ', 'Lossless wavelet compression, good for noisy images'),
+               ('DWAA', 'DWAA', 'Lossy, only used for color, depth is stored with ZIP')],
+        name='Codec',
+        default='ZIP',
+        description='OpenEXR compression of the captured images'
+    )
+
+    color_precision: bpy.props.EnumProperty(
+        items=[('HALF', 'Half', 'Store color as 16 bit half floats'),
+               ('FULL', 'Full', 'Store color as 32 bit floats')],
+        name='Color precision',
+        default='FULL',
+        description='Float precision of the captured color, multilayer images always use full floats'
+    )
+
+    depth_format: bpy.props.EnumProperty(
+        items=[('SINGLE', 'Single channel', 'Store depth as a single 32 bit float channel where supported'),
+               ('RGBA', 'RGBA', 'Store depth in every channel of an RGBA image')],
+        name='Depth format',
+        default='SINGLE',
+        description='Channels of the captured depth images, only used for separate images'
+    )
+
     near_clip: bpy.props.FloatProperty(
         name='Clip Start',
         default=0.01,
@@ -71,6 +186,142 @@ class SeuratOptionsPropertyGroup(bpy.types.PropertyGroup):
         description='Seurat command flags used for processing'
     )
 
+    seurat_pipeline_path: bpy.props.StringProperty(
+        name='Seurat pipeline path',
+        default="",
+        subtype='FILE_PATH',
+        description='Path of the Seurat pipeline binary, the binary bundled with the addon is used when empty'
+    )
+
+    processing_queue_path: bpy.props.StringProperty(
+        name='Processing queue path',
+        default="//SeuratQueue/",
+        subtype='DIR_PATH',
+        description='Directory the processing queue state and the log of every queued job are stored in'
+    )
+
+    processing_memory_budget: bpy.props.FloatProperty(
+        name='Queue memory budget',
+        default=0.0,
+        min=0.0,
+        description='Memory in GB the queued pipeline jobs running at the same time may use together, 0 uses 80% of the physical memory'
+    )
+
+    processing_core_budget: bpy.props.IntProperty(
+        name='Queue core budget',
+        default=0,
+        min=0,
+        description='CPU cores the queued pipeline jobs running at the same time may use together, 0 uses every core'
+    )
+
+    processing_job_cores: bpy.props.IntProperty(
+        name='Cores per job',
+        default=4,
+        min=1,
+        description='CPU cores counted for every queued pipeline job'
+    )
+
+    import_processed_output: bpy.props.BoolProperty(
+        name='Import processed output',
+        default=False,
+        description='Import the Seurat mesh and texture after processing finished'
+    )
+
+    change_aware_capture: bpy.props.BoolProperty(
+        name='Change-aware capture',
+        default=False,
+        description='Only capture faces again when an object in their view changed, instead of every face after any scene edit. Shadows and reflections of objects outside a face are not tracked'
+    )
+
+    face_skipping: bpy.props.EnumProperty(
+        items=[('OFF', 'Off', 'Render every face at full resolution'),
+               ('EMPTY', 'Empty faces', 'Write faces that see only the background without rendering them'),
+               ('EMPTY_SPARSE', 'Empty and sparse faces', 'Also render faces that see little geometry at half resolution')],
+        name='Face skipping',
+        default='OFF',
+        description='Skip or downscale cube faces that see little or no geometry, decided with probe rays before rendering'
+    )
+
+    sparse_face_threshold: bpy.props.FloatProperty(
+        name='Sparse threshold',
+        default=0.05,
+        min=0.0,
+        max=1.0,
+        subtype='FACTOR',
+        description='Faces where less than this fraction of the probe rays hit geometry are sparse'
+    )
+
+    face_probe_resolution: bpy.props.IntProperty(
+        name='Probe resolution',
+        default=32,
+        min=4,
+        max=256,
+        description='Number of probe rays along each side of a face, thin geometry can be missed at low resolutions'
+    )
+
+    preview_view_groups: bpy.props.EnumProperty(
+        items=[('2', '2', 'Capture 2 view groups, the fastest preview'),
+               ('4', '4', 'Capture 4 view groups'),
+               ('8', '8', 'Capture 8 view groups'),
+               ('16', '16', 'Capture 16 view groups, close to a full capture')],
+        name='Preview view groups',
+        default='4',
+        description='Number of view groups captured for a preview'
+    )
+
+    preview_resolution: bpy.props.EnumProperty(
+        items=[('256', '256', 'Render 256x256 px images, the fastest preview'),
+               ('512', '512', 'Render 512x512 px images'),
+               ('1024', '1024', 'Render 1024x1024 px images, shows texture detail')],
+        name='Preview resolution',
+        default='256',
+        description='Image resolution of a preview capture in [px]'
+    )
+
+    preview_samples: bpy.props.IntProperty(
+        name='Preview samples',
+        default=16,
+        min=1,
+        description='Render samples of a preview capture, denoising is turned off'
+    )
+
+    preview_output_path: bpy.props.StringProperty(
+        name='Preview output path',
+        default="//SeuratPreview/",
+        subtype='DIR_PATH',
+        description='Directory preview capture data and meshes will be exported to'
+    )
+
+    preview_process: bpy.props.BoolProperty(
+        name='Process preview',
+        default=True,
+        description='Process and import the preview capture with a small texture and triangle count'
+    )
+
+    manifest_compact: bpy.props.BoolProperty(
+        name='Compact manifest',
+        default=False,
+        description='Write the manifest without indentation, this makes it a lot smaller'
+    )
+
+    persistent_render_session: bpy.props.BoolProperty(
+        name='Persistent render session',
+        default=True,
+        description='Keep the scene loaded in the renderer between the renders of a capture and compile Eevee shaders before the first face'
+    )
+
+    write_trace: bpy.props.BoolProperty(
+        name='Write stage trace',
+        default=True,
+        description='Write the time, memory use and written bytes of every capture and processing stage next to the manifest, as a Chrome trace and a CSV summary'
+    )
+
+    check_capture_box_on_move: bpy.props.BoolProperty(
+        name='Check box on move',
+        default=True,
+        description='Check the capture box for intersecting geometry whenever it is moved or scaled'
+    )
+
 class SeuratAddonPreferences(bpy.types.AddonPreferences):
     bl_idname = __name__
 
@@ -80,6 +331,7 @@ class SeuratAddonPreferences(bpy.types.AddonPreferences):
         row = layout.row()
         col = row.column()
         col.prop(context.scene.seurat_options, "seurat_command_flags", text="Seurat command flags")
+        col.prop(context.scene.seurat_options, "seurat_pipeline_path", text="Seurat pipeline path")
 
 # classes = (
 #     SeuratOptionsPropertyGroup
@@ -93,11 +345,19 @@ def register():
     # Register properties
     from bpy.utils import register_class
     from . import capture
+    from . import distributed
     from . import interface
     from . import processing
+    from . import intersection
+    from . import preview
+    from . import processing_queue
 
     capture.register()
+    distributed.register()
     processing.register()
+    intersection.register()
+    preview.register()
+    processing_queue.register()
     interface.register()
     
     register_class(SeuratAddonPreferences)
@@ -111,11 +371,19 @@ def unregister():
     # Register properties
     from bpy.utils import unregister_class
     from . import capture
+    from . import distributed
     from . import interface
     from . import processing
+    from . import intersection
+    from . import preview
+    from . import processing_queue
 
     capture.unregister()
+    distributed.unregister()
     processing.unregister()
+    intersection.unregister()
+    preview.unregister()
+    processing_queue.unregister()
     interface.unregister()
 
     unregister_class(SeuratAddonPreferences)
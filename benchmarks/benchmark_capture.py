@@ -0,0 +1,364 @@
+"""Measures the capture throughput on procedurally built scenes.
+
+Builds scenes from a few objects up to 100k instances around a capture box
+and times capturing them with fixed settings on CPU Cycles and Eevee, along
+with camera position generation, the capture box intersection check and
+manifest writing. Every run is appended to a JSON history file and compared
+with an earlier run. Runs inside Blender:
+
+    blender -b --factory-startup --python benchmarks/benchmark_capture.py -- \\
+        --history capture_history.json --label "my change"
+
+Pass --scenes and --engines to run a part of the suite, Eevee needs a GPU.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import timeit
+import argparse
+import tempfile
+import importlib
+import subprocess
+import bmesh
+import bpy
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The repository is imported as the addon package, so it has to be on the
+# module search path by its directory name
+sys.path.insert(0, os.path.dirname(REPOSITORY_PATH))
+addon = importlib.import_module(os.path.basename(REPOSITORY_PATH))
+math_functions = importlib.import_module(addon.__name__ + ".math_functions")
+intersection = importlib.import_module(addon.__name__ + ".intersection")
+manifest = importlib.import_module(addon.__name__ + ".manifest")
+tracing = importlib.import_module(addon.__name__ + ".tracing")
+
+# Scene names and their number of instances, every scene is built with the
+# same seed so runs measure the same geometry
+SCENES = [
+    ('few_objects', 8),
+    ('hundreds', 500),
+    ('thousands', 10000),
+    ('large', 100000)
+]
+
+# Render engines benchmarked by default, EEVEE is resolved to the engine name
+# of the running Blender version
+ENGINES = ['CYCLES', 'EEVEE']
+EEVEE_ENGINE_NAMES = ['BLENDER_EEVEE', 'BLENDER_EEVEE_NEXT']
+
+# Capture settings used for every run, changing them makes runs incomparable
+CAPTURE_SETTINGS = {
+    'view_groups': '4',
+    'image_resolution': '256',
+    'camera_placement': 'GEOMETRIC',
+    'camera_sampler': 'HAMMERSLEY',
+    'capture_mode': 'FACES',
+    'face_skipping': 'OFF',
+    'write_trace': True
+}
+RENDER_SAMPLES = 16
+
+# Camera counts timed for generate_camera_positions and view groups written
+# to the benchmark manifest
+CAMERA_POSITION_COUNTS = [16, 1024, 100000]
+MANIFEST_VIEW_GROUPS = 1024
+
+# Instances are placed in a shell around the unit capture box
+INSTANCE_RADIUS_MIN = 3.0
+INSTANCE_RADIUS_MAX = 30.0
+SEED = 1
+
+# Changes above this fraction are marked in the comparison report
+REGRESSION_THRESHOLD = 0.1
+
+
+def parse_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="blender -b --python benchmarks/benchmark_capture.py --")
+    parser.add_argument("--scenes", nargs='+', choices=[name for name, _ in SCENES],
+                        default=[name for name, _ in SCENES])
+    parser.add_argument("--engines", nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument("--history", default="capture_benchmark_history.json",
+                        help="JSON file the results are appended to")
+    parser.add_argument("--label", default="", help="Description of the measured code, e.g. a branch name")
+    parser.add_argument("--baseline", help="Label of the run to compare with, the last comparable run by default")
+    return parser.parse_args(argv)
+
+
+def register_addon():
+    # An enabled copy of the addon already registered the operators
+    if not hasattr(bpy.types.Scene, 'seurat_options'):
+        addon.register()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPOSITORY_PATH,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def clear_scene(scene):
+    for obj in list(scene.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for mesh in list(bpy.data.meshes):
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+
+def add_mesh_object(scene, name, mesh, material, location=(0.0, 0.0, 0.0)):
+    mesh.materials.append(material)
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = location
+    scene.collection.objects.link(obj)
+    return obj
+
+
+def build_scene(scene, instance_count):
+    """Builds a benchmark scene around a capture box at the origin.
+    The instances are ico spheres on the vertices of a point cloud, so even
+    the largest scene is created in seconds.
+    """
+    clear_scene(scene)
+    generator = random.Random(SEED)
+
+    material = bpy.data.materials.get("BenchmarkMaterial") or bpy.data.materials.new("BenchmarkMaterial")
+    material.diffuse_color = (0.8, 0.5, 0.3, 1.0)
+
+    ground = bpy.data.meshes.new("BenchmarkGround")
+    size = INSTANCE_RADIUS_MAX
+    ground.from_pydata([(-size, -size, -2.0), (size, -size, -2.0), (size, size, -2.0), (-size, size, -2.0)],
+                       [], [(0, 1, 2, 3)])
+    add_mesh_object(scene, "BenchmarkGround", ground, material)
+
+    points = bpy.data.meshes.new("BenchmarkPoints")
+    vertices = []
+    while len(vertices) < instance_count:
+        vertex = [generator.uniform(-INSTANCE_RADIUS_MAX, INSTANCE_RADIUS_MAX) for _ in range(3)]
+        if INSTANCE_RADIUS_MIN <= sum(value * value for value in vertex) ** 0.5 <= INSTANCE_RADIUS_MAX:
+            vertices.append(vertex)
+    points.from_pydata(vertices, [], [])
+    instancer = bpy.data.objects.new("BenchmarkInstancer", points)
+    instancer.instance_type = 'VERTS'
+    scene.collection.objects.link(instancer)
+
+    sphere = bpy.data.meshes.new("BenchmarkSphere")
+    sphere_bmesh = bmesh.new()
+    bmesh.ops.create_icosphere(sphere_bmesh, subdivisions=2, radius=0.3)
+    sphere_bmesh.to_mesh(sphere)
+    sphere_bmesh.free()
+    add_mesh_object(scene, "BenchmarkSphere", sphere, material).parent = instancer
+
+    sun = bpy.data.objects.new("BenchmarkSun", bpy.data.lights.new("BenchmarkSun", 'SUN'))
+    sun.rotation_euler = (0.6, 0.2, 0.8)
+    scene.collection.objects.link(sun)
+
+    if scene.world is None:
+        scene.world = bpy.data.worlds.new("BenchmarkWorld")
+    scene.world.color = (0.05, 0.05, 0.08)
+
+    bpy.ops.seurat.create_capture_box()
+    scene.objects["SeuratCaptureBox"].location = (0.0, 0.0, 0.0)
+    scene.objects["SeuratCaptureBox"].scale = (1.0, 1.0, 1.0)
+
+
+def set_engine(scene, engine):
+    """Switches the render engine and its sample count.
+    Returns:
+      False if the engine isn't available.
+    """
+    names = EEVEE_ENGINE_NAMES if engine == 'EEVEE' else [engine]
+    for name in names:
+        try:
+            scene.render.engine = name
+        except TypeError:
+            continue
+
+        if name == 'CYCLES':
+            scene.cycles.device = 'CPU'
+            scene.cycles.samples = RENDER_SAMPLES
+            scene.cycles.use_denoising = False
+        else:
+            scene.eevee.taa_render_samples = RENDER_SAMPLES
+        return True
+    return False
+
+
+def trace_stage_seconds(output_path, stage):
+    # The capture trace summary has the total time of every stage
+    summary_path = os.path.join(output_path, tracing.SUMMARY_FILE_PATTERN % 'capture')
+    if not os.path.exists(summary_path):
+        return None
+    with open(summary_path, 'r', newline='') as summary_file:
+        for row in csv.DictReader(summary_file):
+            if row['stage'] == stage and row['category'] == 'stage':
+                return float(row['total_seconds'])
+    return None
+
+
+def time_capture():
+    """Captures the scene into a temporary directory.
+    Returns:
+      A dict with the total and render seconds, or None if capturing failed.
+    """
+    output_path = os.path.join(tempfile.mkdtemp(prefix="seurat_benchmark_"), "")
+    try:
+        start_time = time.perf_counter()
+        try:
+            result = bpy.ops.seurat.capture_data(output_path=output_path)
+        except RuntimeError as error:
+            print(error)
+            return None
+        seconds = time.perf_counter() - start_time
+
+        if 'FINISHED' not in result:
+            return None
+        return {'total': seconds, 'render': trace_stage_seconds(output_path, 'render')}
+    finally:
+        shutil.rmtree(output_path, ignore_errors=True)
+
+
+def benchmark_scene(scene, instance_count, engines):
+    results = {'instances': instance_count}
+
+    start_time = time.perf_counter()
+    build_scene(scene, instance_count)
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    results['build'] = time.perf_counter() - start_time
+
+    capture_box = scene.objects["SeuratCaptureBox"]
+    objects, _, seconds = intersection.find_intersecting_objects(depsgraph, capture_box.location, capture_box.scale)
+    if objects:
+        print(f"Benchmark scene intersects the capture box: {objects}")
+    results['check_for_intersections'] = seconds
+
+    for engine in engines:
+        if not set_engine(scene, engine):
+            print(f"{engine} isn't available in this Blender version")
+            continue
+
+        print(f"Capturing {instance_count} instances with {scene.render.engine}")
+        capture = time_capture()
+        if capture is None:
+            print(f"Capturing with {engine} failed, see the output above")
+            continue
+        results[f'capture_{engine}'] = capture['total']
+        if capture['render'] is not None:
+            results[f'capture_{engine}_render'] = capture['render']
+    return results
+
+
+def benchmark_camera_positions():
+    results = {}
+    for count in CAMERA_POSITION_COUNTS:
+        number = max(1, 20000 // count)
+        seconds = min(timeit.repeat(
+            lambda: math_functions.generate_camera_positions([-1.0] * 3, [1.0] * 3, count),
+            number=number, repeat=3)) / number
+        results[f'generate_camera_positions_{count}'] = seconds
+    return results
+
+
+def benchmark_manifest():
+    results = {}
+    positions = math_functions.generate_camera_positions([-1.0] * 3, [1.0] * 3, MANIFEST_VIEW_GROUPS)
+    directory = tempfile.mkdtemp(prefix="seurat_benchmark_")
+    try:
+        for compact in (False, True):
+            start_time = time.perf_counter()
+            writer = manifest.ManifestWriter(
+                os.path.join(directory, manifest.MANIFEST_FILE_NAME), [0.0, 0.0, 0.0], 1024, 0.1, 100.0,
+                'EYE_Z', '%(face)s_color.%(index)04d.exr', '%(face)s_depth.%(index)04d.exr', compact=compact)
+            for index, position in enumerate(positions):
+                writer.write_view_group(index, position)
+            writer.close()
+            key = 'compact' if compact else 'indented'
+            results[f'write_{MANIFEST_VIEW_GROUPS}_view_groups_{key}'] = time.perf_counter() - start_time
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def flatten(results):
+    # Metrics are compared as "<group>/<metric>" keys
+    return {f"{group}/{name}": value for group, metrics in results.items()
+            for name, value in metrics.items() if name != 'instances'}
+
+
+def find_baseline(history, run, label):
+    for previous in reversed(history):
+        if label is not None:
+            if previous['label'] == label:
+                return previous
+        elif (previous['blender_version'] == run['blender_version'] and
+              previous['platform'] == run['platform'] and previous['settings'] == run['settings']):
+            return previous
+    return None
+
+
+def print_comparison(baseline, run):
+    if baseline is None:
+        print("No earlier comparable run in the history, nothing to compare")
+        return
+
+    print(f"Compared with {baseline['label'] or 'unlabeled run'} ({baseline['git_revision']}, {baseline['time']}):")
+    print(f"  {'Metric':<58}{'Baseline [s]':>14}{'Current [s]':>14}{'Change':>10}")
+    baseline_metrics = flatten(baseline['results'])
+    for name, seconds in flatten(run['results']).items():
+        previous = baseline_metrics.get(name)
+        if previous is None:
+            print(f"  {name:<58}{'-':>14}{seconds:>14.4f}")
+            continue
+
+        change = (seconds - previous) / previous if previous else 0.0
+        marker = "  slower" if change > REGRESSION_THRESHOLD else "  faster" if change < -REGRESSION_THRESHOLD else ""
+        print(f"  {name:<58}{previous:>14.4f}{seconds:>14.4f}{change:>+10.1%}{marker}")
+
+
+def main():
+    args = parse_arguments()
+    register_addon()
+
+    scene = bpy.context.scene
+    for name, value in CAPTURE_SETTINGS.items():
+        setattr(scene.seurat_options, name, value)
+
+    run = {
+        'label': args.label,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'git_revision': git_revision(),
+        'blender_version': bpy.app.version_string,
+        'platform': sys.platform,
+        'settings': dict(CAPTURE_SETTINGS, render_samples=RENDER_SAMPLES),
+        'results': {
+            'camera_positions': benchmark_camera_positions(),
+            'manifest': benchmark_manifest()
+        }
+    }
+
+    for name, instance_count in SCENES:
+        if name in args.scenes:
+            run['results'][name] = benchmark_scene(scene, instance_count, args.engines)
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history, 'r') as history_file:
+            history = json.load(history_file)
+
+    print_comparison(find_baseline(history, run, args.baseline), run)
+
+    history.append(run)
+    with open(args.history, 'w') as history_file:
+        json.dump(history, history_file, indent=2)
+    print(f"Appended the results to {args.history}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
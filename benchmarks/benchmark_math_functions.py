@@ -0,0 +1,75 @@
+"""Compares the pure Python and NumPy camera position code paths.
+
+Runs with any Python that has NumPy installed, Blender isn't needed:
+
+    python benchmarks/benchmark_math_functions.py
+"""
+import os
+import sys
+import timeit
+
+# math_functions doesn't depend on Blender, so it's imported directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math_functions as mf  # noqa: E402
+
+CAMERA_COUNTS = [2, 16, 64, 1024, 16384, 100000]
+
+HEADBOX_MIN = [1.0, 1.0, 1.0]
+HEADBOX_MAX = [-1.0, -1.0, -1.0]
+
+
+def python_path(num_cameras):
+    positions = mf.generate_camera_positions_python(HEADBOX_MIN, HEADBOX_MAX, num_cameras)
+    headbox_center = mf.point_in_a_box(HEADBOX_MIN, HEADBOX_MAX, [0.5, 0.5, 0.5])
+    distances = [mf.distance(position, headbox_center) for position in positions]
+
+    matrices = []
+    for position in positions:
+        for face in mf.CUBE_FACES:
+            matrix = mf.world_eye_matrix_from_face(face)
+            for i in range(3):
+                matrix[4 * i + 3] = position[i] - headbox_center[i]
+            matrices.append(matrix)
+    return positions, distances, matrices
+
+
+def numpy_path(num_cameras):
+    positions, distances = mf.camera_position_arrays(HEADBOX_MIN, HEADBOX_MAX, num_cameras)
+    headbox_center = mf.point_in_a_box(HEADBOX_MIN, HEADBOX_MAX, [0.5, 0.5, 0.5])
+    matrices = mf.world_eye_matrices(positions, headbox_center)
+    return positions, distances, matrices
+
+
+def best_time(function, num_cameras):
+    # Repeat small sizes so the timer resolution doesn't matter
+    number = max(1, 20000 // num_cameras)
+    return min(timeit.repeat(lambda: function(num_cameras), number=number, repeat=3)) / number
+
+
+def main():
+    if mf.numpy is None:
+        print("NumPy is not installed, only the pure Python path is available")
+        return 1
+
+    numpy = mf.numpy
+    print(f"{'Cameras':>8}{'Python [ms]':>14}{'NumPy [ms]':>13}{'Speedup':>10}{'Max diff':>12}")
+    for num_cameras in CAMERA_COUNTS:
+        python_positions, python_distances, python_matrices = python_path(num_cameras)
+        numpy_positions, numpy_distances, numpy_matrices = numpy_path(num_cameras)
+
+        # Both paths must produce the same cameras in the same order
+        max_difference = max(
+            numpy.abs(numpy_positions - numpy.array(python_positions)).max(),
+            numpy.abs(numpy_distances - numpy.array(python_distances)).max(),
+            numpy.abs(numpy_matrices.reshape(-1, 16) - numpy.array(python_matrices)).max())
+
+        python_time = best_time(python_path, num_cameras)
+        numpy_time = best_time(numpy_path, num_cameras)
+        print(f"{num_cameras:>8}{python_time * 1000:>14.3f}{numpy_time * 1000:>13.3f}"
+              f"{python_time / numpy_time:>9.1f}x{max_difference:>12.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Compares the radical inverse implementations and the camera samplers.
+
+Prints a radical inverse microbenchmark, the generation time of every sampler
+and the discrepancy/coverage of the camera positions they produce, so the
+sampler that needs the fewest view groups can be picked. Needs NumPy:
+
+    python benchmarks/benchmark_samplers.py
+"""
+import os
+import sys
+import timeit
+
+# math_functions doesn't depend on Blender, so it's imported directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math_functions as mf  # noqa: E402
+
+RADICAL_INVERSE_COUNT = 100000
+GENERATION_COUNTS = [64, 1024, 100000]
+QUALITY_COUNTS = [8, 16, 32, 64, 128]
+
+# Random probe points used to estimate the coverage of the unit cube
+COVERAGE_PROBES = 20000
+
+UNIT_BOX_MIN = [0.0, 0.0, 0.0]
+UNIT_BOX_MAX = [1.0, 1.0, 1.0]
+
+
+def float_radical_inverse(a, base):
+    # The float division implementation radical_inverse used to have, kept
+    # for comparison. It loops until |a| underflows to zero
+    digit = 1.0 / float(base)
+    radical = digit
+    inverse = 0.0
+    while a > 0:
+        inverse += digit * float(a % base)
+        digit *= radical
+        a /= base
+    return inverse
+
+
+def digit_loop_radical_inverse(a, base):
+    # Exact integer digit reversal, one digit per iteration
+    reversed_digits = 0
+    base_n = 1
+    while a > 0:
+        reversed_digits = reversed_digits * base + a % base
+        base_n *= base
+        a //= base
+    return reversed_digits / base_n
+
+
+def time_call(function, number=1):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def centered_discrepancy(points):
+    """Centered L2 discrepancy (Hickernell) of points in the unit cube, lower is better"""
+    numpy = mf.numpy
+    n, d = points.shape
+    centered = numpy.abs(points - 0.5)
+
+    first = (13.0 / 12.0) ** d
+    second = 2.0 / n * numpy.prod(1.0 + 0.5 * centered - 0.5 * centered ** 2, axis=1).sum()
+
+    pairwise = numpy.abs(points[:, numpy.newaxis, :] - points[numpy.newaxis, :, :])
+    third = numpy.prod(1.0 + 0.5 * centered[:, numpy.newaxis, :] + 0.5 * centered[numpy.newaxis, :, :]
+                       - 0.5 * pairwise, axis=2).sum() / n ** 2
+    return numpy.sqrt(first - second + third)
+
+
+def coverage(points, probes):
+    """Mean and maximum distance from a probe point to the nearest camera"""
+    numpy = mf.numpy
+    nearest = numpy.full(len(probes), numpy.inf)
+    for point in points:
+        nearest = numpy.minimum(nearest, numpy.sqrt(((probes - point) ** 2).sum(axis=1)))
+    return nearest.mean(), nearest.max()
+
+
+def main():
+    if mf.numpy is None:
+        print("NumPy is not installed")
+        return 1
+    numpy = mf.numpy
+
+    print(f"Radical inverse of {RADICAL_INVERSE_COUNT} indices (bases 2 and 3):")
+    indices = range(RADICAL_INVERSE_COUNT)
+    implementations = [
+        ('float division (old)', float_radical_inverse),
+        ('integer digit loop', digit_loop_radical_inverse),
+        ('table driven', mf.radical_inverse)
+    ]
+    for name, function in implementations:
+        seconds = time_call(lambda: [function(i, base) for base in (2, 3) for i in indices])
+        print(f"  {name:<22}{seconds * 1000:>10.1f} ms")
+    seconds = time_call(lambda: [mf.radical_inverse_array(numpy.arange(RADICAL_INVERSE_COUNT), base) for base in (2, 3)])
+    print(f"  {'table driven (NumPy)':<22}{seconds * 1000:>10.1f} ms")
+
+    print()
+    print("Sampler generation time [ms]:")
+    print(f"  {'Sampler':<12}" + "".join(f"{'Python ' + str(n):>16}{'NumPy ' + str(n):>16}" for n in GENERATION_COUNTS))
+    for sampler in mf.SAMPLERS:
+        row = f"  {sampler:<12}"
+        for n in GENERATION_COUNTS:
+            python_time = time_call(lambda: mf.SAMPLERS[sampler](n))
+            numpy_time = time_call(lambda: mf.SAMPLER_ARRAYS[sampler](n))
+            row += f"{python_time * 1000:>16.2f}{numpy_time * 1000:>16.2f}"
+        print(row)
+
+    print()
+    print("Camera position quality in a unit headbox (discrepancy / mean / max probe distance, lower is better):")
+    probes = numpy.random.default_rng(0).random((COVERAGE_PROBES, 3))
+    print(f"  {'Sampler':<12}" + "".join(f"{n:>26}" for n in QUALITY_COUNTS))
+    for sampler in mf.SAMPLERS:
+        row = f"  {sampler:<12}"
+        for n in QUALITY_COUNTS:
+            positions, distances = mf.camera_position_arrays(UNIT_BOX_MIN, UNIT_BOX_MAX, n, sampler)
+            mean_distance, max_distance = coverage(positions, probes)
+            row += f"{centered_discrepancy(positions):>10.4f} /{mean_distance:>6.3f} /{max_distance:>6.3f}"
+        print(row)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
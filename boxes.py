@@ -0,0 +1,65 @@
+import os
+import bpy
+from . import math_functions
+
+
+# Name of the capture box created by earlier versions, it's still found
+# without the tag
+CAPTURE_BOX_NAME = "SeuratCaptureBox"
+
+# Custom property that marks an empty as a capture box
+CAPTURE_BOX_PROPERTY = "seurat_capture_box"
+
+# Empties in a collection with this name are capture boxes as well
+CAPTURE_BOX_COLLECTION = "Seurat Capture Boxes"
+
+
+def is_capture_box(obj):
+    """Checks if an object is a capture box, by tag, collection or name"""
+    if obj is None or obj.type != 'EMPTY':
+        return False
+    if obj.get(CAPTURE_BOX_PROPERTY) or obj.name == CAPTURE_BOX_NAME:
+        return True
+    return any(collection.name == CAPTURE_BOX_COLLECTION for collection in obj.users_collection)
+
+
+def scene_boxes(scene):
+    """Returns the capture boxes of a scene sorted by name"""
+    return sorted((obj for obj in scene.objects if is_capture_box(obj)), key=lambda obj: obj.name)
+
+
+def find_capture_box(context, name=""):
+    """Finds the capture box a single capture uses.
+    Args:
+      name: Name of the capture box, empty picks the active object if it's a
+        capture box and otherwise the first capture box by name.
+    Returns:
+      The capture box object, or None if the scene has no matching box.
+    """
+    scene = context.scene
+    if name:
+        capture_box = scene.objects.get(name)
+        return capture_box if is_capture_box(capture_box) else None
+
+    active_object = context.view_layer.objects.active
+    if is_capture_box(active_object):
+        return active_object
+
+    capture_boxes = scene_boxes(scene)
+    return capture_boxes[0] if capture_boxes else None
+
+
+def capture_order(capture_boxes):
+    """Orders capture boxes so every box is followed by the closest remaining one.
+    Neighbouring boxes see mostly the same objects, so the renderer's synced
+    scene, textures and shaders are reused by the next box.
+    Returns:
+      The capture boxes in capture order.
+    """
+    order = math_functions.nearest_neighbor_order([list(obj.location) for obj in capture_boxes])
+    return [capture_boxes[index] for index in order]
+
+
+def box_output_path(output_path, capture_box):
+    """Returns the output directory of a capture box in a batch capture, ending with a separator"""
+    return os.path.join(output_path, bpy.path.clean_name(capture_box.name), "")
@@ -1,28 +1,364 @@
 import bpy
 import os
-import json
-import operator
+import time
+import shutil
 from . import math_functions
-from mathutils import Vector
+from . import journal
+from . import exr
+from . import intersection
+from . import boxes
+from . import manifest
+from . import coverage
+from . import tracing
+from . import output_pool
+from . import scene_changes
+from mathutils import Euler, Vector
+
+
+# Cube map faces in the order they are rendered and written to the manifest
+FACES = ['front', 'back', 'left', 'right', 'bottom', 'top']
+
+# Camera rotation (XYZ euler) used to render each cube map face
+FACE_ROTATIONS = {
+    'front': (1.5707963267948966, 0, 0),
+    'back': (1.5707963267948966, 0, 3.141592653589793),
+    'left': (1.5707963267948966, 0, 1.5707963267948966),
+    'right': (1.5707963267948966, 0, -1.5707963267948966),
+    'bottom': (0, 0, 0),
+    'top': (3.141592653589793, 0, 0)
+}
+
+# World space view direction of each cube map face, the cameras look down their -Z axis
+FACE_DIRECTIONS = {face: Euler(rotation).to_matrix() @ Vector((0.0, 0.0, -1.0))
+                   for face, rotation in FACE_ROTATIONS.items()}
+
+# Names of the captured images, formatted with the face name and view group index
+# The view group index is written by Blender as the frame number
+COLOR_FILE_PATTERN = '%(face)s_color.%(index)04d.exr'
+DEPTH_FILE_PATTERN = '%(face)s_depth.%(index)04d.exr'
+
+# Multi-view renders have the view suffix appended after the frame number
+MULTIVIEW_COLOR_FILE_PATTERN = 'color.%(index)04d_%(face)s.exr'
+MULTIVIEW_DEPTH_FILE_PATTERN = 'depth.%(index)04d_%(face)s.exr'
+
+# Packed multilayer images contain a 'color' and a 'depth' layer
+PACKED_FILE_PATTERN = '%(face)s_rgbd.%(index)04d.exr'
+MULTIVIEW_PACKED_FILE_PATTERN = 'rgbd.%(index)04d_%(face)s.exr'
+
+# OpenEXR codecs offered for the captured images, lossy codecs are never
+# used for depth
+EXR_CODECS = ['NONE', 'ZIP', 'ZIPS', 'PIZ', 'DWAA']
+LOSSY_EXR_CODECS = {'DWAA'}
+LOSSLESS_FALLBACK_CODEC = 'ZIP'
+
+# OpenEXR color depth of the color precision options
+COLOR_PRECISION_DEPTHS = {'HALF': '16', 'FULL': '32'}
+
+# Channels that can hold the depth, Blender writes depth as RGBA in single
+# layer files, single channel depth is written as 'V'
+DEPTH_CHANNEL_CANDIDATES = ['R', 'V', 'Y', 'Z']
+
+# Printed after every view group, distributed capture parses it for progress
+VIEW_GROUP_CAPTURED_MESSAGE = "Seurat view group %04d captured"
+
+# Camera and file name suffix of each face's view in multi-view capture mode
+MULTIVIEW_SUFFIX = "_%s"
+
+# Faces that see no geometry are written as small constant images instead of
+# being rendered, sparse faces are rendered at a fraction of the resolution
+SYNTHETIC_FACE_RESOLUTION = 64
+SYNTHETIC_FACE_COMMENT = "Seurat synthetic empty face"
+SPARSE_FACE_DIVISOR = 2
+
+# Resolution of the throwaway render that compiles the Eevee shaders before
+# capturing, shader compilation doesn't depend on the resolution
+WARM_UP_RESOLUTION = 32
+
+# Progress of the running capture, shown in the Seurat panel
+capture_progress = {
+    'running': False,
+    'done': 0,
+    'total': 0,
+    'status': "",
+    # The capture box being captured when capturing all boxes
+    'batch': ""
+}
+
+# Functions called with capture_progress whenever it changes, e.g. by the
+# command line interface
+progress_listeners = []
+
+
+class CaptureProgress:
+    """Tracks the captured faces and the render time per face of a capture run"""
+
+    def __init__(self, total_faces):
+        self.total_faces = total_faces
+        self.done_faces = 0
+        self.rendered_faces = 0
+        self.render_time = 0.0
+        self.synthetic_faces = 0
+        self.reused_faces = 0
+        self.downscaled_faces = 0
+        self.downscaled_time = 0.0
+        # The first render loads the scene into the renderer, later renders
+        # reuse it with a persistent render session
+        self.cold_faces = 0
+        self.cold_time = 0.0
+        self.warm_up_time = 0.0
+        self.start_time = time.perf_counter()
+        self.render_start_time = self.start_time
+
+        capture_progress.update(running=True, done=0, total=total_faces,
+                                status="Starting capture")
+        self.notify()
+
+    def skip(self, faces):
+        # Faces that are already captured count as done without render time
+        self.done_faces += faces
+        capture_progress['done'] = self.done_faces
+        self.notify()
+
+    def reuse(self, faces):
+        # Faces captured by an earlier run count as done without render time
+        self.reused_faces += faces
+        self.skip(faces)
+
+    def synthetic(self, faces):
+        # Faces written without rendering count as done without render time
+        self.synthetic_faces += faces
+        self.skip(faces)
+
+    def start_render(self):
+        self.render_start_time = time.perf_counter()
+
+    def finish_render(self, faces, description, downscaled=False):
+        render_time = time.perf_counter() - self.render_start_time
+        if not self.rendered_faces:
+            self.cold_faces = faces
+            self.cold_time = render_time
+        self.render_time += render_time
+        self.rendered_faces += faces
+        self.done_faces += faces
+
+        if downscaled:
+            self.downscaled_faces += faces
+            self.downscaled_time += render_time
+
+        # The ETA is based on the average render time of the rendered faces,
+        # the slower first render is left out once there are others
+        remaining_time = self.face_render_time() * (self.total_faces - self.done_faces)
+
+        status = (f"Captured {self.done_faces}/{self.total_faces} faces, "
+                  f"{description} took {render_time / faces:.2f} s per face, "
+                  f"ETA {time.strftime('%H:%M:%S', time.gmtime(remaining_time))}")
+        print(status)
+
+        capture_progress.update(done=self.done_faces, status=status)
+        self.notify()
+
+    def face_render_time(self):
+        warm_faces = self.rendered_faces - self.cold_faces
+        if warm_faces:
+            return (self.render_time - self.cold_time) / warm_faces
+        return self.render_time / self.rendered_faces
+
+    def render_timing_summary(self):
+        """Compares the first (cold) render with the following (warm) renders"""
+        if not self.rendered_faces:
+            return "No faces were rendered"
+
+        summary = f"First render took {self.cold_time / self.cold_faces:.2f} s per face"
+        warm_faces = self.rendered_faces - self.cold_faces
+        if warm_faces:
+            summary += (f", the other {warm_faces} face(s) took "
+                        f"{(self.render_time - self.cold_time) / warm_faces:.2f} s per face on average")
+        if self.warm_up_time:
+            summary += f", shader warm-up took {self.warm_up_time:.2f} s"
+        return summary
+
+    def notify(self):
+        for listener in progress_listeners:
+            listener(capture_progress)
+
+    def face_skipping_summary(self):
+        """Describes the renders saved by skipping and downscaling faces"""
+        summary = (f"{self.synthetic_faces} empty face(s) weren't rendered, "
+                   f"{self.downscaled_faces} sparse face(s) were rendered at reduced resolution")
+
+        # Saved time is estimated from the faces rendered at full resolution
+        full_faces = self.rendered_faces - self.downscaled_faces
+        if full_faces:
+            full_face_time = (self.render_time - self.downscaled_time) / full_faces
+            saved_time = (self.synthetic_faces + self.downscaled_faces) * full_face_time - self.downscaled_time
+            summary += f", saving about {saved_time:.1f} s"
+        return summary
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+
+def batch_capture_summary(box_reports, elapsed):
+    """Describes the result and timing of every capture box of a batch capture.
+    Args:
+      box_reports: A list of dicts with the 'name', 'result' and 'time' of every
+        box, finished boxes have their 'faces', 'reused', 'rendered' and
+        'render_time' as well.
+      elapsed: Wall time of the whole batch in seconds.
+    """
+    finished = [box_report for box_report in box_reports if 'FINISHED' in box_report['result']]
+    lines = [f"Captured {len(finished)}/{len(box_reports)} capture box(es) in {elapsed:.1f} s"]
+
+    for box_report in box_reports:
+        if 'FINISHED' not in box_report['result']:
+            lines.append(f"  {box_report['name']}: failed after {box_report['time']:.1f} s")
+            continue
+
+        line = (f"  {box_report['name']}: {box_report['faces']} faces, {box_report['reused']} reused, "
+                f"{box_report['rendered']} rendered in {box_report['time']:.1f} s")
+        if box_report['rendered']:
+            line += f" ({box_report['render_time'] / box_report['rendered']:.2f} s per rendered face)"
+        lines.append(line)
+
+    faces = sum(box_report['faces'] for box_report in finished)
+    rendered = sum(box_report['rendered'] for box_report in finished)
+    render_time = sum(box_report['render_time'] for box_report in finished)
+    lines.append(f"  Total: {faces} faces, {rendered} rendered in {render_time:.1f} s of render time, "
+                 f"{elapsed - render_time:.1f} s spent outside of renders")
+    return "\n".join(lines)
+
+
+def background_color(scene):
+    """Returns the RGBA color of the background if it's uniform.
+    Returns:
+      A tuple of 4 floats, or None if the world uses a texture or a node setup
+      that can't be evaluated without rendering.
+    """
+    if scene.render.film_transparent:
+        return (0.0, 0.0, 0.0, 0.0)
+
+    world = scene.world
+    if world is None:
+        return (0.0, 0.0, 0.0, 1.0)
+    if not world.use_nodes:
+        return tuple(world.color) + (1.0,)
+
+    # Only a single Background node with unlinked inputs is uniform
+    output_node = next((node for node in world.node_tree.nodes
+                        if node.type == 'OUTPUT_WORLD' and node.is_active_output), None)
+    if output_node is None or not output_node.inputs['Surface'].is_linked:
+        return (0.0, 0.0, 0.0, 1.0)
+
+    background_node = output_node.inputs['Surface'].links[0].from_node
+    if background_node.type != 'BACKGROUND':
+        return None
+    color_input = background_node.inputs['Color']
+    strength_input = background_node.inputs['Strength']
+    if color_input.is_linked or strength_input.is_linked:
+        return None
+
+    strength = strength_input.default_value
+    return tuple(channel * strength for channel in color_input.default_value[:3]) + (1.0,)
+
+
+class FaceClassifier:
+    """Classifies cube faces as 'EMPTY', 'SPARSE' or 'FULL' with probe rays"""
+
+    def __init__(self, depsgraph, scene, opt):
+        self.tree = coverage.scene_tree(depsgraph)
+        self.far_clip = opt.far_clip
+        self.resolution = opt.face_probe_resolution
+        self.sparse_threshold = opt.sparse_face_threshold if opt.face_skipping == 'EMPTY_SPARSE' else 0.0
+        self.rotations = {face: Euler(FACE_ROTATIONS[face]).to_matrix() for face in FACES}
+
+        # Empty faces can only be written without rendering if the background
+        # color is known
+        self.background = background_color(scene)
+        if self.background is None:
+            print("The world background isn't a uniform color, empty faces are rendered")
+
+    def classify(self, position, face):
+        if self.tree is None:
+            fill = 0.0
+        else:
+            fill = coverage.face_fill(self.tree, position, self.rotations[face],
+                                      self.far_clip, self.resolution)
+
+        if fill == 0.0 and self.background is not None:
+            return 'EMPTY'
+        if fill < self.sparse_threshold:
+            return 'SPARSE'
+        return 'FULL'
+
+
+def write_synthetic_face(file_paths, use_packed_exr, background, far_clip):
+    """Writes the images of a face that sees only the background.
+    The depth images contain every channel name a rendered depth image can
+    use, so the channel names in the manifest are valid for both.
+    """
+    color_channels = dict(zip(['R', 'G', 'B', 'A'], background))
+    depth_channels = {channel: far_clip for channel in DEPTH_CHANNEL_CANDIDATES}
+
+    if use_packed_exr:
+        channels = {'color.' + name: value for name, value in color_channels.items()}
+        channels.update({'depth.' + name: value for name, value in depth_channels.items()})
+        images = [(file_paths[0], channels)]
+    else:
+        images = [(file_paths[0], color_channels), (file_paths[1], depth_channels)]
+
+    for file_path, channels in images:
+        exr.write_constant_image(file_path, SYNTHETIC_FACE_RESOLUTION, SYNTHETIC_FACE_RESOLUTION,
+                                 channels, comments=SYNTHETIC_FACE_COMMENT)
+
+
+def headbox_bounds(capture_box):
+    """Returns the corners of the headbox of a capture box as two lists of 3 floats"""
+    # Get capture box transforms
+    capture_box_location = capture_box.location
+    capture_box_scale = capture_box.scale
+
+    headbox_min = [capture_box_scale[0] + capture_box_location[0], capture_box_scale[1] +
+                   capture_box_location[1], capture_box_scale[2] + capture_box_location[2]]
+    headbox_max = [-capture_box_scale[0] + capture_box_location[0], -capture_box_scale[1] +
+                   capture_box_location[1], -capture_box_scale[2] + capture_box_location[2]]
+    return headbox_min, headbox_max
+
+
+def generate_view_group_positions(context, headbox_min, headbox_max):
+    """Generates the view group positions with the placement set in the Seurat options.
+    Coverage placement picks at most the configured number of view groups
+    from a larger set of candidates, based on what they see of the scene.
+    """
+    opt = context.scene.seurat_options
+    view_groups = int(opt.view_groups)
+
+    if opt.camera_placement != 'COVERAGE':
+        return math_functions.generate_camera_positions(
+            headbox_min, headbox_max, view_groups, opt.camera_sampler)
+
+    positions, report = coverage.select_camera_positions(
+        context.evaluated_depsgraph_get(), headbox_min, headbox_max, view_groups,
+        opt.coverage_candidates, opt.coverage_probes, opt.coverage_min_gain,
+        opt.far_clip, opt.camera_sampler)
+
+    print(f"Coverage placement picked {len(positions)} of {report['candidates']} candidate view groups, "
+          f"they see {report['coverage'] * 100:.1f}% of the surface seen by all candidates "
+          f"({report['time']:.2f} s)")
+    return positions
 
 
 class SEURAT_OT_create_capture_box(bpy.types.Operator):
-    """Create a capture box (Box empty), this will be used to generate the camera positions"""
+    """Create a capture box (Box empty) at the 3D cursor, this will be used to generate the camera positions"""
     bl_idname = "seurat.create_capture_box"
     bl_label = "Create Seurat capture box"
 
     def execute(self, context):
         scn = context.scene
 
-        # Check to see if a capture box exists before adding one
-        capture_box_exists = scn.objects.get("SeuratCaptureBox")
-
-        if capture_box_exists is not None:
-            print("Seurat capture box already present inside scene")
-            return {'CANCELLED'}
-
-        # Create empty to serve as capture box
-        seurat_capture_box = bpy.data.objects.new("SeuratCaptureBox", None)
+        # Create empty to serve as capture box, further boxes get a numbered name
+        seurat_capture_box = bpy.data.objects.new(boxes.CAPTURE_BOX_NAME, None)
+        seurat_capture_box[boxes.CAPTURE_BOX_PROPERTY] = True
+        seurat_capture_box.location = scn.cursor.location
 
         # Change empty display type to cube
         seurat_capture_box.empty_display_type = 'CUBE'
@@ -42,42 +378,197 @@ class SEURAT_OT_capture_data(bpy.types.Operator):
     bl_idname = "seurat.capture_data"
     bl_label = "Capture Seurat data"
 
+    # Used to capture a part of the view groups, e.g. by distributed capture workers
+    view_group_start: bpy.props.IntProperty(
+        name='First view group',
+        default=0,
+        min=0,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description='Index of the first view group to capture'
+    )
+
+    view_group_count: bpy.props.IntProperty(
+        name='View group count',
+        default=-1,
+        min=-1,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description='Number of view groups to capture, -1 captures all remaining view groups'
+    )
+
+    output_path: bpy.props.StringProperty(
+        name='Output path',
+        default="",
+        subtype='DIR_PATH',
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description='Overrides the capture output path when set'
+    )
+
+    capture_box: bpy.props.StringProperty(
+        name='Capture box',
+        default="",
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description='Name of the capture box to capture, empty uses the active or the first capture box'
+    )
+
+    all_boxes: bpy.props.BoolProperty(
+        name='All capture boxes',
+        default=False,
+        options={'SKIP_SAVE'},
+        description='Capture every capture box of the scene in one session, each to its own folder in the output path'
+    )
+
     def execute(self, context):
+        # Run every capture step without returning control to the UI
+        capture_steps = self.capture_steps(context)
+        try:
+            while True:
+                next(capture_steps)
+        except StopIteration as stop:
+            return stop.value
+
+    def invoke(self, context, event):
+        # Capture one render per timer event, the UI stays responsive
+        self.capture_steps_generator = self.capture_steps(context)
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            # Closing the generator runs its cleanup, user settings are restored
+            self.capture_steps_generator.close()
+            self.finish_modal(context)
+            self.report({'WARNING'}, "Capturing cancelled")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            next(self.capture_steps_generator)
+        except StopIteration as stop:
+            self.finish_modal(context)
+            return stop.value
+        except Exception:
+            self.finish_modal(context)
+            raise
+
+        self.report({'INFO'}, capture_progress['status'])
+        self.redraw_panels(context)
+        return {'RUNNING_MODAL'}
+
+    def finish_modal(self, context):
+        # capture_steps resets the progress, only the timer and the panels are
+        # handled here
+        context.window_manager.event_timer_remove(self.timer)
+        self.redraw_panels(context)
+
+    def redraw_panels(self, context):
+        # The progress is shown in the Seurat panel of every 3D viewport
+        for window in context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+
+    def capture_steps(self, context):
+        # Generator that yields after every render, the return value is the
+        # result of the operator
+        opt = context.scene.seurat_options
+        output_path = self.output_path or opt.capture_output_path
+
+        # Eevee compiles its shaders once per session, not once per box
+        self.shaders_compiled = False
+
+        # The progress is reset however capturing ends, also when execute
+        # runs the steps or they raise or are closed
+        try:
+            if self.all_boxes:
+                return (yield from self.batch_capture_steps(context, output_path))
+
+            # Get the Seurat capture box from the scene
+            seurat_capture_box = boxes.find_capture_box(context, self.capture_box)
+
+            # If there's no capture box this will end the operator
+            if seurat_capture_box is None:
+                print("Seurat capture box not found")
+                return {'CANCELLED'}
+
+            return (yield from self.box_capture_steps(context, seurat_capture_box, output_path))
+        finally:
+            capture_progress['running'] = False
+            capture_progress['batch'] = ""
+
+    def batch_capture_steps(self, context, output_path):
+        # Captures every capture box to its own folder in one session
         scn = context.scene
-        mf = math_functions
         opt = scn.seurat_options
 
-        # Get Seurat capture box transforms and store it as headbox_min and headbox_max
+        capture_boxes = boxes.capture_order(boxes.scene_boxes(scn))
+        if not capture_boxes:
+            print("Seurat capture box not found")
+            return {'CANCELLED'}
 
-        # Get the Seurat capture box from the scene
-        seurat_capture_box = scn.objects.get("SeuratCaptureBox")
+        print(f"Capturing {len(capture_boxes)} capture box(es) in this order: "
+              f"{', '.join(capture_box.name for capture_box in capture_boxes)}")
 
-        # If there's no capture box this will end the operator
-        if seurat_capture_box is None:
-            print("Seurat capture box not found")
+        # The renderer keeps the synced scene from one box to the next, the
+        # capture of a box restores the setting it found
+        use_persistent_data = scn.render.use_persistent_data
+        if opt.persistent_render_session:
+            scn.render.use_persistent_data = True
+
+        start_time = time.perf_counter()
+        box_reports = []
+        try:
+            for box_index, capture_box in enumerate(capture_boxes):
+                capture_progress['batch'] = f"Capture box {box_index + 1}/{len(capture_boxes)}: {capture_box.name}"
+                print(capture_progress['batch'])
+
+                box_report = {'name': capture_box.name}
+                box_start_time = time.perf_counter()
+                result = yield from self.box_capture_steps(
+                    context, capture_box, boxes.box_output_path(output_path, capture_box), box_report)
+                box_report.update(result=result, time=time.perf_counter() - box_start_time)
+                box_reports.append(box_report)
+        finally:
+            scn.render.use_persistent_data = use_persistent_data
+
+        print(batch_capture_summary(box_reports, time.perf_counter() - start_time))
+
+        failed_boxes = [box_report['name'] for box_report in box_reports if 'FINISHED' not in box_report['result']]
+        if failed_boxes:
+            self.report({'ERROR'}, f"Capturing failed for {', '.join(failed_boxes)}, see the system console")
             return {'CANCELLED'}
 
-        # Get capture box transforms
-        capture_box_location = seurat_capture_box.location
-        capture_box_scale = seurat_capture_box.scale
+        self.report({'INFO'}, f"Captured {len(box_reports)} capture box(es) in {time.perf_counter() - start_time:.1f} s")
+        return {'FINISHED'}
+
+    def box_capture_steps(self, context, seurat_capture_box, output_path, box_report=None):
+        # Captures one capture box, box_report is filled with the face counts
+        # of a successful capture
+        scn = context.scene
+        mf = math_functions
+        opt = scn.seurat_options
 
         # Store the headbox data
-        headbox_min = [capture_box_scale[0] + capture_box_location[0], capture_box_scale[1] +
-                       capture_box_location[1], capture_box_scale[2] + capture_box_location[2]]
-        headbox_max = [-capture_box_scale[0] + capture_box_location[0], -capture_box_scale[1] +
-                       capture_box_location[1], -capture_box_scale[2] + capture_box_location[2]]
+        headbox_min, headbox_max = headbox_bounds(seurat_capture_box)
 
+        # Wall time, memory and written bytes of every stage are written next
+        # to the manifest
+        tracer = tracing.Tracer('capture', tracing.run_metadata(scn), opt.write_trace)
 
         # Check if the capturing box intersects with any meshes
         # Capturing will be aborted if there are any intersections
-        if self.check_for_intersections(context, capture_box_location, capture_box_scale):
-            return {'CANCELLED'}
+        with tracer.stage('intersection check'):
+            if self.check_for_intersections(context, seurat_capture_box):
+                return {'CANCELLED'}
 
         # Calculate the camera positions used for capturing
-        view_groups = int(opt.view_groups)
-
-        camera_positions = mf.generate_camera_positions(
-            headbox_min, headbox_max, view_groups)
+        with tracer.stage('camera positions'):
+            camera_positions = generate_view_group_positions(context, headbox_min, headbox_max)
 
         # Store variables, they will be used to restore the following:
         # - Render resolution and percentage
@@ -87,139 +578,515 @@ class SEURAT_OT_capture_data(bpy.types.Operator):
         render_resolution_y = scn.render.resolution_y
         resolution_percentage = scn.render.resolution_percentage
         active_camera = scn.camera
+        frame_current = scn.frame_current
+        use_persistent_data = scn.render.use_persistent_data
 
         # Get variables for rendering
         near_clip = opt.near_clip
         far_clip = opt.far_clip
-        output_path = opt.capture_output_path
         image_resolution = int(opt.image_resolution)
 
-        # Prepare the scene for rendering
-        self.render_preparation(context, image_resolution)
-        self.compositor_setup(context, output_path)
-
-        # Create a render loop
-        for view_group_index, position in enumerate(camera_positions):
-
-            for face in ['front', 'back', 'left', 'right', 'bottom', 'top']:
-                # Render image
-                self.render_color_and_depth(context, face, position,
-                                            output_path, near_clip, far_clip)
-
-                # Blender forcibly adds a frame number to renders
-                # This function corrects the name
-                self.rename_renders(
-                    context, view_group_index, face, output_path)
+        # Only capture the requested view groups, indices stay global
+        first_view_group = self.view_group_start
+        if self.view_group_count < 0:
+            camera_positions = camera_positions[first_view_group:]
+        else:
+            camera_positions = camera_positions[first_view_group:
+                                                first_view_group + self.view_group_count]
 
-        # Restore user settings
-        scn.render.resolution_x = render_resolution_x
-        scn.render.resolution_y = render_resolution_y
-        scn.render.resolution_percentage = resolution_percentage
-        scn.camera = active_camera
-
-        # Write JSON manifest
-        headbox_center = mf.point_in_a_box(
-            headbox_min, headbox_max, [0.5, 0.5, 0.5])
         absolute_output_path = bpy.path.abspath(output_path)
+        os.makedirs(absolute_output_path, exist_ok=True)
+
+        # Everything below is undone in the finally block, also when the
+        # setup itself fails
+        pool = None
+        compositor_state = None
+        capture_journal = None
+        capture_rig = None
+        capture_cameras = {}
+        manifest_writer = None
+        multiview_state = None
+
+        try:
+            # With a write queue the compositor writes to a local staging
+            # directory, the images are moved to the output path in the background
+            compositor_output_path = output_path
+            if opt.write_queue_depth > 0:
+                pool = output_pool.OutputPool(opt.write_queue_depth, bpy.path.abspath(opt.staging_path), tracer)
+                compositor_output_path = pool.staging_path
+
+            # Prepare the scene for rendering
+            with tracer.stage('scene preparation'):
+                self.render_preparation(context, image_resolution)
+                use_packed_exr = opt.exr_packing == 'MULTILAYER'
+                compositor_state = self.compositor_setup(context, compositor_output_path, opt)
+
+            # Faces that were already captured with the same inputs are skipped,
+            # the hash covers the render settings and the evaluated scene
+            tracer.begin('fingerprint')
+            capture_journal = journal.CaptureJournal(absolute_output_path)
+            render_fingerprint = {
+                'image_resolution': image_resolution,
+                'near_clip': near_clip,
+                'far_clip': far_clip,
+                'image_format': [opt.exr_packing, opt.exr_codec, opt.color_precision, opt.depth_format],
+                'face_skipping': [opt.face_skipping, opt.sparse_face_threshold, opt.face_probe_resolution],
+                'render_settings': journal.render_settings_fingerprint(scn, context.view_layer)
+            }
+
+            # Change-aware captures hash the objects in the frustum of every face
+            # instead of the whole scene, so a scene edit only invalidates the
+            # faces that see it. Lights and the world still affect every face
+            scene_objects = None
+            if opt.change_aware_capture:
+                scene_objects = scene_changes.SceneObjects(context.evaluated_depsgraph_get(), far_clip)
+                render_fingerprint['scene'] = scene_objects.global_hash
+
+                changed_objects = capture_journal.changed_objects(scene_objects.hashes)
+                if changed_objects is not None:
+                    listed_objects = ", ".join(changed_objects[:10]) + (", ..." if len(changed_objects) > 10 else "")
+                    print(f"{len(changed_objects)} object(s) changed since the last capture: {listed_objects}")
+                capture_journal.objects = scene_objects.hashes
+            else:
+                render_fingerprint['scene'] = journal.scene_fingerprint(context.evaluated_depsgraph_get())
+
+            expected_hashes = {}
+            for view_group_index, position in enumerate(camera_positions, first_view_group):
+                if scene_objects is None:
+                    expected_hashes[view_group_index] = {
+                        face: journal.face_hash(position, face, render_fingerprint) for face in FACES}
+                    continue
+
+                face_objects = scene_objects.face_objects(position, FACE_DIRECTIONS, near_clip, far_clip)
+                expected_hashes[view_group_index] = {}
+                for face in FACES:
+                    capture_journal.record_frustum(face, view_group_index, face_objects[face])
+                    visible_objects = [[name, scene_objects.hashes[name]] for name in face_objects[face]]
+                    expected_hashes[view_group_index][face] = journal.face_hash(
+                        position, face, render_fingerprint, visible_objects)
+            tracer.end('fingerprint')
+
+            # The capture rig is created once and moved for every view group
+            capture_rig, capture_cameras = self.create_capture_rig(
+                context, near_clip, far_clip)
+
+            # Multi-view capture renders all six faces of a view group in one
+            # render job, this shares scene sync between the faces
+            use_multiview = opt.capture_mode == 'MULTIVIEW'
+
+            # Color and depth image name patterns, packed images contain both
+            if use_packed_exr and use_multiview:
+                file_patterns = (MULTIVIEW_PACKED_FILE_PATTERN, MULTIVIEW_PACKED_FILE_PATTERN)
+            elif use_packed_exr:
+                file_patterns = (PACKED_FILE_PATTERN, PACKED_FILE_PATTERN)
+            elif use_multiview:
+                file_patterns = (MULTIVIEW_COLOR_FILE_PATTERN, MULTIVIEW_DEPTH_FILE_PATTERN)
+            else:
+                file_patterns = (COLOR_FILE_PATTERN, DEPTH_FILE_PATTERN)
+
+            # Progress is counted in faces, skipped faces count as done
+            progress = CaptureProgress(len(camera_positions) * len(FACES))
+
+            # View groups are written to the manifest as soon as all their faces
+            # are captured, the channel names are read from the first images
+            headbox_center = mf.point_in_a_box(
+                headbox_min, headbox_max, [0.5, 0.5, 0.5])
+            manifest_writer = manifest.ManifestWriter(
+                manifest.manifest_path(absolute_output_path), headbox_center, image_resolution,
+                near_clip, far_clip, depth_type='EYE_Z',
+                color_file_path_pattern=file_patterns[0], depth_file_path_pattern=file_patterns[1],
+                compact=opt.manifest_compact)
+            layers = ('color', 'depth') if use_packed_exr else ('', '')
+            channel_names_found = False
+            # View groups are written in capture order once their images are
+            # written, the last ones can still be in the write queue
+            awaiting_view_groups = []
+
+            # Faces that see no geometry aren't rendered, this is decided with
+            # probe rays against the evaluated scene
+            face_classifier = None
+            if opt.face_skipping != 'OFF':
+                with tracer.stage('face classifier setup'):
+                    face_classifier = FaceClassifier(context.evaluated_depsgraph_get(), scn, opt)
+
+            # Keep the synced scene in the renderer between renders, only the
+            # moved cameras are synced again. Eevee compiles its shaders during the
+            # first render, which is done at a small resolution before the first face
+            warm_up_pending = False
+            if opt.persistent_render_session:
+                scn.render.use_persistent_data = True
+                warm_up_pending = scn.render.engine.startswith('BLENDER_EEVEE') and not self.shaders_compiled
+
+            tracer.install_handlers()
+
+            if use_multiview:
+                multiview_state = self.multiview_setup(
+                    context, capture_cameras)
+                if multiview_state is None:
+                    return {'CANCELLED'}
+
+            # Create a render loop
+            for view_group_index, position in enumerate(camera_positions, first_view_group):
+
+                face_hashes = expected_hashes[view_group_index]
+
+                # Find the faces that still have to be rendered
+                missing_faces = [face for face in FACES if not capture_journal.is_captured(
+                    face, view_group_index, face_hashes[face],
+                    self.capture_file_paths(absolute_output_path, file_patterns, face, view_group_index))]
+
+                if not missing_faces:
+                    print(f"View group {view_group_index} already captured, skipping")
+                    progress.reuse(len(FACES))
+                else:
+                    progress.reuse(len(FACES) - len(missing_faces))
+                    if warm_up_pending:
+                        with tracer.stage('shader warm-up'):
+                            progress.warm_up_time = self.warm_up_render(
+                                context, capture_rig, capture_cameras, compositor_state, position)
+                        warm_up_pending = False
+                        self.shaders_compiled = True
+                        yield
+                    yield from self.render_view_group(
+                        context, capture_rig, capture_cameras, compositor_state, capture_journal,
+                        absolute_output_path, file_patterns, view_group_index, position,
+                        face_hashes, missing_faces, use_multiview, progress, tracer, face_classifier, pool)
+
+                if pool is not None:
+                    self.record_written_faces(pool.collect(), capture_journal, absolute_output_path, file_patterns)
+
+                awaiting_view_groups.append((view_group_index, position))
+                channel_names_found = self.write_captured_view_groups(
+                    manifest_writer, awaiting_view_groups, capture_journal, expected_hashes, pool,
+                    absolute_output_path, file_patterns, image_resolution, face_classifier is not None,
+                    layers, channel_names_found, tracer)
+
+            if pool is not None:
+                with tracer.stage('write wait'):
+                    self.record_written_faces(pool.drain(), capture_journal, absolute_output_path, file_patterns)
+                self.write_captured_view_groups(
+                    manifest_writer, awaiting_view_groups, capture_journal, expected_hashes, pool,
+                    absolute_output_path, file_patterns, image_resolution, face_classifier is not None,
+                    layers, channel_names_found, tracer)
+        finally:
+            # Restore user settings, even if rendering failed or was cancelled
+            tracer.begin('restore')
+            if pool is not None:
+                # Images moved before a cancel are kept for resuming
+                written_faces = pool.close()
+                if written_faces:
+                    self.record_written_faces(written_faces, capture_journal, absolute_output_path, file_patterns)
+                print(f"Capturing waited {pool.wait_time:.1f} s for the write queue")
+            if manifest_writer is not None:
+                manifest_writer.close()
+            scn.render.resolution_x = render_resolution_x
+            scn.render.resolution_y = render_resolution_y
+            scn.render.resolution_percentage = resolution_percentage
+            scn.camera = active_camera
+            scn.frame_current = frame_current
+            scn.render.use_persistent_data = use_persistent_data
+
+            if multiview_state is not None:
+                self.multiview_restore(context, multiview_state)
+
+            if compositor_state is not None:
+                self.compositor_restore(context, compositor_state)
+
+            # Remove the capture rig and its camera data
+            if capture_rig is not None:
+                self.remove_capture_rig(capture_rig, capture_cameras)
+            tracer.end('restore')
+
+            try:
+                tracer.write(absolute_output_path)
+            except OSError as error:
+                print(f"Could not write the capture trace: {error}")
+
+        # The journal tells if every view group was captured, a resumed
+        # capture results in the same manifest as an uninterrupted one
+        captured_view_groups = capture_journal.captured_view_groups(expected_hashes)
+        if len(captured_view_groups) != len(expected_hashes):
+            self.report({'ERROR'}, f"{len(expected_hashes) - len(captured_view_groups)} view group(s) are missing images, see the system console")
+            return {'CANCELLED'}
 
         print(absolute_output_path)
 
-        view_groups = self.create_view_groups(headbox_center, camera_positions, image_resolution, near_clip, far_clip,  depth_type='EYE_Z',
-                                              depth_channel_name='R', color_file_path_pattern='%s_color.%04d.exr', depth_file_path_pattern='%s_depth.%04d.exr')
-        json_string = json.dumps({'view_groups': view_groups}, indent=2)
-        with open((absolute_output_path + "manifest.json"), 'w') as json_file:
-            json_file.write(json_string)
+        print(f"{progress.reused_faces} face(s) reused from earlier captures, "
+              f"{progress.total_faces - progress.reused_faces} captured")
+        print(progress.render_timing_summary())
+        if face_classifier is not None:
+            print(progress.face_skipping_summary())
 
+        print(f"Capturing finished in {progress.elapsed():.1f} s")
+        if box_report is not None:
+            box_report.update(faces=progress.total_faces, reused=progress.reused_faces,
+                              rendered=progress.rendered_faces, render_time=progress.render_time)
         return {'FINISHED'}
 
-    def check_for_intersections(self, context, capture_box_location, capture_box_scale):
-        
-
-        loc = capture_box_location
-        sca = capture_box_scale
-
-        # Rays used for the check
-        rays = [
-            [loc, (loc[0] + sca[0],
-                   loc[1], loc[2])],
-            [loc, (loc[0] - sca[0],
-                   loc[1], loc[2])],
-            [loc, (loc[0], loc[1] +
-                   sca[1], loc[2])],
-            [loc, (loc[0], loc[1] -
-                   sca[1], loc[2])],
-            [loc, (loc[0], loc[1],
-                   loc[2] + sca[2])],
-            [loc, (loc[0], loc[1], loc[2] - sca[2])], 
-
-            [(loc[0] - sca[0], loc[1] - sca[1], loc[2] - sca[2]),
-             (loc[0] - sca[0], loc[1] - sca[1], loc[2] + sca[2])],
-            [(loc[0] + sca[0], loc[1] - sca[1], loc[2] - sca[2]),
-             (loc[0] + sca[0], loc[1] - sca[1], loc[2] + sca[2])],
-            [(loc[0] - sca[0], loc[1] + sca[1], loc[2] - sca[2]),
-             (loc[0] - sca[0], loc[1] + sca[1], loc[2] + sca[2])],
-            [(loc[0] + sca[0], loc[1] + sca[1], loc[2] - sca[2]),
-             (loc[0] + sca[0], loc[1] + sca[1], loc[2] + sca[2])],
-
-            [(loc[0] - sca[0], loc[1] - sca[1], loc[2] - sca[2]),
-             (loc[0] + sca[0], loc[1] - sca[1], loc[2] - sca[2])],
-            [(loc[0] - sca[0], loc[1] + sca[1], loc[2] - sca[2]),
-             (loc[0] + sca[0], loc[1] + sca[1], loc[2] - sca[2])],
-            [(loc[0] + sca[0], loc[1] + sca[1], loc[2] - sca[2]),
-             (loc[0] + sca[0], loc[1] - sca[1], loc[2] - sca[2])],
-            [(loc[0] + sca[0], loc[1] - sca[1], loc[2] - sca[2]),
-             (loc[0] + sca[0], loc[1] + sca[1], loc[2] - sca[2])],
-
-            [(loc[0] - sca[0], loc[1] - sca[1], loc[2] + sca[2]),
-             (loc[0] + sca[0], loc[1] - sca[1], loc[2] + sca[2])],
-            [(loc[0] - sca[0], loc[1] + sca[1], loc[2] + sca[2]),
-             (loc[0] + sca[0], loc[1] + sca[1], loc[2] + sca[2])],
-            [(loc[0] + sca[0], loc[1] + sca[1], loc[2] + sca[2]),
-             (loc[0] + sca[0], loc[1] - sca[1], loc[2] + sca[2])],
-            [(loc[0] + sca[0], loc[1] - sca[1], loc[2] + sca[2]), 
-            (loc[0] + sca[0], loc[1] + sca[1], loc[2] + sca[2])]
-            
-        ]
-        
-        # Loop through all of the rays
-        for ray in rays:
-            a = Vector(ray[0])
-            b = Vector(ray[1])
-
-            if (2, 90, 0) < bpy.app.version:
-                hit, loc, norm, idx, ob, M = context.scene.ray_cast(
-                    context.view_layer.depsgraph,
-                    a,
-                    (b - a),
-                    distance=(b - a).length,
-                )
-            else:
-                hit, loc, norm, idx, ob, M = context.scene.ray_cast(
-                    context.view_layer,
-                    a,
-                    (b - a),
-                    distance=(b - a).length,
-                )
-            
-            if hit:
-                self.report({'ERROR'}, f"Capturing box intersects with mesh ({ob.name}), make sure the capturing box doesn't intersect with any geometry")
-                return True
+    def render_view_group(self, context, capture_rig, capture_cameras, compositor_state, capture_journal,
+                          absolute_output_path, file_patterns, view_group_index, position,
+                          face_hashes, missing_faces, use_multiview, progress, tracer, face_classifier=None, pool=None):
+        # Renders the missing faces of a view group, yields after every render
+        scn = context.scene
+        opt = scn.seurat_options
+        use_packed_exr = opt.exr_packing == 'MULTILAYER'
+
+        # Move the rig, the cameras are parented to it
+        capture_rig.location = (position[0], position[1], position[2])
+
+        # Blender always adds the frame number to the image names,
+        # using the view group index as frame number gives the final names
+        scn.frame_current = view_group_index
+
+        if use_multiview:
+            # The missing faces are rendered in one job. Views of captured and
+            # empty faces are turned off, sparse faces can't use a different
+            # resolution in the same job
+            empty_faces = []
+            if face_classifier is not None:
+                with tracer.stage('face classification', view_group=view_group_index):
+                    empty_faces = [face for face in missing_faces
+                                   if face_classifier.classify(position, face) == 'EMPTY']
+
+            for face in empty_faces:
+                with tracer.stage('synthetic face', view_group=view_group_index, face=face):
+                    write_synthetic_face(self.capture_file_paths(absolute_output_path, file_patterns, face, view_group_index),
+                                         use_packed_exr, face_classifier.background, opt.far_clip)
+            progress.synthetic(len(empty_faces))
+
+            rendered_faces = [face for face in missing_faces if face not in empty_faces]
+            disabled_faces = [face for face in FACES if face not in rendered_faces]
+
+            try:
+                for face in disabled_faces:
+                    scn.render.views["Seurat_" + face].use = False
+
+                if rendered_faces:
+                    if pool is not None:
+                        with tracer.stage('write wait'):
+                            self.record_written_faces(pool.wait_for_capacity(len(rendered_faces)), capture_journal,
+                                                      absolute_output_path, file_patterns)
+
+                    # Every view picks its own camera from the rig
+                    progress.start_render()
+                    with tracer.stage('render', view_group=view_group_index, faces=len(rendered_faces)):
+                        self.render_color_and_depth(
+                            context, capture_cameras[rendered_faces[0]])
+            finally:
+                for face in disabled_faces:
+                    scn.render.views["Seurat_" + face].use = True
+
+            with tracer.stage('journal', view_group=view_group_index):
+                for face in missing_faces:
+                    if pool is not None and face in rendered_faces:
+                        # Recorded once the images are moved to the output path
+                        self.queue_face_images(pool, absolute_output_path, file_patterns, face,
+                                               view_group_index, position, face_hashes[face])
+                        continue
+                    self.record_capture(capture_journal, absolute_output_path, file_patterns, face,
+                                        view_group_index, position, face_hashes[face])
+
+                capture_journal.save()
+            if rendered_faces:
+                progress.finish_render(len(rendered_faces), f"view group {view_group_index}")
+            yield
+        else:
+            image_resolution = scn.render.resolution_x
+
+            for face in missing_faces:
+                face_class = 'FULL'
+                if face_classifier is not None:
+                    with tracer.stage('face classification', view_group=view_group_index, face=face):
+                        face_class = face_classifier.classify(position, face)
+                file_paths = self.capture_file_paths(absolute_output_path, file_patterns, face, view_group_index)
+
+                if face_class == 'EMPTY':
+                    # Only the background is visible, nothing has to be rendered
+                    with tracer.stage('synthetic face', view_group=view_group_index, face=face):
+                        write_synthetic_face(file_paths, use_packed_exr, face_classifier.background, opt.far_clip)
+                    progress.synthetic(1)
+                else:
+                    # Write the images of this face to their own names
+                    self.set_file_slot_paths(context, compositor_state, face)
+
+                    # Render image, sparse faces at a lower resolution
+                    if face_class == 'SPARSE':
+                        scn.render.resolution_x = image_resolution // SPARSE_FACE_DIVISOR
+                        scn.render.resolution_y = image_resolution // SPARSE_FACE_DIVISOR
+
+                    if pool is not None:
+                        with tracer.stage('write wait'):
+                            self.record_written_faces(pool.wait_for_capacity(), capture_journal,
+                                                      absolute_output_path, file_patterns)
+
+                    progress.start_render()
+                    try:
+                        with tracer.stage('render', view_group=view_group_index, face=face,
+                                          resolution=scn.render.resolution_x):
+                            self.render_color_and_depth(
+                                context, capture_cameras[face])
+                    finally:
+                        scn.render.resolution_x = image_resolution
+                        scn.render.resolution_y = image_resolution
+
+                    progress.finish_render(1, f"{face} face of view group {view_group_index}",
+                                           downscaled=face_class == 'SPARSE')
+
+                with tracer.stage('journal', view_group=view_group_index, face=face):
+                    if pool is not None and face_class != 'EMPTY':
+                        # Recorded once the images are moved to the output path
+                        self.queue_face_images(pool, absolute_output_path, file_patterns, face,
+                                               view_group_index, position, face_hashes[face])
+                    else:
+                        self.record_capture(capture_journal, absolute_output_path, file_patterns, face,
+                                            view_group_index, position, face_hashes[face])
+
+                    capture_journal.save()
+                yield
+
+    def warm_up_render(self, context, capture_rig, capture_cameras, compositor_state, position):
+        """Renders the scene once at a small resolution without writing images.
+        Returns:
+          The time the render took in seconds.
+        """
+        scn = context.scene
+        file_output_node = scn.node_tree.nodes[compositor_state['file_output_node']]
+        resolution = (scn.render.resolution_x, scn.render.resolution_y)
+
+        capture_rig.location = (position[0], position[1], position[2])
+        file_output_node.mute = True
+        scn.render.resolution_x = WARM_UP_RESOLUTION
+        scn.render.resolution_y = WARM_UP_RESOLUTION
+
+        start_time = time.perf_counter()
+        try:
+            self.render_color_and_depth(context, capture_cameras[FACES[0]])
+        finally:
+            file_output_node.mute = False
+            scn.render.resolution_x, scn.render.resolution_y = resolution
+
+        warm_up_time = time.perf_counter() - start_time
+        print(f"Shader warm-up render took {warm_up_time:.2f} s")
+        return warm_up_time
+
+    def queue_face_images(self, pool, absolute_output_path, file_patterns, face, view_group_index, position, face_hash):
+        # The staged images have the same names as the final images
+        staged_paths = self.capture_file_paths(pool.staging_path, file_patterns, face, view_group_index)
+        final_paths = self.capture_file_paths(absolute_output_path, file_patterns, face, view_group_index)
+
+        # Packed images use the same file for color and depth
+        file_moves = list(dict(zip(staged_paths, final_paths)).items())
+        pool.submit(file_moves, {'face': face, 'view_group_index': view_group_index,
+                                 'position': position, 'face_hash': face_hash})
+
+    def record_written_faces(self, written_faces, capture_journal, absolute_output_path, file_patterns):
+        # Faces are recorded in the journal once their images are in the output path
+        for job, error in written_faces:
+            if error is not None:
+                print(error)
+            self.record_capture(capture_journal, absolute_output_path, file_patterns, job['face'],
+                                job['view_group_index'], job['position'], job['face_hash'])
+        if written_faces:
+            capture_journal.save()
+
+    def write_captured_view_groups(self, manifest_writer, awaiting_view_groups, capture_journal, expected_hashes,
+                                   pool, absolute_output_path, file_patterns, image_resolution, read_headers,
+                                   layers, channel_names_found, tracer):
+        """Writes the captured view groups at the front of awaiting_view_groups to the manifest.
+        The manifest keeps the capture order, a view group with images in the
+        write queue holds back the view groups after it.
+        Returns:
+          True once the channel names are read from a rendered image.
+        """
+        while awaiting_view_groups:
+            view_group_index, position = awaiting_view_groups[0]
+            if pool is not None and pool.is_writing(view_group_index):
+                break
+            del awaiting_view_groups[0]
+
+            # Only fully captured view groups are added to the manifest
+            if not capture_journal.captured_view_groups({view_group_index: expected_hashes[view_group_index]}):
+                continue
+
+            # Synthetic images contain all channel names, so the names are
+            # read from the first rendered face
+            tracer.begin('manifest', view_group=view_group_index)
+            image_sizes = self.face_image_sizes(
+                absolute_output_path, file_patterns, view_group_index, image_resolution, read_headers)
+            rendered_face = next((face for face in FACES if face not in image_sizes['synthetic']), None)
+
+            if not channel_names_found and rendered_face is not None:
+                color_path, depth_path = self.capture_file_paths(
+                    absolute_output_path, file_patterns, rendered_face, view_group_index)
+                manifest_writer.color_channel_names = self.find_channel_names(
+                    color_path, layers[0], ['R', 'G', 'B', 'A'])
+                manifest_writer.depth_channel_name = self.find_channel_names(
+                    depth_path, layers[1], [DEPTH_CHANNEL_CANDIDATES])[0]
+                channel_names_found = True
+
+            manifest_writer.write_view_group(view_group_index, position, image_sizes['sizes'])
+            tracer.end('manifest')
+            print(VIEW_GROUP_CAPTURED_MESSAGE % view_group_index)
+        return channel_names_found
+
+    def face_image_sizes(self, absolute_output_path, file_patterns, view_group_index, image_resolution, read_headers):
+        """Finds the resolution of every face of a view group.
+        Returns:
+          A dict with the image size of every face ('sizes') and the set of
+          faces written as synthetic images ('synthetic'). Without face
+          skipping all faces have the configured resolution.
+        """
+        image_sizes = {'sizes': {face: image_resolution for face in FACES}, 'synthetic': set()}
+        if not read_headers:
+            return image_sizes
+
+        for face in FACES:
+            color_path = self.capture_file_paths(absolute_output_path, file_patterns, face, view_group_index)[0]
+            try:
+                header = exr.read_header(color_path)
+            except (OSError, exr.ExrError) as error:
+                print(f"Could not read image size, using the configured size: {error}")
+                continue
+
+            # Captured faces are square
+            image_sizes['sizes'][face] = exr.data_window_size(header)[0]
+            if header.get('comments') == SYNTHETIC_FACE_COMMENT:
+                image_sizes['synthetic'].add(face)
+        return image_sizes
+
+    def check_for_intersections(self, context, capture_box):
+        # Test the whole volume of the box against the evaluated scene
+        objects = intersection.check_capture_box(context.scene, context.evaluated_depsgraph_get(), capture_box)
+
+        if objects:
+            self.report({'ERROR'}, f"Capturing box {capture_box.name} intersects with mesh ({', '.join(objects)}), make sure the capturing box doesn't intersect with any geometry")
+            return True
 
         # Finish
         print("No mesh intersections found, continuing")
         return False
 
-    def compositor_setup(self, context, output_path):
+    def compositor_setup(self, context, output_path, opt):
         # Switch on nodes and get reference
         # Global context required
         scene = bpy.context.scene
+
+        # Store the compositor state so it can be restored after capturing
+        compositor_state = {
+            'use_nodes': scene.use_nodes,
+            'muted_nodes': {},
+            'seurat_nodes': []
+        }
+
         scene.use_nodes = True
 
         tree = bpy.context.scene.node_tree
 
-        # Clear nodes
+        # Mute the user's nodes instead of deleting them, muted file output
+        # nodes don't write any files
         for node in tree.nodes:
-            tree.nodes.remove(node)
+            compositor_state['muted_nodes'][node.name] = node.mute
+            node.mute = True
 
         # Create input image node
         render_layers_node = tree.nodes.new(type='CompositorNodeRLayers')
@@ -227,26 +1094,114 @@ class SEURAT_OT_capture_data(bpy.types.Operator):
 
         # Create output node
         file_output_node = tree.nodes.new('CompositorNodeOutputFile')
-        file_output_node.base_path = output_path
-        file_output_node.format.file_format = 'OPEN_EXR'
-
-        # Create file subpaths
-        file_output_node.layer_slots.new('color#')
-        file_output_node.layer_slots.new('depth#')
+        use_packed_exr = opt.exr_packing == 'MULTILAYER'
+
+        if use_packed_exr:
+            # Multilayer images are written to the base path, the slots
+            # become layers of a single image
+            file_output_node.base_path = output_path + "rgbd.####"
+            file_output_node.format.file_format = 'OPEN_EXR_MULTILAYER'
+
+            # Half floats and lossy codecs would apply to the depth layer as well
+            file_output_node.format.color_depth = '32'
+            if opt.exr_codec in LOSSY_EXR_CODECS:
+                print(f"{opt.exr_codec} is lossy, using {LOSSLESS_FALLBACK_CODEC} for multilayer images")
+                file_output_node.format.exr_codec = LOSSLESS_FALLBACK_CODEC
+            else:
+                file_output_node.format.exr_codec = opt.exr_codec
+        else:
+            file_output_node.base_path = output_path
+            file_output_node.format.file_format = 'OPEN_EXR'
+            file_output_node.format.color_depth = COLOR_PRECISION_DEPTHS[opt.color_precision]
+            file_output_node.format.exr_codec = opt.exr_codec
+
+        file_output_node.format.color_mode = 'RGBA'
+
+        # Write every view of a multi-view render to its own file
+        file_output_node.format.views_format = 'INDIVIDUAL'
+
+        # Create file subpaths, per face renders set their own paths
+        # Multi-view renders have the view suffix added by Blender
+        file_output_node.layer_slots.new('color')
+        file_output_node.layer_slots.new('depth')
+        file_output_node.file_slots[1].path = 'color.####'
+        file_output_node.file_slots[2].path = 'depth.####'
+
+        if not use_packed_exr:
+            # Depth is always stored as full float with a lossless codec,
+            # Seurat only reads a single channel of it
+            depth_format = file_output_node.file_slots[2].format
+            file_output_node.file_slots[2].use_node_format = False
+            depth_format.file_format = 'OPEN_EXR'
+            depth_format.color_depth = '32'
+            depth_format.color_mode = 'BW' if opt.depth_format == 'SINGLE' else 'RGBA'
+            if opt.exr_codec in LOSSY_EXR_CODECS:
+                depth_format.exr_codec = LOSSLESS_FALLBACK_CODEC
+            else:
+                depth_format.exr_codec = opt.exr_codec
 
         # Move file output node
         file_output_node.location = 400, 0
 
         # link nodes
-        # links = tree.links
-        # link = links.new(render_layers_node.outputs[0], file_output_node[1])
-        # link = links.new(render_layers_node.outputs[1], file_output_node[2])
-
         tree.links.new(
             render_layers_node.outputs[0], file_output_node.inputs[1])
         tree.links.new(
             render_layers_node.outputs[2], file_output_node.inputs[2])
 
+        compositor_state['seurat_nodes'] = [render_layers_node.name, file_output_node.name]
+        compositor_state['file_output_node'] = file_output_node.name
+        compositor_state['output_path'] = output_path
+        compositor_state['use_packed_exr'] = use_packed_exr
+        return compositor_state
+
+    def set_file_slot_paths(self, context, compositor_state, face):
+        # The '####' is replaced with the frame number (view group index)
+        tree = bpy.context.scene.node_tree
+        file_output_node = tree.nodes[compositor_state['file_output_node']]
+
+        if compositor_state['use_packed_exr']:
+            file_output_node.base_path = compositor_state['output_path'] + face + "_rgbd.####"
+        else:
+            file_output_node.file_slots[1].path = face + "_color.####"
+            file_output_node.file_slots[2].path = face + "_depth.####"
+
+    def find_channel_names(self, file_path, layer, channels):
+        # Looks up the channels of a layer in a captured image, every entry
+        # of channels is a channel name or a list of candidate names
+        try:
+            header = exr.read_header(file_path)
+        except (OSError, exr.ExrError) as error:
+            print(f"Could not read channel names, using defaults: {error}")
+            header = None
+
+        channel_names = []
+        for channel in channels:
+            candidates = channel if isinstance(channel, list) else [channel]
+            channel_name = exr.find_channel(header, layer, candidates) if header else None
+            if channel_name is None:
+                channel_name = layer + "." + candidates[0] if layer else candidates[0]
+            channel_names.append(channel_name)
+        return channel_names
+
+    def compositor_restore(self, context, compositor_state):
+        scene = bpy.context.scene
+        tree = scene.node_tree
+
+        # Remove the Seurat nodes
+        for node_name in compositor_state['seurat_nodes']:
+            node = tree.nodes.get(node_name)
+            if node is not None:
+                tree.nodes.remove(node)
+
+        # Unmute the user's nodes
+        for node_name, mute in compositor_state['muted_nodes'].items():
+            node = tree.nodes.get(node_name)
+            if node is not None:
+                node.mute = mute
+
+        scene.use_nodes = compositor_state['use_nodes']
+
     def render_preparation(self, context, image_resolution):
         # Make sure that renders are in the correct format before capturing
         context.view_layer.use_pass_z = True
@@ -260,138 +1215,206 @@ class SEURAT_OT_capture_data(bpy.types.Operator):
             context.scene.eevee.use_overscan = True
             context.scene.eevee.overscan_size = 10.0
 
-    def render_color_and_depth(self, context, face, position, output_path, near_clip, far_clip):
-
-        # Create camera
+    def create_capture_rig(self, context, near_clip, far_clip):
+        # The rig is an empty with six pre-oriented cameras parented to it,
+        # one for each cube face. All cameras share a single camera datablock
         seurat_camera = bpy.data.cameras.new("SeuratCamera")
         seurat_camera.lens = 18
         seurat_camera.clip_start = near_clip
         seurat_camera.clip_end = far_clip
 
-        seurat_camera_obj = bpy.data.objects.new("SeuratCamera", seurat_camera)
+        capture_rig = bpy.data.objects.new("SeuratCaptureRig", None)
+        context.scene.collection.objects.link(capture_rig)
+
+        capture_cameras = {}
+        for face in FACES:
+            seurat_camera_obj = bpy.data.objects.new(
+                "SeuratCamera_" + face, seurat_camera)
+            seurat_camera_obj.rotation_euler = FACE_ROTATIONS[face]
+            seurat_camera_obj.parent = capture_rig
+
+            context.scene.collection.objects.link(seurat_camera_obj)
+            capture_cameras[face] = seurat_camera_obj
+
+        return capture_rig, capture_cameras
+
+    def multiview_setup(self, context, capture_cameras):
+        # Blender finds the camera of a view by replacing the suffix of the
+        # active camera's name with the suffix of that view, so the rig
+        # cameras must be named exactly "SeuratCamera_<face>"
+        for face, seurat_camera_obj in capture_cameras.items():
+            if seurat_camera_obj.name != "SeuratCamera" + MULTIVIEW_SUFFIX % face:
+                self.report({'ERROR'}, f"Object name {seurat_camera_obj.name} is taken, rename or remove the existing SeuratCamera objects")
+                return None
+
+        render = context.scene.render
+
+        # Store the user's multi-view settings so they can be restored
+        multiview_state = {
+            'use_multiview': render.use_multiview,
+            'views_format': render.views_format,
+            'views_use': {view.name: view.use for view in render.views}
+        }
+
+        render.use_multiview = True
+        render.views_format = 'MULTIVIEW'
+
+        # Only the Seurat views should be rendered
+        for view in render.views:
+            view.use = False
+
+        for face in FACES:
+            view = render.views.new("Seurat_" + face)
+            view.camera_suffix = MULTIVIEW_SUFFIX % face
+            view.use = True
+
+        return multiview_state
+
+    def multiview_restore(self, context, multiview_state):
+        render = context.scene.render
 
-        # Set camera position
-        seurat_camera_obj.location = (position[0], position[1], position[2])
-
-        # Set camera rotation
-        if face is 'front':
-            seurat_camera_obj.rotation_euler = (
-                1.5707963267948966, 0, 0)
-        elif face is 'back':
-            seurat_camera_obj.rotation_euler = (
-                1.5707963267948966, 0, 3.141592653589793)
-        elif face is 'left':
-            seurat_camera_obj.rotation_euler = (
-                1.5707963267948966, 0, 1.5707963267948966)
-        elif face is 'right':
-            seurat_camera_obj.rotation_euler = (
-                1.5707963267948966, 0, -1.5707963267948966)
-        elif face is 'bottom':
-            seurat_camera_obj.rotation_euler = (0, 0, 0)
-        elif face is 'top':
-            seurat_camera_obj.rotation_euler = (3.141592653589793, 0, 0)
+        # Remove the Seurat views
+        for face in FACES:
+            view = render.views.get("Seurat_" + face)
+            if view is not None:
+                render.views.remove(view)
 
+        for view in render.views:
+            view.use = multiview_state['views_use'].get(view.name, view.use)
+
+        render.views_format = multiview_state['views_format']
+        render.use_multiview = multiview_state['use_multiview']
+
+    def remove_capture_rig(self, capture_rig, capture_cameras):
+        # Delete the cameras, the rig and the shared camera data
+        seurat_camera = None
+        for seurat_camera_obj in capture_cameras.values():
+            seurat_camera = seurat_camera_obj.data
+            bpy.data.objects.remove(seurat_camera_obj, do_unlink=True)
+
+        bpy.data.objects.remove(capture_rig, do_unlink=True)
+
+        if seurat_camera is not None:
+            bpy.data.cameras.remove(seurat_camera)
+
+    def render_color_and_depth(self, context, seurat_camera_obj):
         # Set camera as active
         context.scene.camera = seurat_camera_obj
 
         # Render image
         bpy.ops.render.render()
 
-        # Delete camera
-        bpy.data.objects.remove(seurat_camera_obj, do_unlink=True)
+    def capture_file_paths(self, absolute_output_path, file_patterns, face, view_group_index):
+        # Absolute paths of the color and depth image of a face
+        file_name_data = {'face': face, 'index': view_group_index}
+        return [os.path.join(absolute_output_path, file_pattern % file_name_data)
+                for file_pattern in file_patterns]
 
-    def rename_renders(self, context, view, face, output_path):
-        # The following is not an optimal solution, but considering there's
-        # no way to disable the automatic addition of a frame number
-        # the file has to be renamed manually
+    def record_capture(self, capture_journal, absolute_output_path, file_patterns, face, view_group_index, position, face_hash):
+        # Only faces with all images present are recorded as captured
+        file_paths = self.capture_file_paths(absolute_output_path, file_patterns, face, view_group_index)
+        missing_file_paths = [file_path for file_path in file_paths if not os.path.exists(file_path)]
 
-        # Using the 'color#' and 'depth#' subpaths in the compositor makes renaming the files feasible
+        for file_path in missing_file_paths:
+            print(f"Captured image not found: {file_path}")
 
-        # Get frame number and abosule path for renaming
-        frame = context.scene.frame_current
-        absolute_output_path = bpy.path.abspath(output_path)
+        if not missing_file_paths:
+            capture_journal.record(face, view_group_index, position, face_hash)
 
-        # Create absolute paths to the current render results
-        color_path = os.path.join(absolute_output_path + "color" + str(frame) + ".exr")
-        depth_path = os.path.join(absolute_output_path + "depth" + str(frame) + ".exr")
 
-        # Create absolute paths to the wanted render results
-        color_file_name = os.path.join(absolute_output_path +
-                                        face + "_color." + str(view).zfill(4) + ".exr")
-        depth_file_name = os.path.join(absolute_output_path +
-                                        face + "_depth." + str(view).zfill(4) + ".exr")
+class SEURAT_OT_measure_exr_options(bpy.types.Operator):
+    """Render one face from the capture box center and report the size and write time of every OpenEXR option"""
+    bl_idname = "seurat.measure_exr_options"
+    bl_label = "Measure OpenEXR options"
 
-        # Rename the color image
-        try:
-            os.rename(color_path, color_file_name)
-        except FileNotFoundError:
-            print("Color image not found")
+    def execute(self, context):
+        scn = context.scene
+        opt = scn.seurat_options
+        image_settings = scn.render.image_settings
 
-        # Rename depth image
-        try:
-            os.rename(depth_path, depth_file_name)
-        except FileNotFoundError:
-            print("Depth image not found")
+        seurat_capture_box = boxes.find_capture_box(context)
+        if seurat_capture_box is None:
+            print("Seurat capture box not found")
+            return {'CANCELLED'}
 
-    def create_view_groups(self, headbox_center, camera_positions, image_size, near_clip, far_clip, depth_type, depth_channel_name, color_file_path_pattern, depth_file_path_pattern):
-        mf = math_functions
-        view_groups = []
-        for view_group_index, absolute_position in enumerate(camera_positions):
-            views = []
-            for face in ['front', 'back', 'left', 'right', 'bottom', 'top']:
-                # Camera position relative to headbox center.
-                position = list(
-                    map(operator.sub, absolute_position, headbox_center))
-                clip_from_eye_matrix = mf.cube_face_projection_matrix(
-                    near_clip, far_clip)
-                world_from_eye_matrix = mf.world_eye_matrix_from_face(face)
-                # Set translation component of world-from-eye matrix.
-                for i in range(3):
-                    world_from_eye_matrix[4 * i + 3] = position[i]
-
-                # Create camera object
-                camera = {
-                    'image_width': image_size,
-                    'image_height': image_size,
-                    'clip_from_eye_matrix': clip_from_eye_matrix,
-                    'world_from_eye_matrix': world_from_eye_matrix,
-                    'depth_type': depth_type
-                }
-
-                # Create view object and add it to the view groups
-                color_image_path = (color_file_path_pattern %
-                                    (face, view_group_index))
-                depth_image_path = (depth_file_path_pattern %
-                                    (face, view_group_index))
-                view = {
-                    'projective_camera': camera,
-                    'depth_image_file': {
-                        'color': {
-                            'path': color_image_path,
-                            'channel_0': 'R',
-                            'channel_1': 'G',
-                            'channel_2': 'B',
-                            'channel_alpha': 'A'
-                        },
-                        'depth': {
-                            'path': depth_image_path,
-                            'channel_0': depth_channel_name
-                        }
-                    }
-                }
-                views.append(view)
-            view_group = {'views': views}
-            view_groups.append(view_group)
-
-        # Return the view_groups as a Python list.
-        return view_groups
+        image_resolution = int(opt.image_resolution)
+        measurement_path = os.path.join(bpy.path.abspath(opt.capture_output_path), ".seurat_exr_measurement")
+        os.makedirs(measurement_path, exist_ok=True)
+
+        # Store the settings changed for the measurement
+        render_settings = (scn.render.resolution_x, scn.render.resolution_y,
+                           scn.render.resolution_percentage, scn.camera,
+                           context.view_layer.use_pass_z)
+        format_settings = (image_settings.file_format, image_settings.color_mode,
+                           image_settings.color_depth, image_settings.exr_codec)
+
+        # Render the front face from the center of the capture box
+        seurat_camera = bpy.data.cameras.new("SeuratCamera")
+        seurat_camera.lens = 18
+        seurat_camera.clip_start = opt.near_clip
+        seurat_camera.clip_end = opt.far_clip
+        seurat_camera_obj = bpy.data.objects.new("SeuratCamera", seurat_camera)
+        seurat_camera_obj.location = seurat_capture_box.location
+        seurat_camera_obj.rotation_euler = FACE_ROTATIONS['front']
+
+        results = []
+        try:
+            scn.render.resolution_x = image_resolution
+            scn.render.resolution_y = image_resolution
+            scn.render.resolution_percentage = 100
+            context.view_layer.use_pass_z = True
+            scn.camera = seurat_camera_obj
+
+            bpy.ops.render.render()
+            render_result = bpy.data.images['Render Result']
+
+            # Single layer images contain the color, multilayer images
+            # contain color and depth
+            for file_format in ['OPEN_EXR', 'OPEN_EXR_MULTILAYER']:
+                for codec in EXR_CODECS:
+                    for precision, color_depth in COLOR_PRECISION_DEPTHS.items():
+                        image_settings.file_format = file_format
+                        image_settings.color_mode = 'RGBA'
+                        image_settings.color_depth = color_depth
+                        image_settings.exr_codec = codec
+
+                        file_path = os.path.join(measurement_path, f"{file_format}_{codec}_{precision}.exr")
+                        start_time = time.perf_counter()
+                        render_result.save_render(file_path, scene=scn)
+                        write_time = time.perf_counter() - start_time
+
+                        results.append((file_format, codec, precision, os.path.getsize(file_path), write_time))
+        finally:
+            (scn.render.resolution_x, scn.render.resolution_y,
+             scn.render.resolution_percentage, scn.camera,
+             context.view_layer.use_pass_z) = render_settings
+            (image_settings.file_format, image_settings.color_mode,
+             image_settings.color_depth, image_settings.exr_codec) = format_settings
+
+            bpy.data.objects.remove(seurat_camera_obj, do_unlink=True)
+            bpy.data.cameras.remove(seurat_camera)
+            shutil.rmtree(measurement_path, ignore_errors=True)
+
+        # Sizes are extrapolated to a full capture
+        face_count = int(opt.view_groups) * len(FACES)
+        print(f"OpenEXR options at {image_resolution} px, totals for {face_count} faces:")
+        print(f"{'Format':<22}{'Codec':<7}{'Color':<6}{'Size [MB]':>11}{'Write [ms]':>12}{'Total [GB]':>12}")
+        for file_format, codec, precision, size, write_time in results:
+            print(f"{file_format:<22}{codec:<7}{precision:<6}{size / 1e6:>11.2f}"
+                  f"{write_time * 1000:>12.1f}{size * face_count / 1e9:>12.2f}")
+
+        smallest = min(results, key=lambda result: result[3])
+        self.report({'INFO'}, f"Smallest: {smallest[0]} {smallest[1]} {smallest[2]} ({smallest[3] / 1e6:.2f} MB per face), see the system console for all options")
+        return {'FINISHED'}
 
 
 def register():
     bpy.utils.register_class(SEURAT_OT_create_capture_box)
     bpy.utils.register_class(SEURAT_OT_capture_data)
+    bpy.utils.register_class(SEURAT_OT_measure_exr_options)
 
 
 def unregister():
     bpy.utils.unregister_class(SEURAT_OT_create_capture_box)
     bpy.utils.unregister_class(SEURAT_OT_capture_data)
+    bpy.utils.unregister_class(SEURAT_OT_measure_exr_options)
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import argparse
+import bpy
+from . import boxes
+from . import capture
+from . import processing
+
+
+# Expression that runs the command line interface, the addon is enabled
+# explicitly in case it isn't enabled in the user preferences:
+# blender -b scene.blend --python-expr "<CLI_EXPRESSION>" -- --seurat-capture ...
+CLI_EXPRESSION = ("import addon_utils; addon_utils.enable(%r, default_set=False); "
+                  "from %s import cli; cli.main()")
+
+# Prefix of the progress lines, the rest of the line is a JSON object
+PROGRESS_PREFIX = "SEURAT_PROGRESS "
+
+# Exit codes of the command line interface, argparse exits with 2 on invalid
+# arguments
+EXIT_SUCCESS = 0
+EXIT_CAPTURE_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PROCESS_FAILED = 3
+EXIT_NO_CAPTURE_BOX = 4
+
+
+def print_progress(event, **values):
+    # Flushed right away, the scheduler reads the output while Blender runs
+    print(PROGRESS_PREFIX + json.dumps(dict(values, event=event, time=time.time())), flush=True)
+
+
+def capture_progress_changed(progress):
+    print_progress('capture', done=progress['done'], total=progress['total'], status=progress['status'],
+                   batch=progress['batch'])
+
+
+def processing_progress_changed(progress):
+    print_progress('process', stage=progress['stage'], percentage=progress['percentage'])
+
+
+def enum_choices(opt, property_name):
+    return [item.identifier for item in opt.bl_rna.properties[property_name].enum_items]
+
+
+def create_parser(opt):
+    """Creates the argument parser, enum choices are read from the Seurat options"""
+    parser = argparse.ArgumentParser(
+        prog="blender -b scene.blend --python-expr <expression> --",
+        description="Capture and process Seurat data without the user interface")
+
+    parser.add_argument("--seurat-capture", action='store_true', help="Capture the Seurat data")
+    parser.add_argument("--seurat-process", action='store_true', help="Process the captured data with the Seurat pipeline")
+    parser.add_argument("--seurat-preview", action='store_true', help="Capture and process a low quality preview")
+
+    parser.add_argument("--box-location", type=float, nargs=3, metavar=('X', 'Y', 'Z'),
+                        help="Location of the capture box, it's created when the scene has none")
+    parser.add_argument("--box-size", type=float, nargs=3, metavar=('X', 'Y', 'Z'),
+                        help="Half size of the capture box on every axis (the box scale)")
+    parser.add_argument("--capture-box", default="", help="Name of the capture box to capture and place")
+    parser.add_argument("--all-boxes", action='store_true',
+                        help="Capture every capture box, each to its own folder in the capture output")
+
+    parser.add_argument("--view-groups", choices=enum_choices(opt, 'view_groups'))
+    parser.add_argument("--resolution", choices=enum_choices(opt, 'image_resolution'))
+    parser.add_argument("--camera-sampler", choices=enum_choices(opt, 'camera_sampler'))
+    parser.add_argument("--camera-placement", choices=enum_choices(opt, 'camera_placement'))
+    parser.add_argument("--near-clip", type=float)
+    parser.add_argument("--far-clip", type=float)
+    parser.add_argument("--capture-output", help="Directory the captured images and manifest are written to")
+    parser.add_argument("--mesh-output", help="Directory the Seurat pipeline output is written to")
+    parser.add_argument("--pipeline-path", help="Path of the Seurat pipeline binary")
+    parser.add_argument("--command-flags", help="Seurat pipeline command flags")
+    return parser
+
+
+def apply_arguments(scene, args):
+    """Copies the arguments to the Seurat options and the capture box.
+    Returns:
+      False if the scene has no capture box and none was requested.
+    """
+    opt = scene.seurat_options
+
+    if args.view_groups is not None:
+        opt.view_groups = args.view_groups
+    if args.resolution is not None:
+        opt.image_resolution = args.resolution
+    if args.camera_sampler is not None:
+        opt.camera_sampler = args.camera_sampler
+    if args.camera_placement is not None:
+        opt.camera_placement = args.camera_placement
+    if args.near_clip is not None:
+        opt.near_clip = args.near_clip
+    if args.far_clip is not None:
+        opt.far_clip = args.far_clip
+    if args.capture_output is not None:
+        # The capture code expects the output path to end with a separator
+        opt.capture_output_path = os.path.join(args.capture_output, "")
+    if args.mesh_output is not None:
+        opt.mesh_output_path = os.path.join(args.mesh_output, "")
+    if args.pipeline_path is not None:
+        opt.seurat_pipeline_path = args.pipeline_path
+    if args.command_flags is not None:
+        opt.seurat_command_flags = args.command_flags
+
+    capture_box = boxes.find_capture_box(bpy.context, args.capture_box)
+    if capture_box is None and not args.capture_box and (args.box_location or args.box_size):
+        bpy.ops.seurat.create_capture_box()
+        capture_box = boxes.find_capture_box(bpy.context)
+
+    if capture_box is None:
+        return False
+
+    if args.box_location:
+        capture_box.location = args.box_location
+    if args.box_size:
+        capture_box.scale = args.box_size
+    return True
+
+
+def run(argv):
+    """Runs the command line interface with the arguments after '--'.
+    Returns:
+      The exit code.
+    """
+    scene = bpy.context.scene
+    parser = create_parser(scene.seurat_options)
+    args, _ = parser.parse_known_args(argv)
+
+    if not (args.seurat_capture or args.seurat_process or args.seurat_preview):
+        parser.error("nothing to do, pass --seurat-capture, --seurat-process and/or --seurat-preview")
+
+    if not apply_arguments(scene, args) and (args.seurat_capture or args.seurat_preview):
+        print("Seurat capture box not found, pass --box-location and --box-size to create one")
+        print_progress('finished', exit_code=EXIT_NO_CAPTURE_BOX)
+        return EXIT_NO_CAPTURE_BOX
+
+    capture.progress_listeners.append(capture_progress_changed)
+    processing.progress_listeners.append(processing_progress_changed)
+    try:
+        if args.seurat_preview:
+            print_progress('stage', stage='preview')
+            try:
+                result = bpy.ops.seurat.capture_preview()
+            except RuntimeError as error:
+                print(error)
+                result = {'CANCELLED'}
+
+            if 'FINISHED' not in result:
+                print_progress('finished', exit_code=EXIT_CAPTURE_FAILED)
+                return EXIT_CAPTURE_FAILED
+
+        if args.seurat_capture:
+            print_progress('stage', stage='capture')
+            try:
+                result = bpy.ops.seurat.capture_data(capture_box=args.capture_box, all_boxes=args.all_boxes)
+            except RuntimeError as error:
+                print(error)
+                result = {'CANCELLED'}
+
+            if 'FINISHED' not in result:
+                print_progress('finished', exit_code=EXIT_CAPTURE_FAILED)
+                return EXIT_CAPTURE_FAILED
+
+        if args.seurat_process:
+            print_progress('stage', stage='process')
+            try:
+                result = bpy.ops.seurat.process_data()
+            except RuntimeError as error:
+                print(error)
+                result = {'CANCELLED'}
+
+            if 'FINISHED' not in result:
+                print_progress('finished', exit_code=EXIT_PROCESS_FAILED)
+                return EXIT_PROCESS_FAILED
+    finally:
+        capture.progress_listeners.remove(capture_progress_changed)
+        processing.progress_listeners.remove(processing_progress_changed)
+
+    print_progress('finished', exit_code=EXIT_SUCCESS)
+    return EXIT_SUCCESS
+
+
+def main():
+    """Entry point of the command line interface, runs inside a background Blender process"""
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    sys.exit(run(argv))
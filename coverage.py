@@ -0,0 +1,152 @@
+import time
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from . import math_functions
+from . import intersection
+
+# NumPy is bundled with Blender, the scene is transformed in Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Hit points are grouped into grid cells of this fraction of the capture box
+# diagonal, a surface element is a triangle inside one cell
+CELLS_PER_BOX_DIAGONAL = 8
+
+
+def scene_tree(depsgraph):
+    """Builds a world space BVH tree of all renderable geometry.
+    Returns:
+      A BVHTree, or None if the scene has no geometry.
+    """
+    meshes = {}
+    world_vertices = []
+    world_triangles = []
+    vertex_count = 0
+
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.type not in intersection.GEOMETRY_TYPES:
+            continue
+        if not instance.is_instance and obj.hide_render:
+            continue
+
+        # The mesh of an object is evaluated once and shared by its instances
+        if obj.name not in meshes:
+            meshes[obj.name] = intersection.mesh_triangles(obj)
+        if meshes[obj.name] is None:
+            continue
+
+        vertices, triangles = meshes[obj.name]
+        matrix = instance.matrix_world.copy()
+
+        if numpy is not None:
+            rotation = numpy.array(matrix.to_3x3(), dtype=numpy.float64)
+            translation = numpy.array(matrix.translation, dtype=numpy.float64)
+            world_vertices.extend((vertices @ rotation.T + translation).tolist())
+        else:
+            world_vertices.extend(matrix @ vertex for vertex in vertices)
+
+        world_triangles.extend([index + vertex_count for index in triangle] for triangle in triangles)
+        vertex_count += len(vertices)
+
+    if not world_triangles:
+        return None
+    return BVHTree.FromPolygons(world_vertices, world_triangles)
+
+
+def seen_elements(tree, position, directions, far_clip, cell_size):
+    """Casts visibility probes from a position.
+    Returns:
+      A set of (triangle index, grid cell) tuples of the surfaces hit by the
+      probes, rays that hit nothing within far_clip see the background.
+    """
+    origin = Vector(position)
+    seen = set()
+    for direction in directions:
+        location, normal, index, distance = tree.ray_cast(origin, direction, far_clip)
+        if index is not None:
+            cell = (int(location[0] // cell_size), int(location[1] // cell_size), int(location[2] // cell_size))
+            seen.add((index, cell))
+    return seen
+
+
+def select_camera_positions(depsgraph, headbox_min, headbox_max, max_cameras, candidates,
+                            probes, min_gain, far_clip, sampler='HAMMERSLEY'):
+    """Picks the camera positions that see the most surface of the scene.
+    Candidate positions are generated like regular camera positions, the
+    headbox center is always picked first. Then the candidate that sees the most
+    surface elements that aren't seen yet is picked, until the best candidate
+    adds less than min_gain of all surface seen from the candidates.
+    Args:
+      depsgraph: The evaluated depsgraph of the view layer.
+      headbox_min: The lower bounds of the headbox as a list of 3 floats.
+      headbox_max: The upper bounds of the headbox as a list of 3 floats.
+      max_cameras: Maximum number of camera positions.
+      candidates: Number of candidate positions that are evaluated.
+      probes: Number of visibility probe rays cast from every candidate.
+      min_gain: Minimum fraction of the surface a picked position has to add.
+      far_clip: Length of the probe rays.
+      sampler: Name of the sampler used for the candidate positions.
+    Returns:
+      A tuple of the picked positions (lists of 3 floats) and a dict with the
+      achieved 'coverage' fraction, the number of 'candidates' and the 'time'
+      the selection took in seconds.
+    """
+    start_time = time.perf_counter()
+
+    # The headbox center is the first candidate
+    candidate_positions = math_functions.generate_camera_positions(
+        headbox_min, headbox_max, max(candidates, max_cameras), sampler)
+
+    tree = scene_tree(depsgraph)
+    if tree is None:
+        # Nothing to see, every position is as good as another
+        report = {'coverage': 1.0, 'candidates': len(candidate_positions),
+                  'time': time.perf_counter() - start_time}
+        return candidate_positions[:1], report
+
+    directions = [Vector(direction) for direction in math_functions.sphere_directions(probes)]
+    cell_size = max((Vector(headbox_max) - Vector(headbox_min)).length / CELLS_PER_BOX_DIAGONAL, 1e-6)
+
+    seen_sets = [seen_elements(tree, position, directions, far_clip, cell_size)
+                 for position in candidate_positions]
+
+    picked, covered, total = math_functions.greedy_coverage(seen_sets, max_cameras, min_gain)
+
+    report = {'coverage': covered / total if total else 1.0,
+              'candidates': len(candidate_positions),
+              'time': time.perf_counter() - start_time}
+    return [candidate_positions[index] for index in picked], report
+
+
+def face_fill(tree, position, rotation, far_clip, resolution):
+    """Estimates which part of a cube face sees geometry.
+    Rays are cast through the centers of a resolution x resolution grid on
+    the face, like a low resolution depth render.
+    Args:
+      tree: A BVH tree returned by scene_tree.
+      position: The camera position as a list of 3 floats.
+      rotation: A 3x3 Matrix with the rotation of the face's camera, the
+        camera looks down its -Z axis with a 90 degree field of view.
+      far_clip: Distance of the far clipping plane.
+      resolution: Number of probe rays along each side of the face.
+    Returns:
+      The fraction of the probe rays that hit geometry before the far plane.
+    """
+    origin = Vector(position)
+    hits = 0
+    for row in range(resolution):
+        y = (row + 0.5) / resolution * 2.0 - 1.0
+        for column in range(resolution):
+            x = (column + 0.5) / resolution * 2.0 - 1.0
+
+            # The far plane is at depth far_clip, so the ray is longer off axis
+            direction = rotation @ Vector((x, y, -1.0))
+            length = far_clip * direction.length
+            location, normal, index, distance = tree.ray_cast(origin, direction.normalized(), length)
+            if index is not None:
+                hits += 1
+    return hits / (resolution * resolution)
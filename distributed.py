@@ -0,0 +1,298 @@
+import os
+import re
+import sys
+import queue
+import shutil
+import argparse
+import threading
+import subprocess
+import time
+import bpy
+from . import boxes
+from . import capture
+from . import journal
+from . import manifest
+
+
+# Expression run by every worker process, the addon is enabled explicitly
+# in case it isn't enabled in the user preferences
+WORKER_EXPRESSION = ("import addon_utils; addon_utils.enable(%r, default_set=False); "
+                     "from %s import distributed; distributed.worker_main()")
+
+# Directory (inside the capture output path) used for temporary worker data
+WORKER_DIRECTORY = ".seurat_workers"
+
+# Seconds between checks of the worker processes
+POLL_INTERVAL = 0.2
+
+VIEW_GROUP_CAPTURED_PATTERN = re.compile(
+    re.escape(capture.VIEW_GROUP_CAPTURED_MESSAGE).replace("%04d", r"(\d+)"))
+
+
+class CaptureWorker:
+    """A background Blender process capturing a shard of the view groups"""
+
+    def __init__(self, shard_index, view_group_start, view_group_count, output_path, capture_box):
+        self.shard_index = shard_index
+        self.view_group_start = view_group_start
+        self.view_group_count = view_group_count
+        self.output_path = output_path
+        self.capture_box = capture_box
+        self.attempts = 0
+        self.process = None
+        self.reader = None
+        self.log = []
+
+    def start(self, blend_path, threads, messages):
+        self.attempts += 1
+        self.log = []
+
+        package = __package__
+        cmd = [bpy.app.binary_path, "-b", blend_path,
+               "-t", str(threads),
+               "--python-expr", WORKER_EXPRESSION % (package, package),
+               "--",
+               "--view-group-start", str(self.view_group_start),
+               "--view-group-count", str(self.view_group_count),
+               "--output-path", self.output_path,
+               "--capture-box", self.capture_box,
+               "--cycles-device", "CPU"]
+
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        universal_newlines=True, bufsize=1)
+
+        # Read the output on a thread so the pipe never fills up
+        self.reader = threading.Thread(target=self.read_output, args=(self.process, messages), daemon=True)
+        self.reader.start()
+
+    def poll(self):
+        """Returns the exit code of the process, or None while it's running.
+        The output is read completely before the exit code is returned, so the
+        log is complete for failed workers.
+        """
+        return_code = self.process.poll()
+        if return_code is not None:
+            self.reader.join()
+        return return_code
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        self.reader.join()
+
+    def read_output(self, process, messages):
+        for line in process.stdout:
+            line = line.rstrip()
+            self.log.append(line)
+            match = VIEW_GROUP_CAPTURED_PATTERN.search(line)
+            if match:
+                messages.put(int(match.group(1)))
+        process.stdout.close()
+
+
+class SEURAT_OT_capture_data_distributed(bpy.types.Operator):
+    """Capture Seurat data with several background Blender processes and merge the results"""
+    bl_idname = "seurat.capture_data_distributed"
+    bl_label = "Capture Seurat data (distributed)"
+
+    def execute(self, context):
+        # Run the workers without returning control to the UI
+        if not self.start_capture(context):
+            return {'CANCELLED'}
+
+        try:
+            while self.running:
+                time.sleep(POLL_INTERVAL)
+                self.poll_workers(context)
+        finally:
+            self.stop_workers(context)
+
+        return self.finish_capture(context)
+
+    def invoke(self, context, event):
+        if not self.start_capture(context):
+            return {'CANCELLED'}
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(POLL_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.finish_modal(context)
+            self.report({'WARNING'}, "Distributed capture cancelled")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        self.poll_workers(context)
+        if self.running:
+            return {'RUNNING_MODAL'}
+
+        self.finish_modal(context)
+        return self.finish_capture(context)
+
+    def start_capture(self, context):
+        scn = context.scene
+        opt = scn.seurat_options
+
+        # Workers are passed the name of the box, so they all capture the same one
+        capture_box = boxes.find_capture_box(context)
+        if capture_box is None:
+            self.report({'ERROR'}, "Seurat capture box not found")
+            return False
+
+        # Coverage placement can pick fewer view groups than configured
+        headbox_min, headbox_max = capture.headbox_bounds(capture_box)
+        view_groups = len(capture.generate_view_group_positions(context, headbox_min, headbox_max))
+        worker_count = min(opt.capture_workers, view_groups)
+        self.absolute_output_path = bpy.path.abspath(opt.capture_output_path)
+        self.worker_directory = os.path.join(self.absolute_output_path, WORKER_DIRECTORY)
+
+        os.makedirs(self.worker_directory, exist_ok=True)
+
+        # Workers render a copy of the scene, the open file isn't changed
+        self.blend_path = os.path.join(self.worker_directory, "scene.blend")
+        bpy.ops.wm.save_as_mainfile(filepath=self.blend_path, copy=True)
+
+        # Split the view groups into one contiguous shard per worker
+        self.workers = []
+        shard_start = 0
+        for shard_index in range(worker_count):
+            shard_size = view_groups // worker_count
+            if shard_index < view_groups % worker_count:
+                shard_size += 1
+
+            shard_output_path = os.path.join(self.worker_directory, "shard_%02d" % shard_index) + os.sep
+            self.workers.append(CaptureWorker(shard_index, shard_start, shard_size, shard_output_path, capture_box.name))
+            shard_start += shard_size
+
+        # Split the CPU threads between the workers
+        self.threads = max(1, (os.cpu_count() or 1) // worker_count)
+        self.view_groups = view_groups
+        self.retries = opt.capture_worker_retries
+        self.compact = opt.manifest_compact
+
+        print(f"Capturing {view_groups} view groups with {worker_count} workers ({self.threads} threads each)")
+
+        self.messages = queue.Queue()
+        self.captured = set()
+        self.running = list(self.workers)
+        self.failed = []
+
+        for worker in self.workers:
+            worker.start(self.blend_path, self.threads, self.messages)
+
+        context.window_manager.progress_begin(0, view_groups)
+        return True
+
+    def poll_workers(self, context):
+        # Progress is reported by the workers after every view group
+        while not self.messages.empty():
+            self.captured.add(self.messages.get())
+            print(f"Captured {len(self.captured)}/{self.view_groups} view groups")
+        context.window_manager.progress_update(len(self.captured))
+
+        for worker in list(self.running):
+            return_code = worker.poll()
+            if return_code is None:
+                continue
+
+            if return_code == 0:
+                self.running.remove(worker)
+            elif worker.attempts <= self.retries:
+                print(f"Worker {worker.shard_index} failed with exit code {return_code}, retrying")
+                worker.start(self.blend_path, self.threads, self.messages)
+            else:
+                self.running.remove(worker)
+                self.failed.append(worker)
+
+    def stop_workers(self, context):
+        context.window_manager.progress_end()
+
+        # Don't leave workers running if capturing was interrupted
+        for worker in self.running:
+            worker.kill()
+        self.running = []
+
+    def finish_capture(self, context):
+        if self.failed:
+            for worker in self.failed:
+                print(f"Worker {worker.shard_index} failed, last output:")
+                print("\n".join(worker.log[-20:]))
+
+            self.report({'ERROR'}, f"{len(self.failed)} capture worker(s) failed, see the system console")
+            return {'CANCELLED'}
+
+        try:
+            self.merge_results(self.workers, self.absolute_output_path, self.compact)
+        except manifest.ManifestError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        # Clean up the worker data
+        shutil.rmtree(self.worker_directory, ignore_errors=True)
+
+        self.report({'INFO'}, "Distributed capture finished")
+        return {'FINISHED'}
+
+    def finish_modal(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        self.stop_workers(context)
+
+    def merge_results(self, workers, absolute_output_path, compact):
+        capture_journal = journal.CaptureJournal(absolute_output_path)
+
+        # The shards are ordered, so the view groups stay in order
+        manifest_stream = manifest.ManifestStream(manifest.manifest_path(absolute_output_path), compact)
+        try:
+            for worker in workers:
+                # Image names already use the global view group index
+                for file_name in os.listdir(worker.output_path):
+                    if file_name.endswith(".exr"):
+                        os.replace(os.path.join(worker.output_path, file_name),
+                                   os.path.join(absolute_output_path, file_name))
+
+                capture_journal.update(journal.CaptureJournal(worker.output_path))
+
+                shard_manifest = manifest.read_manifest(manifest.manifest_path(worker.output_path))
+                for view_group in shard_manifest['view_groups']:
+                    manifest_stream.write(view_group)
+        finally:
+            manifest_stream.close()
+
+        capture_journal.save()
+
+
+def worker_main():
+    """Entry point of a capture worker, runs inside a background Blender process"""
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(description="Seurat capture worker")
+    parser.add_argument("--view-group-start", type=int, required=True)
+    parser.add_argument("--view-group-count", type=int, required=True)
+    parser.add_argument("--output-path", required=True)
+    parser.add_argument("--capture-box", required=True)
+    args, _ = parser.parse_known_args(argv)
+
+    try:
+        result = bpy.ops.seurat.capture_data(view_group_start=args.view_group_start,
+                                             view_group_count=args.view_group_count,
+                                             output_path=args.output_path,
+                                             capture_box=args.capture_box)
+    except RuntimeError as error:
+        print(error)
+        result = {'CANCELLED'}
+
+    sys.exit(0 if 'FINISHED' in result else 1)
+
+
+def register():
+    bpy.utils.register_class(SEURAT_OT_capture_data_distributed)
+
+
+def unregister():
+    bpy.utils.unregister_class(SEURAT_OT_capture_data_distributed)
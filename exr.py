@@ -0,0 +1,349 @@
+import os
+import zlib
+import struct
+
+# NumPy is bundled with Blender, ZIP chunks are decoded in Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# OpenEXR files start with this magic number
+EXR_MAGIC = 20000630
+
+# Version field flags
+MULTIPART_FLAG = 0x1000
+SINGLE_PART_TILED_FLAG = 0x200
+
+# Channel pixel types
+PIXEL_TYPE_UINT = 0
+PIXEL_TYPE_HALF = 1
+PIXEL_TYPE_FLOAT = 2
+
+# Version field of single part scanline files
+SCANLINE_VERSION = 2
+
+# Compression methods, in the order of the OpenEXR specification
+COMPRESSION_NAMES = ['NONE', 'RLE', 'ZIPS', 'ZIP', 'PIZ', 'PXR24', 'B44', 'B44A', 'DWAA', 'DWAB']
+
+# Scanlines stored in one chunk by each compression method
+LINES_PER_CHUNK = {'NONE': 1, 'RLE': 1, 'ZIPS': 1, 'ZIP': 16, 'PIZ': 32, 'PXR24': 16,
+                   'B44': 32, 'B44A': 32, 'DWAA': 32, 'DWAB': 256}
+
+# Compression methods whose chunks can be decoded by read_channel_samples
+DECODABLE_COMPRESSIONS = {'NONE', 'ZIPS', 'ZIP'}
+
+# Bytes per value and struct format of the channel pixel types
+PIXEL_TYPE_FORMATS = {PIXEL_TYPE_UINT: (4, 'I'), PIXEL_TYPE_HALF: (2, 'e'), PIXEL_TYPE_FLOAT: (4, 'f')}
+
+
+class ExrError(Exception):
+    """Raised when a file is not a readable OpenEXR file"""
+
+
+def read_null_terminated(data, offset):
+    end = data.index(b'\0', offset)
+    return data[offset:end].decode('latin-1'), end + 1
+
+
+def parse_channel_list(value):
+    """Parses a chlist attribute value.
+    Returns:
+      A dict mapping channel names to their pixel type.
+    """
+    channels = {}
+    offset = 0
+    while value[offset:offset + 1] != b'\0':
+        name, offset = read_null_terminated(value, offset)
+        # pixel type, pLinear + 3 reserved bytes, x and y sampling
+        pixel_type, = struct.unpack_from('<i', value, offset)
+        offset += 16
+        channels[name] = pixel_type
+    return channels
+
+
+def parse_attribute(attribute_type, value):
+    if attribute_type == 'chlist':
+        return parse_channel_list(value)
+    elif attribute_type == 'box2i':
+        return struct.unpack('<4i', value)
+    elif attribute_type == 'compression':
+        return value[0]
+    elif attribute_type == 'int':
+        return struct.unpack('<i', value)[0]
+    elif attribute_type == 'float':
+        return struct.unpack('<f', value)[0]
+    elif attribute_type == 'string':
+        return value.decode('latin-1')
+    elif attribute_type == 'lineOrder':
+        return value[0]
+    # Other attributes are kept as raw bytes
+    return value
+
+
+def read_header(path, max_header_size=1 << 16):
+    """Reads the header of the first part of an OpenEXR file.
+    Only the start of the file is read, pixel data is never loaded.
+    Args:
+      path: Path of the OpenEXR file.
+      max_header_size: Number of bytes read from the start of the file.
+    Returns:
+      A dict with the header attributes, e.g. 'channels' (a dict mapping
+      channel names to pixel types), 'dataWindow' and 'compression'. The file
+      version flags are stored as 'version_flags' and the offset of the first
+      byte after the header as 'header_size'.
+    Raises:
+      ExrError: The file isn't an OpenEXR file or the header is truncated.
+    """
+    with open(path, 'rb') as exr_file:
+        data = exr_file.read(max_header_size)
+
+    if len(data) < 8:
+        raise ExrError(f"{path} is truncated")
+
+    magic, version = struct.unpack_from('<ii', data, 0)
+    if magic != EXR_MAGIC:
+        raise ExrError(f"{path} is not an OpenEXR file")
+
+    header = {'version_flags': version & ~0xff}
+    offset = 8
+    try:
+        while data[offset:offset + 1] != b'\0':
+            name, offset = read_null_terminated(data, offset)
+            attribute_type, offset = read_null_terminated(data, offset)
+            size, = struct.unpack_from('<i', data, offset)
+            offset += 4
+            value = data[offset:offset + size]
+            if len(value) != size:
+                raise ExrError(f"{path} has a truncated header")
+            header[name] = parse_attribute(attribute_type, value)
+            offset += size
+    except (ValueError, IndexError, struct.error):
+        raise ExrError(f"{path} has a truncated header")
+
+    header['header_size'] = offset + 1
+    return header
+
+
+def data_window_size(header):
+    """Returns the width and height of the data window of a header"""
+    x_min, y_min, x_max, y_max = header['dataWindow']
+    return x_max - x_min + 1, y_max - y_min + 1
+
+
+def compression_name(header):
+    compression = header.get('compression', 0)
+    return COMPRESSION_NAMES[compression] if compression < len(COMPRESSION_NAMES) else 'UNKNOWN'
+
+
+def is_scanline(header):
+    # Tiled and multi-part files have a different chunk layout
+    return not header['version_flags'] & (MULTIPART_FLAG | SINGLE_PART_TILED_FLAG)
+
+
+def read_chunk_offsets(exr_file, header):
+    """Reads the chunk offset table of a single part scanline file.
+    Returns:
+      A list with the file offset of every chunk.
+    """
+    lines_per_chunk = LINES_PER_CHUNK.get(compression_name(header))
+    if not is_scanline(header) or lines_per_chunk is None:
+        raise ExrError("only single part scanline files are supported")
+
+    count = -(-data_window_size(header)[1] // lines_per_chunk)
+    exr_file.seek(header['header_size'])
+    data = exr_file.read(8 * count)
+    if len(data) != 8 * count:
+        raise ExrError("the offset table is truncated")
+    return list(struct.unpack(f'<{count}Q', data))
+
+
+def check_chunks(path, header):
+    """Checks that the offset table and the last chunk of a file are complete.
+    Interrupted writes leave zeros in the offset table or a short last chunk,
+    only the offset table and the last chunk header are read.
+    Raises:
+      ExrError: The file is truncated.
+    """
+    with open(path, 'rb') as exr_file:
+        try:
+            offsets = read_chunk_offsets(exr_file, header)
+        except ExrError as error:
+            raise ExrError(f"{path}: {error}")
+
+        file_size = os.fstat(exr_file.fileno()).st_size
+        table_end = header['header_size'] + 8 * len(offsets)
+        if any(offset < table_end or offset + 8 > file_size for offset in offsets):
+            raise ExrError(f"{path} is truncated or has an incomplete offset table")
+
+        last_offset = max(offsets)
+        exr_file.seek(last_offset)
+        y, size = struct.unpack('<ii', exr_file.read(8))
+        if last_offset + 8 + size > file_size:
+            raise ExrError(f"{path} is truncated")
+
+
+def reconstruct_zip_data(data):
+    """Undoes the delta predictor and byte interleaving of ZIP compression"""
+    half = (len(data) + 1) // 2
+    if numpy is not None:
+        deltas = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.int64)
+        deltas[1:] -= 128
+        predicted = (numpy.cumsum(deltas) & 0xff).astype(numpy.uint8)
+        result = numpy.empty(len(data), dtype=numpy.uint8)
+        result[0::2] = predicted[:half]
+        result[1::2] = predicted[half:]
+        return result.tobytes()
+
+    predicted = bytearray(data)
+    for i in range(1, len(predicted)):
+        predicted[i] = (predicted[i - 1] + predicted[i] - 128) & 0xff
+    result = bytearray(len(data))
+    result[0::2] = predicted[:half]
+    result[1::2] = predicted[half:]
+    return bytes(result)
+
+
+def read_chunk(exr_file, header, offset):
+    """Reads and decompresses a scanline chunk.
+    Returns:
+      A tuple of the number of lines in the chunk and the pixel data, every
+      line holds the values of each channel in turn.
+    """
+    y_min, y_max = header['dataWindow'][1], header['dataWindow'][3]
+    compression = compression_name(header)
+
+    exr_file.seek(offset)
+    y, size = struct.unpack('<ii', exr_file.read(8))
+    data = exr_file.read(size)
+    lines = min(LINES_PER_CHUNK[compression], y_max - y + 1)
+    if len(data) != size or not y_min <= y <= y_max:
+        raise ExrError("a chunk is truncated or invalid")
+
+    width = data_window_size(header)[0]
+    line_size = width * sum(PIXEL_TYPE_FORMATS[pixel_type][0] for pixel_type in header['channels'].values())
+
+    # Chunks that don't get smaller by compression are stored uncompressed
+    if compression == 'NONE' or size == lines * line_size:
+        return lines, data
+
+    try:
+        return lines, reconstruct_zip_data(zlib.decompress(data))
+    except zlib.error as error:
+        raise ExrError(f"a chunk can't be decompressed: {error}")
+
+
+def read_channel_samples(path, header, channel, chunk_count):
+    """Reads the values of one channel from a few chunks spread over the image.
+    Args:
+      path: Path of the OpenEXR file.
+      header: The header of the file, returned by read_header.
+      channel: Full name of the channel.
+      chunk_count: Number of chunks that are read.
+    Returns:
+      The values as a NumPy array, or a list of floats without NumPy.
+    Raises:
+      ExrError: The file can't be decoded, e.g. because of its compression.
+    """
+    if compression_name(header) not in DECODABLE_COMPRESSIONS:
+        raise ExrError(f"{compression_name(header)} compressed files can't be decoded")
+
+    width = data_window_size(header)[0]
+
+    # Channels are stored in alphabetical order, one run of values per line
+    channel_offset = 0
+    for name, pixel_type in header['channels'].items():
+        if name == channel:
+            break
+        channel_offset += width * PIXEL_TYPE_FORMATS[pixel_type][0]
+    else:
+        raise ExrError(f"{path} has no channel {channel}")
+    value_size, value_format = PIXEL_TYPE_FORMATS[header['channels'][channel]]
+    line_size = width * sum(PIXEL_TYPE_FORMATS[pixel_type][0] for pixel_type in header['channels'].values())
+
+    samples = []
+    with open(path, 'rb') as exr_file:
+        offsets = read_chunk_offsets(exr_file, header)
+        indices = sorted({len(offsets) * (i + 1) // (chunk_count + 1) for i in range(chunk_count)})
+        for index in indices:
+            lines, data = read_chunk(exr_file, header, offsets[index])
+            if len(data) < lines * line_size:
+                raise ExrError(f"{path} has a chunk with missing pixels")
+
+            for line in range(lines):
+                start = line * line_size + channel_offset
+                samples.append(data[start:start + width * value_size])
+
+    data = b''.join(samples)
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype='<' + value_format)
+    return list(struct.unpack(f'<{len(data) // value_size}{value_format}', data))
+
+
+def find_channel(header, layer, candidates):
+    """Finds the first channel of a layer that is present in a header.
+    Args:
+      header: A header returned by read_header.
+      layer: Name of the layer, an empty string for single layer files.
+      candidates: Channel names to look for, in order of preference.
+    Returns:
+      The full channel name, or None if none of the candidates are present.
+    """
+    for candidate in candidates:
+        name = layer + "." + candidate if layer else candidate
+        if name in header['channels']:
+            return name
+    return None
+
+
+def write_attribute(name, attribute_type, value):
+    return (name.encode('latin-1') + b'\0' + attribute_type.encode('latin-1') + b'\0' +
+            struct.pack('<i', len(value)) + value)
+
+
+def write_constant_image(path, width, height, channels, comments=None):
+    """Writes an uncompressed scanline OpenEXR file where every pixel is the same.
+    Args:
+      path: Path of the OpenEXR file.
+      width: Width of the image in pixels.
+      height: Height of the image in pixels.
+      channels: A dict mapping channel names (e.g. 'R' or 'depth.V') to the
+        value of that channel, all channels are stored as 32 bit floats.
+      comments: Optional text stored in the 'comments' header attribute.
+    """
+    # Channels are stored in alphabetical order
+    names = sorted(channels)
+
+    channel_list = b''
+    for name in names:
+        # pixel type, pLinear + 3 reserved bytes, x and y sampling
+        channel_list += name.encode('latin-1') + b'\0' + struct.pack('<iB3xii', PIXEL_TYPE_FLOAT, 0, 1, 1)
+    channel_list += b'\0'
+
+    window = struct.pack('<4i', 0, 0, width - 1, height - 1)
+    header = (struct.pack('<ii', EXR_MAGIC, SCANLINE_VERSION) +
+              write_attribute('channels', 'chlist', channel_list) +
+              write_attribute('compression', 'compression', bytes([COMPRESSION_NAMES.index('NONE')])) +
+              write_attribute('dataWindow', 'box2i', window) +
+              write_attribute('displayWindow', 'box2i', window) +
+              write_attribute('lineOrder', 'lineOrder', b'\0') +
+              write_attribute('pixelAspectRatio', 'float', struct.pack('<f', 1.0)) +
+              write_attribute('screenWindowCenter', 'v2f', struct.pack('<ff', 0.0, 0.0)) +
+              write_attribute('screenWindowWidth', 'float', struct.pack('<f', 1.0)))
+    if comments is not None:
+        header += write_attribute('comments', 'string', comments.encode('latin-1'))
+    header += b'\0'
+
+    # Uncompressed files store one scanline per block, every block holds the
+    # line of each channel in turn
+    line_data = b''.join(struct.pack('<f', channels[name]) * width for name in names)
+    block_size = 8 + len(line_data)
+    first_block = len(header) + 8 * height
+
+    with open(path, 'wb') as exr_file:
+        exr_file.write(header)
+        exr_file.write(b''.join(struct.pack('<Q', first_block + y * block_size) for y in range(height)))
+        for y in range(height):
+            exr_file.write(struct.pack('<ii', y, len(line_data)))
+            exr_file.write(line_data)
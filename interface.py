@@ -1,4 +1,8 @@
 import bpy
+from . import capture
+from . import processing
+from . import intersection
+from . import processing_queue
 
 
 class SEURAT_PT_seurat_interface(bpy.types.Panel):
@@ -22,20 +26,125 @@ class SEURAT_PT_seurat_interface(bpy.types.Panel):
                              text="Capture Seurat data",
                              icon='CAMERA_DATA')
 
+        self.layout.operator('seurat.capture_data',
+                             text="Capture all capture boxes",
+                             icon='SCENE_DATA').all_boxes = True
+
+        self.layout.operator('seurat.capture_data_distributed',
+                             text="Capture Seurat data (distributed)",
+                             icon='NETWORK_DRIVE')
+
+        self.layout.operator('seurat.capture_preview',
+                             text="Capture Seurat preview",
+                             icon='HIDE_OFF')
+
         self.layout.operator('seurat.process_data',
                             text="Process Seurat data",
                             icon='MOD_BUILD')
 
+        row = self.layout.row(align=True)
+        row.operator('seurat.queue_processing', text="Add to queue", icon='ADD')
+        row.operator('seurat.run_processing_queue', text="Run queue", icon='PLAY')
+        row.operator('seurat.clear_processing_queue', text="", icon='TRASH')
+
+        # Show the result of the last capture box check
+        status = intersection.box_status
+        if status['checked'] and status['objects']:
+            box = self.layout.box()
+            for box_name, objects in sorted(status['boxes'].items()):
+                if objects:
+                    box.label(text=f"{box_name} intersects with:", icon='ERROR')
+                    for name in objects:
+                        box.label(text=name)
+
+        # Show the progress of a running capture
+        progress = capture.capture_progress
+        if progress['running']:
+            box = self.layout.box()
+            factor = progress['done'] / progress['total'] if progress['total'] else 0.0
+
+            # Progress bars are only available in newer Blender versions
+            if hasattr(box, 'progress'):
+                box.progress(factor=factor, type='BAR', text=f"{progress['done']}/{progress['total']} faces")
+            else:
+                box.label(text=f"Capturing: {factor * 100:.0f}% ({progress['done']}/{progress['total']} faces)")
+
+            if progress['batch']:
+                box.label(text=progress['batch'])
+            box.label(text=progress['status'])
+            box.label(text="Press Esc to cancel")
+
+        # Show the output of a running Seurat pipeline
+        progress = processing.processing_progress
+        if progress['running']:
+            box = self.layout.box()
+            if progress['percentage'] is not None:
+                box.label(text=f"{progress['stage']} ({progress['percentage']:.0f}%)")
+            else:
+                box.label(text=progress['stage'])
+
+            for line in progress['log']:
+                box.label(text=line)
+            box.label(text="Press Esc to cancel")
+
+        # Show the jobs of a running processing queue
+        progress = processing_queue.queue_progress
+        if progress['running']:
+            box = self.layout.box()
+            box.label(text=progress['status'])
+            for line in progress['jobs']:
+                box.label(text=line)
+            box.label(text="Press Esc to stop, running jobs are queued again")
+
         col = self.layout.column(align=True)
         subcol = col.column()
 
         subcol.prop(context.scene.seurat_options,
                     'view_groups', text="View groups")
+        subcol.prop(context.scene.seurat_options, 'camera_sampler')
+        subcol.prop(context.scene.seurat_options, 'camera_placement')
+        if context.scene.seurat_options.camera_placement == 'COVERAGE':
+            subcol.prop(context.scene.seurat_options, 'coverage_candidates')
+            subcol.prop(context.scene.seurat_options, 'coverage_probes')
+            subcol.prop(context.scene.seurat_options, 'coverage_min_gain')
         subcol.prop(context.scene.seurat_options, 'image_resolution')
+        subcol.prop(context.scene.seurat_options, 'capture_mode')
+        subcol.prop(context.scene.seurat_options, 'face_skipping')
+        if context.scene.seurat_options.face_skipping != 'OFF':
+            subcol.prop(context.scene.seurat_options, 'sparse_face_threshold')
+            subcol.prop(context.scene.seurat_options, 'face_probe_resolution')
+        subcol.prop(context.scene.seurat_options, 'exr_packing')
+        subcol.prop(context.scene.seurat_options, 'exr_codec')
+        subcol.prop(context.scene.seurat_options, 'color_precision')
+        subcol.prop(context.scene.seurat_options, 'depth_format')
+        subcol.prop(context.scene.seurat_options, 'manifest_compact')
+        subcol.operator('seurat.measure_exr_options', text="Measure OpenEXR options", icon='FILE_IMAGE')
+        subcol.prop(context.scene.seurat_options, 'change_aware_capture')
+        subcol.prop(context.scene.seurat_options, 'persistent_render_session')
+        subcol.prop(context.scene.seurat_options, 'write_trace')
+        subcol.prop(context.scene.seurat_options, 'capture_workers')
+        subcol.prop(context.scene.seurat_options, 'capture_worker_retries')
         subcol.prop(context.scene.seurat_options, 'near_clip')
         subcol.prop(context.scene.seurat_options, 'far_clip')
+        subcol.prop(context.scene.seurat_options, 'check_capture_box_on_move')
         subcol.prop(context.scene.seurat_options, 'capture_output_path')
+        subcol.prop(context.scene.seurat_options, 'write_queue_depth')
+        if context.scene.seurat_options.write_queue_depth > 0:
+            subcol.prop(context.scene.seurat_options, 'staging_path')
         subcol.prop(context.scene.seurat_options, 'mesh_output_path')
+        subcol.prop(context.scene.seurat_options, 'import_processed_output')
+        subcol.prop(context.scene.seurat_options, 'processing_queue_path')
+        subcol.prop(context.scene.seurat_options, 'processing_memory_budget')
+        subcol.prop(context.scene.seurat_options, 'processing_core_budget')
+        subcol.prop(context.scene.seurat_options, 'processing_job_cores')
+
+        # Settings of the reduced preview run
+        subcol.label(text="Preview")
+        subcol.prop(context.scene.seurat_options, 'preview_view_groups')
+        subcol.prop(context.scene.seurat_options, 'preview_resolution')
+        subcol.prop(context.scene.seurat_options, 'preview_samples')
+        subcol.prop(context.scene.seurat_options, 'preview_output_path')
+        subcol.prop(context.scene.seurat_options, 'preview_process')
 
 
 def register():
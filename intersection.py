@@ -0,0 +1,259 @@
+import time
+import bpy
+from bpy.app.handlers import persistent
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from . import boxes
+
+# NumPy is bundled with Blender, the vertex test falls back to Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Object types that can be converted to a mesh and show up in renders
+GEOMETRY_TYPES = {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT'}
+
+# Triangles of the capture box surface, indices into box_corners
+BOX_TRIANGLES = [
+    (0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5),
+    (0, 4, 5), (0, 5, 1), (2, 3, 7), (2, 7, 6),
+    (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)
+]
+
+# Result of the last check, shown in the Seurat panel. 'boxes' maps the name
+# of every checked capture box to its intersecting objects, 'objects' lists
+# the objects intersecting any box
+box_status = {
+    'checked': False,
+    'objects': [],
+    'boxes': {},
+    'time': 0.0
+}
+
+
+def box_bounds(location, scale):
+    """Returns the lower and upper bounds of a capture box as two Vectors"""
+    location = Vector(location)
+    extent = Vector([abs(value) for value in scale])
+    return location - extent, location + extent
+
+
+def box_corners(box_min, box_max):
+    # Corner i uses the upper bound on the axes of the set bits of i (x is bit 2)
+    return [Vector((box_max[0] if i & 4 else box_min[0],
+                    box_max[1] if i & 2 else box_min[1],
+                    box_max[2] if i & 1 else box_min[2])) for i in range(8)]
+
+
+def world_bounds_overlap(matrix, bound_box, box_min, box_max):
+    """Checks if the world space bounding box of an object overlaps the capture box.
+    The local bounding box is transformed as a center and half extents, which
+    is exact for the resulting world space box and avoids transforming all
+    eight corners.
+    """
+    local_min = Vector(bound_box[0])
+    local_max = Vector(bound_box[6])
+    center = matrix @ ((local_min + local_max) * 0.5)
+    half_extent = (local_max - local_min) * 0.5
+
+    for axis in range(3):
+        row = matrix[axis]
+        extent = abs(row[0]) * half_extent[0] + abs(row[1]) * half_extent[1] + abs(row[2]) * half_extent[2]
+        if center[axis] + extent < box_min[axis] or center[axis] - extent > box_max[axis]:
+            return False
+    return True
+
+
+def mesh_triangles(obj):
+    """Returns the vertices and triangles of the evaluated mesh of an object.
+    Returns:
+      A tuple of the object space vertex coordinates (a (N, 3) NumPy array, or
+      a list of Vectors without NumPy) and the triangles (a list of vertex
+      index triples), or None if the object has no faces.
+    """
+    mesh = obj.to_mesh()
+    if mesh is None:
+        return None
+
+    try:
+        mesh.calc_loop_triangles()
+        if not mesh.loop_triangles:
+            return None
+
+        if numpy is not None:
+            # Bulk copies are much faster than reading the elements one by one
+            vertices = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float64)
+            mesh.vertices.foreach_get('co', vertices)
+            triangles = numpy.empty(len(mesh.loop_triangles) * 3, dtype=numpy.int32)
+            mesh.loop_triangles.foreach_get('vertices', triangles)
+            return vertices.reshape(-1, 3), triangles.reshape(-1, 3).tolist()
+
+        vertices = [vertex.co.copy() for vertex in mesh.vertices]
+        triangles = [tuple(triangle.vertices) for triangle in mesh.loop_triangles]
+        return vertices, triangles
+    finally:
+        obj.to_mesh_clear()
+
+
+def mesh_geometry(obj):
+    """Returns the vertices and an object space BVH tree of an object's mesh.
+    Returns:
+      A tuple like mesh_triangles, with the triangles replaced by a BVHTree,
+      or None if the object has no faces.
+    """
+    triangles = mesh_triangles(obj)
+    if triangles is None:
+        return None
+
+    vertices, triangles = triangles
+    vertex_list = vertices.tolist() if numpy is not None else vertices
+    return vertices, BVHTree.FromPolygons(vertex_list, triangles)
+
+
+def vertex_inside_box(vertices, matrix, box_min, box_max):
+    """Checks if any vertex of a mesh lies inside the capture box"""
+    if numpy is not None:
+        rotation = numpy.array(matrix.to_3x3(), dtype=numpy.float64)
+        translation = numpy.array(matrix.translation, dtype=numpy.float64)
+        world_vertices = vertices @ rotation.T + translation
+        inside = numpy.all((world_vertices >= tuple(box_min)) & (world_vertices <= tuple(box_max)), axis=1)
+        return bool(inside.any())
+
+    for vertex in vertices:
+        world_vertex = matrix @ vertex
+        if all(box_min[axis] <= world_vertex[axis] <= box_max[axis] for axis in range(3)):
+            return True
+    return False
+
+
+def mesh_intersects_box(geometry, matrix, box_min, box_max):
+    """Exact test of an object's mesh against the capture box.
+    A mesh intersects the box if one of its triangles crosses the box surface,
+    or if it lies inside the box without touching the surface. In the latter
+    case all its vertices are inside, so testing the vertices is sufficient.
+    """
+    vertices, tree = geometry
+
+    if vertex_inside_box(vertices, matrix, box_min, box_max):
+        return True
+
+    # Test in object space, the box is transformed instead of the mesh so the
+    # mesh tree can be shared by all instances of an object
+    matrix_inverse = matrix.inverted_safe()
+    corners = [matrix_inverse @ corner for corner in box_corners(box_min, box_max)]
+    box_tree = BVHTree.FromPolygons(corners, BOX_TRIANGLES)
+    return bool(tree.overlap(box_tree))
+
+
+def find_intersecting_objects(depsgraph, location, scale):
+    """Finds all renderable objects that intersect a capture box.
+    Object instances are filtered on their world space bounding box first,
+    only the remaining candidates are tested triangle by triangle.
+    Args:
+      depsgraph: The evaluated depsgraph of the view layer.
+      location: Location of the capture box.
+      scale: Scale of the capture box, the half size on every axis.
+    Returns:
+      A tuple of the sorted names of the intersecting objects, the number of
+      tested instances and the time the check took in seconds.
+    """
+    start_time = time.perf_counter()
+    box_min, box_max = box_bounds(location, scale)
+
+    # The mesh of an object is evaluated once and shared by its instances
+    geometries = {}
+    intersecting = set()
+    instance_count = 0
+
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.type not in GEOMETRY_TYPES:
+            continue
+
+        # Instanced objects are rendered even if the source object isn't
+        if not instance.is_instance and obj.hide_render:
+            continue
+
+        instance_count += 1
+        name = instance.parent.name if instance.is_instance else obj.name
+        if name in intersecting:
+            continue
+
+        matrix = instance.matrix_world.copy()
+        if not world_bounds_overlap(matrix, obj.bound_box, box_min, box_max):
+            continue
+
+        if obj.name not in geometries:
+            geometries[obj.name] = mesh_geometry(obj)
+
+        geometry = geometries[obj.name]
+        if geometry is not None and mesh_intersects_box(geometry, matrix, box_min, box_max):
+            intersecting.add(name)
+
+    return sorted(intersecting), instance_count, time.perf_counter() - start_time
+
+
+def check_capture_box(scene, depsgraph, capture_box=None):
+    """Checks capture boxes of a scene and stores the result in box_status.
+    Args:
+      capture_box: The capture box to check, None checks every capture box.
+    Returns:
+      The names of the objects intersecting the checked boxes, or None without
+      a capture box.
+    """
+    if capture_box is None:
+        capture_boxes = boxes.scene_boxes(scene)
+        box_status['boxes'] = {}
+    else:
+        capture_boxes = [capture_box]
+
+    if not capture_boxes:
+        box_status.update(checked=False, objects=[], boxes={}, time=0.0)
+        return None
+
+    objects = set()
+    check_time = 0.0
+    for capture_box in capture_boxes:
+        box_objects, instance_count, box_time = find_intersecting_objects(
+            depsgraph, capture_box.location, capture_box.scale)
+
+        print(f"Checked {instance_count} objects for {capture_box.name} intersections in {box_time * 1000:.1f} ms")
+        box_status['boxes'][capture_box.name] = box_objects
+        objects.update(box_objects)
+        check_time += box_time
+
+    # Boxes that were removed or renamed since their check are dropped
+    box_names = {obj.name for obj in boxes.scene_boxes(scene)}
+    box_status['boxes'] = {name: box_objects for name, box_objects in box_status['boxes'].items()
+                           if name in box_names}
+    box_status.update(checked=True, time=check_time,
+                      objects=sorted(set().union(*box_status['boxes'].values())))
+    return sorted(objects)
+
+
+@persistent
+def capture_box_moved(scene, depsgraph):
+    # Check a capture box again when it's moved or scaled
+    if not scene.seurat_options.check_capture_box_on_move:
+        return
+
+    for update in depsgraph.updates:
+        if not update.is_updated_transform or not isinstance(update.id, bpy.types.Object):
+            continue
+
+        # The updated object is the evaluated copy, its collections are looked
+        # up on the original
+        capture_box = scene.objects.get(update.id.name)
+        if boxes.is_capture_box(capture_box):
+            check_capture_box(scene, depsgraph, capture_box)
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(capture_box_moved)
+
+
+def unregister():
+    if capture_box_moved in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(capture_box_moved)
@@ -0,0 +1,304 @@
+import os
+import json
+import struct
+import hashlib
+import bpy
+from . import intersection
+
+# NumPy is bundled with Blender, vertices are hashed in Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# File name of the capture journal inside the capture output path
+JOURNAL_FILE_NAME = "capture_journal.json"
+
+JOURNAL_VERSION = 1
+
+# Material settings that change renders besides the shader nodes, ID data
+# like the user count changes with unrelated edits
+MATERIAL_PROPERTIES = ['diffuse_color', 'metallic', 'roughness', 'blend_method', 'shadow_method',
+                       'use_backface_culling', 'use_screen_refraction', 'pass_index']
+
+# Node properties that only change the node editor, not the renders
+NODE_EDITOR_PROPERTIES = {'name', 'label', 'location', 'width', 'width_hidden', 'height', 'dimensions',
+                          'select', 'hide', 'show_options', 'show_preview', 'show_texture',
+                          'use_custom_color', 'color'}
+
+
+def rna_fingerprint(struct):
+    """Collects the simple property values of a Blender struct.
+    Args:
+      struct: A bpy struct, e.g. scene.cycles or scene.render.
+    Returns:
+      A dict with the values of all boolean, number, enum and string
+      properties, pointer and collection properties are skipped.
+    """
+    values = {}
+    for prop in struct.bl_rna.properties:
+        if prop.type in {'POINTER', 'COLLECTION'} or prop.identifier == 'rna_type':
+            continue
+        value = getattr(struct, prop.identifier, None)
+        if prop.type == 'ENUM' and prop.is_enum_flag:
+            value = sorted(value)
+        elif getattr(prop, 'is_array', False):
+            value = list(value)
+        values[prop.identifier] = value
+    return values
+
+
+def socket_value(socket):
+    # Vector and color values are copied, sockets without a value give None
+    value = getattr(socket, 'default_value', None)
+    return list(value) if hasattr(value, '__len__') and not isinstance(value, str) else value
+
+
+def image_fingerprint(image):
+    """Identifies an image by its path and the modification time of its file,
+    so a replaced texture or HDRI is detected without reading it"""
+    if image is None:
+        return None
+
+    modified = None
+    if image.source in {'FILE', 'SEQUENCE', 'MOVIE', 'TILED'} and image.packed_file is None:
+        try:
+            modified = os.path.getmtime(bpy.path.abspath(image.filepath, library=image.library))
+        except OSError:
+            pass
+    return [image.name, image.source, image.filepath, modified, image.is_dirty]
+
+
+def node_tree_fingerprint(node_tree, visited=None):
+    """Collects the nodes, their settings and input values and the links of a node tree.
+    Node groups are followed, a group used several times is collected once.
+    """
+    if node_tree is None:
+        return None
+    visited = set() if visited is None else visited
+    if node_tree.name in visited:
+        return node_tree.name
+    visited.add(node_tree.name)
+
+    nodes = []
+    for node in sorted(node_tree.nodes, key=lambda node: node.name):
+        settings = {name: value for name, value in rna_fingerprint(node).items()
+                    if name not in NODE_EDITOR_PROPERTIES}
+        nodes.append([node.name, node.bl_idname, settings,
+                      [socket_value(socket) for socket in node.inputs],
+                      image_fingerprint(getattr(node, 'image', None)),
+                      node_tree_fingerprint(getattr(node, 'node_tree', None), visited)])
+
+    links = sorted([link.from_node.name, link.from_socket.identifier, link.to_node.name,
+                    link.to_socket.identifier, link.is_muted] for link in node_tree.links)
+    return [node_tree.name, nodes, links]
+
+
+def material_fingerprint(material):
+    """Collects the settings and shader nodes of a material"""
+    if material is None:
+        return None
+
+    return [material.name, [getattr(material, name, None) for name in MATERIAL_PROPERTIES],
+            material.use_nodes, node_tree_fingerprint(material.node_tree) if material.use_nodes else None]
+
+
+def world_fingerprint(world):
+    """Collects the color and background nodes of a world"""
+    if world is None:
+        return None
+
+    return [world.name, list(world.color), world.use_nodes,
+            node_tree_fingerprint(world.node_tree) if world.use_nodes else None]
+
+
+def geometry_hash(obj):
+    """Hashes the evaluated geometry and the materials of an object.
+    Returns:
+      The hash as a hexadecimal string.
+    """
+    content_hash = hashlib.sha1()
+    triangles = intersection.mesh_triangles(obj)
+    if triangles is not None:
+        vertices, triangles = triangles
+        if numpy is not None:
+            content_hash.update(numpy.ascontiguousarray(vertices, dtype=numpy.float64).tobytes())
+        else:
+            content_hash.update(struct.pack(f'<{len(vertices) * 3}d', *[value for vertex in vertices for value in vertex]))
+        content_hash.update(json.dumps(triangles).encode())
+
+    materials = [material_fingerprint(slot.material) for slot in obj.material_slots]
+    content_hash.update(json.dumps([obj.type, materials], default=str).encode())
+    return content_hash.hexdigest()
+
+
+def render_settings_fingerprint(scene, view_layer):
+    """Collects the render settings that affect the captured images.
+    Returns:
+      A dict of render, color management and engine settings.
+    """
+    # Persistent data only keeps the scene loaded between renders
+    render = rna_fingerprint(scene.render)
+    render.pop('use_persistent_data', None)
+
+    fingerprint = {
+        'engine': scene.render.engine,
+        'render': render,
+        'view_settings': rna_fingerprint(scene.view_settings),
+        'view_layer': rna_fingerprint(view_layer),
+        'world': world_fingerprint(scene.world)
+    }
+
+    # Engine specific settings are only present when the engine is enabled
+    if scene.render.engine == 'CYCLES' and hasattr(scene, 'cycles'):
+        fingerprint['cycles'] = rna_fingerprint(scene.cycles)
+    elif scene.render.engine.startswith('BLENDER_EEVEE'):
+        fingerprint['eevee'] = rna_fingerprint(scene.eevee)
+
+    return fingerprint
+
+
+def object_fingerprint(obj):
+    """Collects the data of an evaluated object that affects the renders.
+    Geometry is hashed with its vertex positions and triangles, materials with
+    their shader nodes.
+    Args:
+      obj: An evaluated object from the depsgraph.
+    Returns:
+      A JSON serializable list describing the object.
+    """
+    fingerprint = [
+        obj.name,
+        obj.type,
+        [list(row) for row in obj.matrix_world],
+        obj.data.name if obj.data else None,
+        obj.hide_render
+    ]
+
+    if obj.type in intersection.GEOMETRY_TYPES:
+        # The geometry hash covers the materials as well
+        fingerprint.append(geometry_hash(obj))
+    elif obj.type == 'LIGHT':
+        fingerprint.append(rna_fingerprint(obj.data))
+
+    return fingerprint
+
+
+def scene_fingerprint(depsgraph):
+    """Computes a hash of all evaluated objects in the depsgraph.
+    Returns:
+      The hash as a hexadecimal string.
+    """
+    scene_hash = hashlib.sha1()
+    for obj in sorted(depsgraph.objects, key=lambda obj: obj.name):
+        scene_hash.update(json.dumps(object_fingerprint(obj), default=str).encode())
+    return scene_hash.hexdigest()
+
+
+def face_hash(position, face, render_fingerprint, visible_objects=None):
+    """Computes the hash of everything that affects the render of a single face.
+    Args:
+      position: The camera position as a list of 3 floats.
+      face: Name of the cube map face.
+      render_fingerprint: A dict with the settings shared by all faces of the
+        capture run (resolution, clip planes, render settings, scene hash).
+      visible_objects: Optional list of [name, content hash] pairs of the
+        objects in the face's frustum, used instead of a scene hash.
+    Returns:
+      The hash as a hexadecimal string.
+    """
+    data = [list(position), face, render_fingerprint]
+    if visible_objects is not None:
+        data.append(visible_objects)
+    data = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def view_key(face, view_group_index):
+    return "%s.%04d" % (face, view_group_index)
+
+
+class CaptureJournal:
+    """Records every captured face, so an interrupted capture can be resumed"""
+
+    def __init__(self, output_path):
+        self.path = os.path.join(output_path, JOURNAL_FILE_NAME)
+        self.views = {}
+        self.view_groups = {}
+        # Content hashes of the objects and the objects in the frustum of every
+        # face, recorded by change-aware captures
+        self.objects = {}
+        self.frusta = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as journal_file:
+                    data = json.load(journal_file)
+            except (OSError, ValueError):
+                print("Capture journal is unreadable, capturing everything")
+                return
+
+            if data.get('version') == JOURNAL_VERSION:
+                self.views = data['views']
+                self.view_groups = data['view_groups']
+                self.objects = data.get('objects', {})
+                self.frusta = data.get('frusta', {})
+
+    def is_captured(self, face, view_group_index, expected_hash, file_paths):
+        """Checks if a face was captured with the expected inputs and its images still exist"""
+        if self.views.get(view_key(face, view_group_index)) != expected_hash:
+            return False
+        return all(os.path.exists(file_path) for file_path in file_paths)
+
+    def record(self, face, view_group_index, position, recorded_hash):
+        self.views[view_key(face, view_group_index)] = recorded_hash
+        self.view_groups["%04d" % view_group_index] = list(position)
+
+    def record_frustum(self, face, view_group_index, object_names):
+        self.frusta[view_key(face, view_group_index)] = object_names
+
+    def changed_objects(self, object_hashes):
+        """Compares object content hashes with the recorded ones.
+        Returns:
+          The sorted names of the added, removed and changed objects, or None
+          if no object hashes were recorded.
+        """
+        if not self.objects:
+            return None
+        names = set(self.objects) | set(object_hashes)
+        return sorted(name for name in names if self.objects.get(name) != object_hashes.get(name))
+
+    def captured_view_groups(self, expected_hashes):
+        """Returns the view groups that are fully captured with the expected inputs.
+        Args:
+          expected_hashes: A dict mapping view group indices to a dict of face
+            hashes for the current capture run.
+        Returns:
+          A list of (view group index, position) tuples ordered by index.
+        """
+        view_groups = []
+        for view_group_index in sorted(expected_hashes):
+            face_hashes = expected_hashes[view_group_index]
+            if all(self.views.get(view_key(face, view_group_index)) == face_hashes[face] for face in face_hashes):
+                view_groups.append((view_group_index, self.view_groups["%04d" % view_group_index]))
+        return view_groups
+
+    def update(self, other):
+        """Merges the entries of another journal into this one"""
+        self.views.update(other.views)
+        self.view_groups.update(other.view_groups)
+        self.objects.update(other.objects)
+        self.frusta.update(other.frusta)
+
+    def save(self):
+        # Write to a temporary file first, an interrupted write never
+        # corrupts the journal
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'w') as journal_file:
+            json.dump({'version': JOURNAL_VERSION,
+                       'views': self.views,
+                       'view_groups': self.view_groups,
+                       'objects': self.objects,
+                       'frusta': self.frusta}, journal_file)
+        os.replace(temporary_path, self.path)
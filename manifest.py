@@ -0,0 +1,222 @@
+import os
+import json
+import operator
+from . import math_functions
+
+
+# File name of the manifest inside the capture output path
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Depth types understood by the Seurat pipeline
+DEPTH_TYPES = {'EYE_Z', 'RAY_DEPTH', 'WINDOW_Z'}
+
+# Keys of the color and depth image entries of a view
+COLOR_CHANNEL_KEYS = ['channel_0', 'channel_1', 'channel_2', 'channel_alpha']
+DEPTH_CHANNEL_KEYS = ['channel_0']
+
+
+class ManifestError(Exception):
+    """Raised when a manifest can't be read or doesn't match the Seurat schema"""
+
+
+class ManifestStream:
+    """Writes view groups to a manifest file one at a time.
+    The file is a complete manifest after every written view group, so an
+    interrupted capture leaves a valid manifest of the captured view groups.
+    """
+
+    def __init__(self, path, compact=False):
+        self.path = path
+        self.compact = compact
+        self.view_group_count = 0
+
+        # JSON escapes all non-ASCII characters, so string and byte offsets match
+        if compact:
+            self.prefix, self.separator, self.suffix = '{"view_groups":[', ',', ']}'
+        else:
+            self.prefix, self.separator, self.suffix = '{\n  "view_groups": [\n', ',\n', '\n  ]\n}\n'
+
+        self.file = open(path, 'wb')
+        self.file.write((self.prefix + self.suffix).encode())
+        self.file.flush()
+        self.end = len(self.prefix)
+
+    def write(self, view_group):
+        """Appends a view group dict to the manifest"""
+        if self.compact:
+            text = json.dumps(view_group, separators=(',', ':'))
+        else:
+            # Same layout as dumping the whole manifest with indent=2
+            text = json.dumps(view_group, indent=2).replace('\n', '\n    ')
+            text = '    ' + text
+
+        if self.view_group_count:
+            text = self.separator + text
+
+        # Overwrite the closing brackets, they're written again after the view group
+        self.file.seek(self.end)
+        self.file.write((text + self.suffix).encode())
+        self.file.flush()
+        self.end += len(text)
+        self.view_group_count += 1
+
+    def close(self):
+        self.file.close()
+
+
+class ManifestWriter(ManifestStream):
+    """Creates and writes the view groups of a capture run.
+    The projection matrix and the per-face rotations are computed once, only
+    the translation differs between view groups.
+    """
+
+    def __init__(self, path, headbox_center, image_size, near_clip, far_clip, depth_type,
+                 color_file_path_pattern, depth_file_path_pattern,
+                 color_channel_names=('R', 'G', 'B', 'A'), depth_channel_name='R', compact=False):
+        super().__init__(path, compact)
+        self.headbox_center = list(headbox_center)
+        self.image_size = image_size
+        self.depth_type = depth_type
+        self.color_file_path_pattern = color_file_path_pattern
+        self.depth_file_path_pattern = depth_file_path_pattern
+        self.color_channel_names = list(color_channel_names)
+        self.depth_channel_name = depth_channel_name
+
+        self.clip_from_eye_matrix = math_functions.cube_face_projection_matrix(near_clip, far_clip)
+        self.face_matrices = [math_functions.world_eye_matrix_from_face(face) for face in math_functions.CUBE_FACES]
+
+    def create_view_group(self, view_group_index, absolute_position, image_sizes=None):
+        """Creates the manifest entry of a view group.
+        Args:
+          view_group_index: Index of the view group, used in the image names.
+          absolute_position: Position of the view group as a list of 3 floats.
+          image_sizes: Optional dict mapping faces to their image size, faces
+            that aren't in it use the image size of the capture run.
+        Returns:
+          The view group as a dict.
+        """
+        # Camera position relative to headbox center.
+        position = list(map(operator.sub, absolute_position, self.headbox_center))
+        file_name_data = {'index': view_group_index}
+
+        image_sizes = image_sizes or {}
+
+        views = []
+        for face, face_matrix in zip(math_functions.CUBE_FACES, self.face_matrices):
+            # Set translation component of world-from-eye matrix.
+            world_from_eye_matrix = list(face_matrix)
+            for i in range(3):
+                world_from_eye_matrix[4 * i + 3] = position[i]
+
+            image_size = image_sizes.get(face, self.image_size)
+            camera = {
+                'image_width': image_size,
+                'image_height': image_size,
+                'clip_from_eye_matrix': self.clip_from_eye_matrix,
+                'world_from_eye_matrix': world_from_eye_matrix,
+                'depth_type': self.depth_type
+            }
+
+            file_name_data['face'] = face
+            color = {'path': self.color_file_path_pattern % file_name_data}
+            color.update(zip(COLOR_CHANNEL_KEYS, self.color_channel_names))
+            depth = {'path': self.depth_file_path_pattern % file_name_data,
+                     'channel_0': self.depth_channel_name}
+
+            views.append({
+                'projective_camera': camera,
+                'depth_image_file': {'color': color, 'depth': depth}
+            })
+        return {'views': views}
+
+    def write_view_group(self, view_group_index, absolute_position, image_sizes=None):
+        self.write(self.create_view_group(view_group_index, absolute_position, image_sizes))
+
+
+def read_manifest(path):
+    """Reads and validates a manifest.
+    Returns:
+      The manifest as a dict.
+    Raises:
+      ManifestError: The manifest is unreadable or invalid.
+    """
+    try:
+        with open(path, 'r') as json_file:
+            data = json.load(json_file)
+    except (OSError, ValueError) as error:
+        raise ManifestError(f"Could not read {path}: {error}")
+
+    errors = validate_manifest(data)
+    if errors:
+        raise ManifestError(f"{path} is invalid: " + "; ".join(errors[:10]))
+    return data
+
+
+def is_matrix(value):
+    return (isinstance(value, list) and len(value) == 16 and
+            all(isinstance(element, (int, float)) for element in value))
+
+
+def validate_image_file(image_file, channel_keys, name):
+    errors = []
+    if not isinstance(image_file, dict):
+        return [f"{name} is missing"]
+
+    if not isinstance(image_file.get('path'), str) or not image_file['path']:
+        errors.append(f"{name} has no path")
+    for key in channel_keys:
+        if not isinstance(image_file.get(key), str):
+            errors.append(f"{name} has no {key}")
+    return errors
+
+
+def validate_view(view, name):
+    errors = []
+    camera = view.get('projective_camera') if isinstance(view, dict) else None
+    if not isinstance(camera, dict):
+        return [f"{name} has no projective_camera"]
+
+    for key in ('image_width', 'image_height'):
+        value = camera.get(key)
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            errors.append(f"{name} has an invalid {key}")
+    for key in ('clip_from_eye_matrix', 'world_from_eye_matrix'):
+        if not is_matrix(camera.get(key)):
+            errors.append(f"{name} has an invalid {key}")
+    if camera.get('depth_type') not in DEPTH_TYPES:
+        errors.append(f"{name} has an invalid depth_type")
+
+    image_files = view.get('depth_image_file')
+    if not isinstance(image_files, dict):
+        errors.append(f"{name} has no depth_image_file")
+        return errors
+
+    errors.extend(validate_image_file(image_files.get('color'), COLOR_CHANNEL_KEYS, name + " color"))
+    errors.extend(validate_image_file(image_files.get('depth'), DEPTH_CHANNEL_KEYS, name + " depth"))
+    return errors
+
+
+def validate_manifest(data):
+    """Checks a manifest against the schema read by the Seurat pipeline.
+    Returns:
+      A list of error messages, empty if the manifest is valid.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('view_groups'), list):
+        return ["the manifest has no view_groups list"]
+    if not data['view_groups']:
+        return ["the manifest has no view groups"]
+
+    errors = []
+    for group_index, view_group in enumerate(data['view_groups']):
+        views = view_group.get('views') if isinstance(view_group, dict) else None
+        if not isinstance(views, list) or not views:
+            errors.append(f"view group {group_index} has no views")
+            continue
+
+        for view_index, view in enumerate(views):
+            errors.extend(validate_view(view, f"view {view_index} of view group {group_index}"))
+    return errors
+
+
+def manifest_path(output_path):
+    return os.path.join(output_path, MANIFEST_FILE_NAME)
@@ -1,8 +1,32 @@
 import os
 import json
 import math
+import heapq
+import random
 import operator
 
+# NumPy is bundled with Blender, the pure Python functions are used when it
+# isn't available
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Cube map faces in the order of the per-face matrix arrays
+CUBE_FACES = ['front', 'back', 'left', 'right', 'bottom', 'top']
+
+# Largest digit reversal lookup table, every lookup reverses several digits
+MAX_DIGIT_TABLE_SIZE = 256
+
+# Seed of the randomized samplers, camera positions must be reproducible
+SAMPLER_SEED = 0
+
+# Sobol direction number parameters (degree s, coefficients a, initial m)
+# of the second and third dimension, from Joe and Kuo. The first dimension
+# is the van der Corput sequence.
+SOBOL_PARAMETERS = [(1, 0, [1]), (2, 1, [1, 3])]
+SOBOL_BITS = 32
+
 
 def project_point(matrix, point):
     """Projects a 3D point using a 4x4 matrix.
@@ -19,7 +43,7 @@ def project_point(matrix, point):
         # point.w = 1.0 implicitly
         result_hom[row] += matrix[4 * row + 3]
     w = result_hom[3]
-    return list(map(operator.div, result_hom[0:3], [w, w, w]))
+    return list(map(operator.truediv, result_hom[0:3], [w, w, w]))
 
 
 def world_eye_matrix_from_face(face_name):
@@ -34,32 +58,32 @@ def world_eye_matrix_from_face(face_name):
     """
     # pylint: disable=bad-whitespace
     # pylint: disable=bad-continuation
-    if face_name is 'front':  # DONE
+    if face_name == 'front':  # DONE
         return [1.0,  0.0,  0.0,  0.0,
                 0.0,  0.0,  -1.0,  0.0,
                 0.0,  1.0,  0.0,  0.0,
                 0.0,  0.0,  0.0,  1.0]  # pyformat: disable
-    elif face_name is 'back':  # DONE
+    elif face_name == 'back':  # DONE
         return [-1.0,  0.0,  0.0,  0.0,
                 0.0,  0.0,  1.0,  0.0,
                 0.0,  1.0, 0.0,  0.0,
                 0.0,  0.0,  0.0,  1.0]  # pyformat: disable
-    elif face_name is 'left':  # DONE
+    elif face_name == 'left':  # DONE
         return [0.0,  0.0,  1.0,  0.0,
                 1.0,  0.0,  0.0,  0.0,
                 0.0,  1.0,  0.0,  0.0,
                 0.0,  0.0,  0.0,  1.0]  # pyformat: disable
-    elif face_name is 'right':  # DONE
+    elif face_name == 'right':  # DONE
         return [0.0,  0.0, -1.0,  0.0,
                 -1.0,  0.0,  0.0,  0.0,
                 0.0,  1.0,  0.0,  0.0,
                 0.0,  0.0,  0.0,  1.0]  # pyformat: disable
-    elif face_name is 'bottom':  # DONE
+    elif face_name == 'bottom':  # DONE
         return [1.0,  0.0,  0.0,  0.0,
                 0.0,  1.0,  0.0,  0.0,
                 0.0,  0.0,  1.0,  0.0,
                 0.0,  0.0,  0.0,  1.0]  # pyformat: disable
-    elif face_name is 'top':  # DONE
+    elif face_name == 'top':  # DONE
         return [1.0,  0.0,  0.0,  0.0,
                 0.0,  -1.0, 0.0,  0.0,
                 0.0,  0.0,  -1.0,  0.0,
@@ -103,46 +127,173 @@ def cube_face_projection_matrix(near, far):
             0.0, 0.0, -1.0, 0.0]  # pyformat: disable
 
 
-# OLD FUNCTION, REMOVE
-# def radical_inverse2(a, base):
-#     """Computes the radical inverse of |a| in base |base|.
-#     Args:
-#       a: The integer number for which the radical inverse is computed.
-#       base: The radical inverse is computed in this base (integer).
-#     Returns:
-#       The radical inverse as a float in the range [0.0, 1.0).
-#     """
-#     reversed_digits = 0
-#     base_n = 1
-#     # Compute the reversed digits, base b.
-#     while a > 0:
-#         next_a = a / base
-#         digit = a - next_a * base
-#         reversed_digits = reversed_digits * base + digit
-#         base_n *= base
-#         a = next_a
-#     # Only when done are the reversed digits divided by b^n.
-#     return min(reversed_digits / float(base_n), 1.0)
-
-
-def radical_inverse(a, base):
+# Digit reversal tables, cached per base and permutation
+digit_reversal_tables = {}
+
+
+def digit_reversal_table(base, permutation=None):
+    """Creates a lookup table that reverses several base |base| digits at once.
+    Args:
+      base: The base of the digits (integer).
+      permutation: Optional list mapping every digit to its scrambled digit,
+        must map 0 to 0.
+    Returns:
+      A tuple of the table (a list of integers) and its size. Entry i holds the
+      digits of i in reversed order, padded to the digit count of the table.
+    """
+    key = (base, tuple(permutation) if permutation else None)
+    if key in digit_reversal_tables:
+        return digit_reversal_tables[key]
+
+    digits = 1
+    while base ** (digits + 1) <= MAX_DIGIT_TABLE_SIZE:
+        digits += 1
+    size = base ** digits
+
+    table = []
+    for value in range(size):
+        reversed_value = 0
+        for _ in range(digits):
+            digit = value % base
+            if permutation:
+                digit = permutation[digit]
+            reversed_value = reversed_value * base + digit
+            value //= base
+        table.append(reversed_value)
+
+    digit_reversal_tables[key] = (table, size)
+    return table, size
+
+
+def radical_inverse(a, base, permutation=None):
     """Computes the radical inverse of |a| in base |base|.
+    The reversed digits are computed exactly as an integer, using a lookup
+    table for several digits at a time, and divided by b^n once at the end.
     Args:
       a: The integer number for which the radical inverse is computed.
       base: The radical inverse is computed in this base (integer).
+      permutation: Optional digit permutation used for scrambling, must map 0
+        to 0.
     Returns:
       The radical inverse as a float in the range [0.0, 1.0).
     """
-    digit = 1.0 / float(base)
-    radical = digit
-    inverse = 0.0
-
-    while (a > 0):
-        inverse += digit * float(a % base)
-        digit *= radical
-        a /= base
+    table, size = digit_reversal_table(base, permutation)
+    reversed_digits = 0
+    base_n = 1
+    while a > 0:
+        reversed_digits = reversed_digits * size + table[a % size]
+        base_n *= size
+        a //= size
     # Only when done are the reversed digits divided by b^n.
-    return float(inverse)
+    return reversed_digits / base_n
+
+
+def scrambling_permutation(base, rng):
+    """Creates a random digit permutation that keeps 0 in place.
+    Keeping 0 in place means the infinite trailing zero digits stay zero.
+    """
+    permutation = list(range(1, base))
+    rng.shuffle(permutation)
+    return [0] + permutation
+
+
+def sobol_direction_numbers(dimension):
+    """Computes the Sobol direction numbers of a dimension.
+    Args:
+      dimension: Index of the dimension, 0, 1 or 2.
+    Returns:
+      A list of SOBOL_BITS integers, entry k is used for bit k of the index.
+    """
+    if dimension == 0:
+        return [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+
+    s, a, m = SOBOL_PARAMETERS[dimension - 1]
+    v = [m[k] << (SOBOL_BITS - 1 - k) for k in range(s)]
+    for k in range(s, SOBOL_BITS):
+        value = v[k - s] ^ (v[k - s] >> s)
+        for j in range(1, s):
+            if (a >> (s - 1 - j)) & 1:
+                value ^= v[k - j]
+        v.append(value)
+    return v
+
+
+def hammersley_samples(num_samples):
+    """Generates a 3D Hammersley point set.
+    Returns:
+      A list of num_samples points, each a list of 3 floats in [0.0, 1.0).
+    """
+    return [[i / float(num_samples), radical_inverse(i, 2), radical_inverse(i, 3)]
+            for i in range(num_samples)]
+
+
+def halton_samples(num_samples, seed=SAMPLER_SEED):
+    """Generates a 3D scrambled Halton point set (bases 2, 3 and 5).
+    The digits of every dimension are scrambled with a random permutation.
+    Returns:
+      A list of num_samples points, each a list of 3 floats in [0.0, 1.0).
+    """
+    rng = random.Random(seed)
+    permutations = [scrambling_permutation(base, rng) for base in (2, 3, 5)]
+    return [[radical_inverse(i, base, permutation)
+             for base, permutation in zip((2, 3, 5), permutations)]
+            for i in range(num_samples)]
+
+
+def sobol_samples(num_samples):
+    """Generates the first points of the 3D Sobol sequence.
+    Returns:
+      A list of num_samples points, each a list of 3 floats in [0.0, 1.0).
+    """
+    direction_numbers = [sobol_direction_numbers(dim) for dim in range(3)]
+    scale = float(1 << SOBOL_BITS)
+    samples = []
+    for i in range(num_samples):
+        sample = []
+        for v in direction_numbers:
+            value = 0
+            bit = 0
+            index = i
+            while index:
+                if index & 1:
+                    value ^= v[bit]
+                index >>= 1
+                bit += 1
+            sample.append(value / scale)
+        samples.append(sample)
+    return samples
+
+
+def stratified_jitter_samples(num_samples, seed=SAMPLER_SEED):
+    """Generates jittered samples in randomly chosen cells of a 3D grid.
+    The grid has the smallest cube number of cells that fits all samples, every
+    cell holds at most one sample.
+    Returns:
+      A list of num_samples points, each a list of 3 floats in [0.0, 1.0).
+    """
+    cells_per_axis = 1
+    while cells_per_axis ** 3 < num_samples:
+        cells_per_axis += 1
+
+    rng = random.Random(seed)
+    cells = rng.sample(range(cells_per_axis ** 3), num_samples)
+    samples = []
+    for cell in cells:
+        sample = []
+        for _ in range(3):
+            sample.append((cell % cells_per_axis + rng.random()) / cells_per_axis)
+            cell //= cells_per_axis
+        samples.append(sample)
+    return samples
+
+
+# Samplers used to generate camera positions, they return num_samples points
+SAMPLERS = {
+    'HAMMERSLEY': hammersley_samples,
+    'HALTON': halton_samples,
+    'SOBOL': sobol_samples,
+    'JITTER': stratified_jitter_samples
+}
 
 
 def point_in_a_box(box_min, box_max, sample):
@@ -179,9 +330,10 @@ def distance(point_a, point_b):
     return math.sqrt(distance_sqr)
 
 
-def generate_camera_positions(headbox_min, headbox_max, num_cameras):
+def generate_camera_positions(headbox_min, headbox_max, num_cameras, sampler='HAMMERSLEY'):
     """Generates camera positions in a headbox.
-    Camera posittions are computed as a 3D Hammersley point set. The points are
+    Camera posittions are computed as a 3D Hammersley point set (or the point
+    set of another sampler in SAMPLERS). The points are
     transformed such that their bounding box is exactly equal to the headbox. The
     points are then sorted according to distance to the headbox center. Finally,
     the point that is closest to the headbox center is replaced by the headbox
@@ -190,6 +342,7 @@ def generate_camera_positions(headbox_min, headbox_max, num_cameras):
       headbox_min: The lower bounds of the headbox as a list of 3 floats.
       headbox_max: The upper bounds of the headbox as a list of 3 floats.
       num_cameras: The number of cameras to generate. Should be a power of two.
+      sampler: Name of the sampler in SAMPLERS used for the point set.
     Returns:
       A list of 3D points (each a list of 3 floats), representing the positions
       of the generated cameras.
@@ -199,22 +352,26 @@ def generate_camera_positions(headbox_min, headbox_max, num_cameras):
     if num_cameras <= 0:
         raise ValueError('num_cameras must be positive')
 
+    if numpy is not None:
+        positions, _ = camera_position_arrays(
+            headbox_min, headbox_max, num_cameras, sampler)
+        return positions.tolist()
+
+    return generate_camera_positions_python(headbox_min, headbox_max, num_cameras, sampler)
+
+
+def generate_camera_positions_python(headbox_min, headbox_max, num_cameras, sampler='HAMMERSLEY'):
+    """Pure Python implementation of generate_camera_positions."""
+    if num_cameras <= 0:
+        raise ValueError('num_cameras must be positive')
+
     if num_cameras == 1:
         # Use the headbox center if a single camera position is requested.
         return [point_in_a_box(headbox_min, headbox_max, [0.5, 0.5, 0.5])]
 
-    samples = []
-    max_sample = [0.0, 0.0, 0.0]
-    for i in range(num_cameras):
-        # Use a 3D Hammersley point set for the samples.
-        sample = [
-            i / float(num_cameras),
-            radical_inverse(i, 2),
-            radical_inverse(i, 3)
-        ]
-        for dim in range(3):
-            max_sample[dim] = max(max_sample[dim], sample[dim])
-        samples.append(sample)
+    samples = SAMPLERS[sampler](num_cameras)
+    min_sample = [min(sample[dim] for sample in samples) for dim in range(3)]
+    max_sample = [max(sample[dim] for sample in samples) for dim in range(3)]
 
     headbox_center = point_in_a_box(headbox_min, headbox_max, [0.5, 0.5, 0.5])
     camera_positions = []
@@ -222,7 +379,7 @@ def generate_camera_positions(headbox_min, headbox_max, num_cameras):
     for sample in samples:
         # Normalize the samples so that their bounding box is the unit cube.
         for dim in range(3):
-            sample[dim] /= max_sample[dim]
+            sample[dim] = (sample[dim] - min_sample[dim]) / (max_sample[dim] - min_sample[dim])
         position = point_in_a_box(headbox_min, headbox_max, sample)
         camera_positions.append(position)
 
@@ -233,3 +390,222 @@ def generate_camera_positions(headbox_min, headbox_max, num_cameras):
     sorted_positions[0] = point_in_a_box(
         headbox_min, headbox_max, [0.5, 0.5, 0.5])
     return sorted_positions
+
+
+def sphere_directions(num_directions):
+    """Generates evenly distributed unit directions on a Fibonacci sphere.
+    Returns:
+      A list of num_directions unit vectors, each a list of 3 floats.
+    """
+    golden_angle = math.pi * (3.0 - math.sqrt(5.0))
+    directions = []
+    for i in range(num_directions):
+        z = 1.0 - (2.0 * i + 1.0) / num_directions
+        radius = math.sqrt(max(0.0, 1.0 - z * z))
+        angle = golden_angle * i
+        directions.append([radius * math.cos(angle), radius * math.sin(angle), z])
+    return directions
+
+
+def greedy_coverage(seen_sets, max_count, min_gain, first=0):
+    """Greedily picks the sets that add the most unseen elements.
+    Picking stops when max_count sets are picked, or when the best set adds
+    less than min_gain of all elements. Gains only shrink as more elements are
+    covered, so stale gains are recomputed lazily from a heap.
+    Args:
+      seen_sets: A list of sets, the elements seen from every candidate.
+      max_count: Maximum number of sets to pick.
+      min_gain: Minimum fraction of all elements a picked set has to add.
+      first: Index of the set that is always picked first.
+    Returns:
+      A tuple of the picked indices in order of picking, the number of covered
+      elements and the number of elements in all sets.
+    """
+    all_elements = set().union(*seen_sets)
+    total = len(all_elements)
+
+    picked = [first]
+    covered = set(seen_sets[first])
+
+    heap = [(-len(seen), index) for index, seen in enumerate(seen_sets) if index != first]
+    heapq.heapify(heap)
+
+    while heap and len(picked) < max_count:
+        negative_gain, index = heapq.heappop(heap)
+        gain = len(seen_sets[index] - covered)
+        if gain != -negative_gain:
+            # The gain is stale, put it back with the current gain
+            heapq.heappush(heap, (-gain, index))
+            continue
+
+        if total == 0 or gain < min_gain * total:
+            break
+
+        picked.append(index)
+        covered |= seen_sets[index]
+
+    return picked, len(covered), total
+
+
+def nearest_neighbor_order(points, first=0):
+    """Orders points so every point is followed by the closest remaining one.
+    Args:
+      points: A list of points, each a list of floats.
+      first: Index of the point the order starts with.
+    Returns:
+      A list of indices into points.
+    """
+    if not points:
+        return []
+
+    order = [first]
+    remaining = set(range(len(points))) - {first}
+    while remaining:
+        # Ties are broken by index, so the order is reproducible
+        current = points[order[-1]]
+        closest = min(remaining, key=lambda index: (distance(current, points[index]), index))
+        order.append(closest)
+        remaining.remove(closest)
+    return order
+
+
+def radical_inverse_array(indices, base, permutation=None):
+    """Computes the radical inverse of every element of |indices| in base |base|.
+    Uses the same exact integer digit reversal as radical_inverse.
+    Args:
+      indices: A NumPy array of non-negative integers.
+      base: The radical inverse is computed in this base (integer).
+      permutation: Optional digit permutation used for scrambling.
+    Returns:
+      A NumPy float64 array with values in the range [0.0, 1.0).
+    """
+    table, size = digit_reversal_table(base, permutation)
+    table = numpy.array(table, dtype=numpy.int64)
+
+    a = numpy.array(indices, dtype=numpy.int64)
+    reversed_digits = numpy.zeros(a.shape, dtype=numpy.int64)
+    base_n = numpy.ones(a.shape, dtype=numpy.int64)
+
+    # Every iteration handles one table lookup of all indices at once
+    active = a > 0
+    while numpy.any(active):
+        reversed_digits[active] = reversed_digits[active] * size + table[a[active] % size]
+        base_n[active] *= size
+        a //= size
+        active = a > 0
+    return reversed_digits / base_n
+
+
+def hammersley_sample_array(num_samples):
+    """NumPy implementation of hammersley_samples, returns a (N, 3) array."""
+    indices = numpy.arange(num_samples)
+    samples = numpy.empty((num_samples, 3), dtype=numpy.float64)
+    samples[:, 0] = indices / float(num_samples)
+    samples[:, 1] = radical_inverse_array(indices, 2)
+    samples[:, 2] = radical_inverse_array(indices, 3)
+    return samples
+
+
+def halton_sample_array(num_samples, seed=SAMPLER_SEED):
+    """NumPy implementation of halton_samples, returns a (N, 3) array."""
+    rng = random.Random(seed)
+    indices = numpy.arange(num_samples)
+    samples = numpy.empty((num_samples, 3), dtype=numpy.float64)
+    for dim, base in enumerate((2, 3, 5)):
+        samples[:, dim] = radical_inverse_array(indices, base, scrambling_permutation(base, rng))
+    return samples
+
+
+def sobol_sample_array(num_samples):
+    """NumPy implementation of sobol_samples, returns a (N, 3) array."""
+    indices = numpy.arange(num_samples, dtype=numpy.int64)
+    samples = numpy.empty((num_samples, 3), dtype=numpy.float64)
+    for dim in range(3):
+        direction_numbers = sobol_direction_numbers(dim)
+        values = numpy.zeros(num_samples, dtype=numpy.int64)
+        for bit in range(max(1, int(num_samples).bit_length())):
+            values ^= numpy.where((indices >> bit) & 1, direction_numbers[bit], 0)
+        samples[:, dim] = values / float(1 << SOBOL_BITS)
+    return samples
+
+
+def stratified_jitter_sample_array(num_samples, seed=SAMPLER_SEED):
+    """Returns stratified_jitter_samples as a (N, 3) array.
+    The random numbers come from Python's generator, so both code paths
+    produce the same samples.
+    """
+    return numpy.array(stratified_jitter_samples(num_samples, seed), dtype=numpy.float64)
+
+
+# NumPy implementations of SAMPLERS
+SAMPLER_ARRAYS = {
+    'HAMMERSLEY': hammersley_sample_array,
+    'HALTON': halton_sample_array,
+    'SOBOL': sobol_sample_array,
+    'JITTER': stratified_jitter_sample_array
+}
+
+
+def camera_position_arrays(headbox_min, headbox_max, num_cameras, sampler='HAMMERSLEY'):
+    """Generates camera positions in a headbox using NumPy.
+    Same point set and ordering as generate_camera_positions_python, computed
+    for all cameras at once.
+    Args:
+      headbox_min: The lower bounds of the headbox as a list of 3 floats.
+      headbox_max: The upper bounds of the headbox as a list of 3 floats.
+      num_cameras: The number of cameras to generate.
+      sampler: Name of the sampler in SAMPLER_ARRAYS used for the point set.
+    Returns:
+      A tuple of a (num_cameras, 3) array with the camera positions and a
+      (num_cameras,) array with their distances to the headbox center.
+    Raises:
+      ValueError: num_cameras is not positive.
+    """
+    if num_cameras <= 0:
+        raise ValueError('num_cameras must be positive')
+
+    box_min = numpy.array(headbox_min, dtype=numpy.float64)
+    box_max = numpy.array(headbox_max, dtype=numpy.float64)
+    headbox_center = box_min + (box_max - box_min) * 0.5
+
+    if num_cameras == 1:
+        return headbox_center.reshape(1, 3), numpy.zeros(1)
+
+    # Normalize the samples so the bounding box of the samples is the unit cube
+    samples = SAMPLER_ARRAYS[sampler](num_cameras)
+    min_sample = samples.min(axis=0)
+    samples = (samples - min_sample) / (samples.max(axis=0) - min_sample)
+
+    positions = box_min + (box_max - box_min) * samples
+    distances = numpy.sqrt(((positions - headbox_center) ** 2).sum(axis=1))
+
+    # A stable sort keeps ties in the same order as Python's sorted()
+    order = numpy.argsort(distances, kind='stable')
+    positions = positions[order]
+    distances = distances[order]
+
+    # Replace the point closest to the headbox center by the center itself
+    positions[0] = headbox_center
+    distances[0] = 0.0
+    return positions, distances
+
+
+def world_eye_matrices(positions, headbox_center):
+    """Creates the world-from-eye matrices of every face of every camera.
+    Args:
+      positions: A (N, 3) array of absolute camera positions.
+      headbox_center: The headbox center as a list of 3 floats.
+    Returns:
+      A (N, 6, 16) array with the row-major world-from-eye matrices, faces
+      are ordered like CUBE_FACES.
+    """
+    positions = numpy.asarray(positions, dtype=numpy.float64)
+    face_matrices = numpy.array(
+        [world_eye_matrix_from_face(face) for face in CUBE_FACES], dtype=numpy.float64)
+
+    matrices = numpy.repeat(face_matrices[numpy.newaxis], len(positions), axis=0)
+
+    # Set translation component, relative to the headbox center
+    relative_positions = positions - numpy.asarray(headbox_center, dtype=numpy.float64)
+    matrices[:, :, [3, 7, 11]] = relative_positions[:, numpy.newaxis, :]
+    return matrices
@@ -0,0 +1,109 @@
+import os
+import time
+import shutil
+import tempfile
+import concurrent.futures
+
+
+# Threads moving images to the output path, slow network storage handles a
+# few parallel writes better than one
+MAX_WRITER_THREADS = 4
+
+# Appended to an image while it's copied, so an interrupted copy never leaves
+# a file with the final name
+PARTIAL_FILE_SUFFIX = ".partial"
+
+
+def move_file(staged_path, final_path):
+    """Moves a file to its final path, the final name appears atomically"""
+    try:
+        # Renaming is enough when both paths are on the same file system
+        os.replace(staged_path, final_path)
+        return
+    except OSError:
+        pass
+
+    partial_path = final_path + PARTIAL_FILE_SUFFIX
+    shutil.copyfile(staged_path, partial_path)
+    os.replace(partial_path, final_path)
+    os.remove(staged_path)
+
+
+class OutputPool:
+    """Moves rendered images from a local staging directory to the output path.
+    The compositor writes every face to fast local storage, background threads
+    move the images while the next face renders. At most queue_depth faces are
+    in flight, wait_for_capacity blocks until older faces are written.
+    """
+
+    def __init__(self, queue_depth, staging_parent, tracer):
+        self.queue_depth = queue_depth
+        self.tracer = tracer
+        self.staging_path = os.path.join(tempfile.mkdtemp(prefix="seurat_staging_", dir=staging_parent or None), "")
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(queue_depth, MAX_WRITER_THREADS), thread_name_prefix="SeuratWriter")
+        self.pending = []
+        self.wait_time = 0.0
+
+    def submit(self, file_moves, job):
+        """Starts moving the images of a face.
+        Args:
+          file_moves: A list of (staged path, final path) tuples.
+          job: A dict describing the face, returned once the images are moved.
+        """
+        future = self.executor.submit(self.move_files, file_moves, job)
+        self.pending.append((future, job))
+
+    def move_files(self, file_moves, job):
+        # Runs on a writer thread, errors are returned to the main thread
+        with self.tracer.stage('write', view_group=job['view_group_index'], face=job['face']):
+            try:
+                for staged_path, final_path in file_moves:
+                    move_file(staged_path, final_path)
+            except OSError as error:
+                return f"Could not write {job['face']} face of view group {job['view_group_index']}: {error}"
+        return None
+
+    def collect(self, wait_for=None):
+        """Removes finished faces from the queue.
+        Args:
+          wait_for: Number of faces to wait for, None doesn't wait.
+        Returns:
+          A list of (job, error message or None) tuples.
+        """
+        if wait_for:
+            start_time = time.perf_counter()
+            concurrent.futures.wait([future for future, job in self.pending[:wait_for]])
+            self.wait_time += time.perf_counter() - start_time
+
+        finished = [(future, job) for future, job in self.pending if future.done()]
+        self.pending = [(future, job) for future, job in self.pending if not future.done()]
+        return [(job, future.result()) for future, job in finished]
+
+    def wait_for_capacity(self, faces=1):
+        """Blocks until faces more faces fit in the queue.
+        Returns:
+          The finished faces, like collect.
+        """
+        overflow = len(self.pending) + faces - self.queue_depth
+        return self.collect(wait_for=max(overflow, 0))
+
+    def is_writing(self, view_group_index):
+        return any(job['view_group_index'] == view_group_index for future, job in self.pending)
+
+    def drain(self):
+        """Waits for all faces in the queue.
+        Returns:
+          The finished faces, like collect.
+        """
+        return self.collect(wait_for=len(self.pending))
+
+    def close(self):
+        """Finishes the queued faces and removes the staging directory.
+        Returns:
+          The faces that were finished since the last collect.
+        """
+        finished = self.drain()
+        self.executor.shutdown()
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+        return finished
@@ -0,0 +1,192 @@
+import os
+import math
+import time
+import collections
+import concurrent.futures
+from . import exr
+from . import manifest
+
+# NumPy is bundled with Blender, depth samples are checked in Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Images are checked on this many threads, the checks mostly wait for the disk
+PREFLIGHT_THREADS = 16
+
+# Scanline chunks of every depth image whose values are checked
+DEPTH_SAMPLE_CHUNKS = 3
+
+# Depth values may be this fraction closer than the near clipping plane
+# or farther than the far clipping plane
+NEAR_CLIP_TOLERANCE = 1e-3
+FAR_CLIP_TOLERANCE = 1e-3
+
+# Blender writes this depth (1e10) for the background, values at or beyond
+# it aren't geometry
+BACKGROUND_DEPTH = 1e9
+
+# Number of errors shown in the operator report, all errors are printed
+REPORTED_ERRORS = 3
+
+
+def clip_planes(clip_from_eye_matrix):
+    """Returns the near and far clipping distances of a projection matrix.
+    The matrix is an OpenGL-style matrix like cube_face_projection_matrix creates.
+    """
+    e = clip_from_eye_matrix[10]
+    f = clip_from_eye_matrix[11]
+    return f / (e - 1.0), f / (e + 1.0)
+
+
+def referenced_images(data, manifest_directory):
+    """Collects what the manifest expects of every referenced image.
+    Packed images are referenced as color and depth image, their requirements
+    are merged.
+    Returns:
+      A dict mapping absolute image paths to dicts with the expected 'sizes'
+      (a set of (width, height) tuples), the required 'channels' and the
+      'depth_channels' with the (near, far) clip planes of their views.
+    """
+    images = {}
+    for view_group in data['view_groups']:
+        for view in view_group['views']:
+            camera = view['projective_camera']
+            size = (camera['image_width'], camera['image_height'])
+            near_far = clip_planes(camera['clip_from_eye_matrix'])
+
+            image_files = view['depth_image_file']
+            for kind, keys in (('color', manifest.COLOR_CHANNEL_KEYS), ('depth', manifest.DEPTH_CHANNEL_KEYS)):
+                image_file = image_files[kind]
+                path = os.path.join(manifest_directory, image_file['path'])
+                image = images.setdefault(path, {'sizes': set(), 'channels': set(), 'depth_channels': {}})
+
+                image['sizes'].add(size)
+                image['channels'].update(image_file[key] for key in keys)
+                if kind == 'depth':
+                    image['depth_channels'][image_file['channel_0']] = near_far
+    return images
+
+
+def check_depth_values(path, header, channel, near_clip, far_clip):
+    """Samples a depth channel and checks the values against the clip planes.
+    Background pixels are at the far plane or use Blender's background depth,
+    geometry can't be closer than the near plane or farther than the far plane.
+    Returns:
+      An error message, or None if the sampled values are valid.
+    """
+    try:
+        values = exr.read_channel_samples(path, header, channel, DEPTH_SAMPLE_CHUNKS)
+    except exr.ExrError as error:
+        return str(error)
+
+    if len(values) == 0:
+        return None
+
+    if numpy is not None:
+        values = numpy.asarray(values, dtype=numpy.float64)
+        has_nan = bool(numpy.isnan(values).any())
+        closest = float(numpy.nanmin(values)) if not numpy.isnan(values).all() else math.nan
+        geometry = values[values < BACKGROUND_DEPTH]
+        farthest = float(geometry.max()) if len(geometry) else math.nan
+    else:
+        has_nan = any(math.isnan(value) for value in values)
+        closest = min((value for value in values if not math.isnan(value)), default=math.nan)
+        farthest = max((value for value in values if value < BACKGROUND_DEPTH), default=math.nan)
+
+    if has_nan:
+        return f"{path} has NaN depth values in channel {channel}"
+    if closest < near_clip * (1.0 - NEAR_CLIP_TOLERANCE):
+        return (f"{path} has depth {closest:g} in channel {channel}, closer than the near clip "
+                f"{near_clip:g} (far clip {far_clip:g}), the depth pass or channel is wrong")
+    if farthest > far_clip * (1.0 + FAR_CLIP_TOLERANCE):
+        return (f"{path} has depth {farthest:g} in channel {channel}, farther than the far clip "
+                f"{far_clip:g}, the camera clip range doesn't match the manifest")
+    return None
+
+
+def check_image(path, image):
+    """Checks one image against the expectations of the manifest.
+    Only the header, the chunk offset table and a few depth chunks are read.
+    Returns:
+      A tuple of the list of error messages and the list of notes about
+      checks that were skipped.
+    """
+    if not os.path.isfile(path):
+        return [f"{path} is missing"], []
+
+    try:
+        header = exr.read_header(path)
+    except (OSError, exr.ExrError) as error:
+        return [str(error)], []
+
+    errors = []
+    if len(image['sizes']) > 1:
+        errors.append(f"{path} is referenced with different sizes {sorted(image['sizes'])}")
+    if 'dataWindow' not in header or 'channels' not in header:
+        return errors + [f"{path} has no data window or channel list"], []
+
+    size = exr.data_window_size(header)
+    if size not in image['sizes']:
+        expected = " or ".join(f"{width}x{height}" for width, height in sorted(image['sizes']))
+        errors.append(f"{path} is {size[0]}x{size[1]}, the manifest expects {expected}")
+
+    missing_channels = sorted(image['channels'] - set(header['channels']))
+    if missing_channels:
+        errors.append(f"{path} has no channel(s) {', '.join(missing_channels)}")
+
+    # Seurat's images are single part scanline files
+    if not exr.is_scanline(header):
+        return errors, []
+
+    try:
+        exr.check_chunks(path, header)
+    except (OSError, exr.ExrError, ValueError) as error:
+        return errors + [str(error)], []
+
+    if errors:
+        return errors, []
+
+    # Other compression methods can't be decoded, only their headers are checked
+    compression = exr.compression_name(header)
+    if image['depth_channels'] and compression not in exr.DECODABLE_COMPRESSIONS:
+        return errors, [f"depth not checked: compression {compression}"]
+
+    for channel, (near_clip, far_clip) in image['depth_channels'].items():
+        try:
+            error = check_depth_values(path, header, channel, near_clip, far_clip)
+        except OSError as os_error:
+            error = str(os_error)
+        if error is not None:
+            errors.append(error)
+    return errors, []
+
+
+def validate_capture(manifest_path):
+    """Checks a manifest and every image it references.
+    The images are checked in parallel, so hundreds of images take seconds.
+    Args:
+      manifest_path: Path of the manifest, image paths are relative to it.
+    Returns:
+      A tuple of the list of error messages (empty if the capture is valid),
+      the list of notes about skipped checks with the number of affected
+      images, the number of checked images and the time the check took in
+      seconds.
+    Raises:
+      ManifestError: The manifest is unreadable or invalid.
+    """
+    start_time = time.perf_counter()
+    data = manifest.read_manifest(manifest_path)
+    images = referenced_images(data, os.path.dirname(manifest_path))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=PREFLIGHT_THREADS) as executor:
+        results = list(executor.map(lambda item: check_image(*item), sorted(images.items())))
+    errors = [error for image_errors, _ in results for error in image_errors]
+
+    # The same check is usually skipped for every image
+    note_counts = collections.Counter(note for _, image_notes in results for note in image_notes)
+    notes = [f"{note} ({count} images)" for note, count in sorted(note_counts.items())]
+
+    return errors, notes, len(images), time.perf_counter() - start_time
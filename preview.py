@@ -0,0 +1,113 @@
+import os
+import shlex
+import subprocess
+import bpy
+
+
+# Seurat pipeline flags replaced in preview runs, a small texture and mesh
+# process in a fraction of the production time
+PREVIEW_PIPELINE_FLAGS = {
+    '-texture_width': '1024',
+    '-texture_height': '1024',
+    '-triangle_count': '20000'
+}
+
+# Options changed for a preview run, they're restored afterwards
+PREVIEW_OPTIONS = ['view_groups', 'image_resolution', 'capture_output_path', 'mesh_output_path',
+                   'seurat_command_flags', 'import_processed_output']
+
+
+def preview_command_flags(command_flags):
+    """Replaces the texture size and triangle count in the pipeline flags.
+    Flags that aren't set are added, all other flags are kept.
+    """
+    options = shlex.split(command_flags, posix=(os.name != 'nt'))
+    for flag, value in PREVIEW_PIPELINE_FLAGS.items():
+        if flag in options and options.index(flag) + 1 < len(options):
+            options[options.index(flag) + 1] = value
+        else:
+            options += [flag, value]
+    # Quote the flags the way processing splits them again
+    if os.name == 'nt':
+        return subprocess.list2cmdline(options)
+    return " ".join(shlex.quote(option) for option in options)
+
+
+def apply_preview_settings(scene):
+    """Switches the scene to the reduced preview configuration.
+    Returns:
+      The changed settings, pass them to restore_preview_settings.
+    """
+    opt = scene.seurat_options
+    preview_path = bpy.path.abspath(opt.preview_output_path)
+
+    state = {
+        'options': {name: getattr(opt, name) for name in PREVIEW_OPTIONS}
+    }
+
+    opt.view_groups = opt.preview_view_groups
+    opt.image_resolution = opt.preview_resolution
+    opt.capture_output_path = os.path.join(preview_path, "capture", "")
+    opt.mesh_output_path = os.path.join(preview_path, "mesh", "")
+    opt.seurat_command_flags = preview_command_flags(opt.seurat_command_flags)
+    opt.import_processed_output = True
+
+    # Few samples without denoising, noise is fine for checking placement
+    if scene.render.engine == 'CYCLES':
+        state['cycles'] = (scene.cycles.samples, scene.cycles.use_denoising)
+        scene.cycles.samples = opt.preview_samples
+        scene.cycles.use_denoising = False
+    elif scene.render.engine.startswith('BLENDER_EEVEE'):
+        state['eevee'] = scene.eevee.taa_render_samples
+        scene.eevee.taa_render_samples = opt.preview_samples
+
+    return state
+
+
+def restore_preview_settings(scene, state):
+    opt = scene.seurat_options
+    for name, value in state['options'].items():
+        setattr(opt, name, value)
+
+    if 'cycles' in state:
+        scene.cycles.samples, scene.cycles.use_denoising = state['cycles']
+    if 'eevee' in state:
+        scene.eevee.taa_render_samples = state['eevee']
+
+
+class SEURAT_OT_capture_preview(bpy.types.Operator):
+    """Capture and optionally process a low quality preview, to check the capture box and settings quickly"""
+    bl_idname = "seurat.capture_preview"
+    bl_label = "Capture Seurat preview"
+
+    def execute(self, context):
+        scn = context.scene
+        opt = scn.seurat_options
+
+        # The production settings are restored, even if the preview fails
+        state = apply_preview_settings(scn)
+        try:
+            print(f"Capturing preview with {opt.view_groups} view groups at {opt.image_resolution} px")
+            result = bpy.ops.seurat.capture_data()
+            if 'FINISHED' not in result:
+                self.report({'ERROR'}, "Preview capture failed, see the system console")
+                return {'CANCELLED'}
+
+            if opt.preview_process:
+                result = bpy.ops.seurat.process_data()
+                if 'FINISHED' not in result:
+                    self.report({'ERROR'}, "Preview processing failed, see the system console")
+                    return {'CANCELLED'}
+        finally:
+            restore_preview_settings(scn, state)
+
+        self.report({'INFO'}, "Seurat preview finished")
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(SEURAT_OT_capture_preview)
+
+
+def unregister():
+    bpy.utils.unregister_class(SEURAT_OT_capture_preview)
@@ -1,9 +1,135 @@
 import os
+import re
+import queue
+import shlex
+import threading
 import subprocess
 import bpy
 import platform
+from . import manifest
+from . import preflight
+from . import tracing
 
 
+# Pipeline binary shipped with the addon, only available for Windows
+BUNDLED_PIPELINE_NAME = "seurat-pipeline-msvc2017-x64.exe"
+
+# Name of the text datablock the pipeline output is streamed to
+PIPELINE_LOG_NAME = "Seurat pipeline log"
+
+# Percentages printed by the pipeline are used as progress
+PIPELINE_PERCENTAGE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+# Progress of the running pipeline, shown in the Seurat panel
+processing_progress = {
+    'running': False,
+    'stage': "",
+    'percentage': None,
+    'log': []
+}
+
+# Number of log lines shown in the Seurat panel
+PANEL_LOG_LINES = 5
+
+# Functions called with processing_progress whenever the stage or percentage
+# changes, e.g. by the command line interface
+progress_listeners = []
+
+
+def pipeline_binary_path(opt):
+    """Returns the absolute path of the Seurat pipeline binary.
+    The configured path is used when set, otherwise the binary bundled with the
+    addon is used.
+    """
+    if opt.seurat_pipeline_path:
+        return bpy.path.abspath(opt.seurat_pipeline_path)
+
+    directory = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(directory, BUNDLED_PIPELINE_NAME)
+
+
+def pipeline_binary_error(opt, binary_path):
+    """Returns an error message if the pipeline binary doesn't exist, otherwise None"""
+    if os.path.isfile(binary_path):
+        return None
+    if platform.system() != 'Windows' and not opt.seurat_pipeline_path:
+        return 'Set the Seurat pipeline path in the addon preferences to process data on this platform'
+    return f'Seurat pipeline not found at {binary_path}'
+
+
+def pipeline_command(opt, input_path=None, output_directory=None):
+    """Creates the pipeline command as an argument list.
+    Args:
+      input_path: Path of the manifest, the one in the capture output path when None.
+      output_directory: Directory of the output, the mesh output path when None.
+    Returns:
+      A tuple with the argument list and the output directory.
+    """
+    if output_directory is None:
+        output_directory = bpy.path.abspath(opt.mesh_output_path)
+    if input_path is None:
+        input_path = manifest.manifest_path(bpy.path.abspath(opt.capture_output_path))
+    output_path = os.path.join(output_directory, "output")
+
+    # Default is "-texture_width 8192 -texture_height 8192 -pixels_per_degree 20 -triangle_count 180000"
+    options = shlex.split(opt.seurat_command_flags, posix=(os.name != 'nt'))
+
+    cmd = [pipeline_binary_path(opt), "-input_path", input_path, "-output_path", output_path] + options
+    return cmd, output_directory
+
+
+def read_pipeline_output(process, lines):
+    # Runs on a thread, the pipe is read line by line as the pipeline prints
+    for line in process.stdout:
+        lines.put(line.rstrip())
+    process.stdout.close()
+
+
+def import_pipeline_output(output_directory):
+    """Imports the Seurat mesh and assigns the Seurat texture to it"""
+    mesh_path = os.path.join(output_directory, "output.obj")
+    texture_path = os.path.join(output_directory, "output.exr")
+
+    # The new OBJ importer replaced the old one in Blender 3.2
+    if bpy.app.version >= (3, 2, 0):
+        bpy.ops.wm.obj_import(filepath=mesh_path)
+    else:
+        bpy.ops.import_scene.obj(filepath=mesh_path)
+
+    # Lighting is baked into the texture, so the material is emissive
+    material = bpy.data.materials.new("SeuratMaterial")
+    material.use_nodes = True
+    material.blend_method = 'BLEND'
+
+    tree = material.node_tree
+    for node in list(tree.nodes):
+        tree.nodes.remove(node)
+
+    texture_node = tree.nodes.new('ShaderNodeTexImage')
+    texture_node.image = bpy.data.images.load(texture_path, check_existing=True)
+    texture_node.location = -600, 0
+
+    emission_node = tree.nodes.new('ShaderNodeEmission')
+    emission_node.location = -300, 0
+    transparent_node = tree.nodes.new('ShaderNodeBsdfTransparent')
+    transparent_node.location = -300, -150
+
+    mix_node = tree.nodes.new('ShaderNodeMixShader')
+    output_node = tree.nodes.new('ShaderNodeOutputMaterial')
+    output_node.location = 200, 0
+
+    tree.links.new(texture_node.outputs['Color'], emission_node.inputs['Color'])
+    tree.links.new(texture_node.outputs['Alpha'], mix_node.inputs[0])
+    tree.links.new(transparent_node.outputs[0], mix_node.inputs[1])
+    tree.links.new(emission_node.outputs[0], mix_node.inputs[2])
+    tree.links.new(mix_node.outputs[0], output_node.inputs['Surface'])
+
+    # The importer selects the imported objects
+    for obj in bpy.context.selected_objects:
+        if obj.type == 'MESH':
+            obj.data.materials.clear()
+            obj.data.materials.append(material)
+
 
 class SEURAT_OT_process_data(bpy.types.Operator):
     """Process the Seurat capture data and output it to a folder"""
@@ -11,46 +137,209 @@ class SEURAT_OT_process_data(bpy.types.Operator):
     bl_label = "Process Seurat capture data"
 
     def execute(self, context):
+        # Run the pipeline without returning control to the UI
+        if not self.start_pipeline(context):
+            return {'CANCELLED'}
+
+        while self.process.poll() is None:
+            self.process_output(wait=True)
+        self.process_output()
+
+        return self.finish_pipeline(context)
+
+    def invoke(self, context, event):
+        if not self.start_pipeline(context):
+            return {'CANCELLED'}
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.25, window=context.window)
+        wm.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.process.kill()
+            self.process.wait()
+            self.process_output()
+            self.finish_modal(context)
+            self.write_trace(context)
+            self.report({'WARNING'}, "Processing cancelled")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        self.process_output()
+        self.redraw_panels(context)
+
+        if self.process.poll() is None:
+            return {'RUNNING_MODAL'}
+
+        # Read the last lines after the pipeline exited
+        self.process_output()
+        self.finish_modal(context)
+        return self.finish_pipeline(context)
+
+    def start_pipeline(self, context):
         scn = context.scene
         opt = scn.seurat_options
 
-        if platform.system() != 'Windows':
-            self.report({'ERROR'}, 'Processing Seurat data only possible on Windows')
-            return {'CANCELLED'}
+        cmd, output_directory = pipeline_command(opt)
 
-        output_directory = bpy.path.abspath(opt.mesh_output_path)
+        binary_error = pipeline_binary_error(opt, cmd[0])
+        if binary_error is not None:
+            self.report({'ERROR'}, binary_error)
+            return False
 
-        input_path = bpy.path.abspath(os.path.join(opt.capture_output_path + "manifest.json"))
-        output_path = bpy.path.abspath(os.path.join(opt.mesh_output_path + "output"))
+        # Wall time and memory of every stage are written next to the manifest
+        self.tracer = tracing.Tracer('process', tracing.run_metadata(scn), opt.write_trace)
+
+        # Don't start a long pipeline run on a broken manifest or missing,
+        # truncated or mismatched images
+        try:
+            with self.tracer.stage('preflight'):
+                errors, notes, image_count, check_time = preflight.validate_capture(
+                    manifest.manifest_path(bpy.path.abspath(opt.capture_output_path)))
+        except manifest.ManifestError as error:
+            self.report({'ERROR'}, str(error))
+            return False
+
+        print(f"Checked {image_count} captured images in {check_time:.1f} s")
+        for note in notes:
+            self.report({'WARNING'}, note)
+        if errors:
+            for error in errors:
+                print(error)
+            self.report({'ERROR'}, f"{len(errors)} problem(s) with the captured images, see the system console: " +
+                        "; ".join(errors[:preflight.REPORTED_ERRORS]))
+            return False
 
         if not os.path.exists(output_directory):
             try:
                 os.mkdir(output_directory)
-            except:
+            except OSError:
                 self.report({'ERROR'}, 'Failed to create output folder, check the mesh output path')
-                return {'CANCELLED'}
-            
+                return False
+
             print ("Created output directory")
         else:
             print ("Output directory exists")
 
-        script_file = os.path.realpath(__file__)
-        directory = os.path.dirname(script_file)
+        print(subprocess.list2cmdline(cmd))
+
+        self.output_directory = output_directory
+
+        # The log is streamed to a text datablock, it's cleared for every run
+        self.log_text = bpy.data.texts.get(PIPELINE_LOG_NAME) or bpy.data.texts.new(PIPELINE_LOG_NAME)
+        self.log_text.clear()
+        self.log_text.write(subprocess.list2cmdline(cmd) + "\n")
+
+        processing_progress.update(running=True, stage="Starting pipeline", percentage=None, log=[])
+        self.tracer.begin('pipeline')
+
+        try:
+            self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            universal_newlines=True, bufsize=1)
+        except OSError as error:
+            # E.g. the binary isn't executable or is built for another platform
+            self.log_text.write(f"Could not start the pipeline: {error}\n")
+            processing_progress.update(running=False, stage="", percentage=None)
+            self.tracer.end('pipeline')
+            self.report({'ERROR'}, f"Could not start the Seurat pipeline: {error}")
+            return False
+
+        self.lines = queue.Queue()
+        reader = threading.Thread(target=read_pipeline_output, args=(self.process, self.lines), daemon=True)
+        reader.start()
+        self.reader = reader
 
-        options = opt.seurat_command_flags
-        # Default is "-texture_width 8192 -texture_height 8192 -pixels_per_degree 20 -triangle_count 180000"
+        return True
 
-        cmd = os.path.join(directory + "\seurat-pipeline-msvc2017-x64.exe -input_path ") + "\"" + input_path + "\" -output_path \"" + output_path + "\" " + options
+    def process_output(self, wait=False):
+        # Move the pipeline output from the reader thread into the log
+        if wait:
+            try:
+                self.handle_line(self.lines.get(timeout=0.25))
+            except queue.Empty:
+                pass
+
+        while not self.lines.empty():
+            self.handle_line(self.lines.get())
+
+    def handle_line(self, line):
+        print(line)
+        self.log_text.write(line + "\n")
+
+        log = processing_progress['log']
+        log.append(line)
+        del log[:-PANEL_LOG_LINES]
+
+        if not line.strip():
+            return
+
+        match = PIPELINE_PERCENTAGE_PATTERN.search(line)
+        if match:
+            processing_progress['percentage'] = float(match.group(1))
+        else:
+            # Lines without a percentage announce a new pipeline stage
+            self.tracer.end(processing_progress['stage'], 'pipeline')
+            processing_progress['stage'] = line.strip()
+            processing_progress['percentage'] = None
+            self.tracer.begin(processing_progress['stage'], 'pipeline')
+
+        for listener in progress_listeners:
+            listener(processing_progress)
+
+    def finish_pipeline(self, context):
+        opt = context.scene.seurat_options
 
-        print(cmd)
+        # Make sure all output is read before finishing
+        self.reader.join()
+        self.process_output()
 
-        subprocess.run(cmd)
+        processing_progress['running'] = False
 
+        if self.process.returncode != 0:
+            self.write_trace(context)
+            self.report({'ERROR'}, f"Seurat pipeline failed with exit code {self.process.returncode}, see the '{PIPELINE_LOG_NAME}' text")
+            return {'CANCELLED'}
+
+        if opt.import_processed_output:
+            with self.tracer.stage('import'):
+                import_pipeline_output(self.output_directory)
+
+        self.write_trace(context)
+
+        self.report({'INFO'}, "Seurat processing finished")
         return {'FINISHED'}
 
+    def write_trace(self, context):
+        # The pipeline is a child process, its peak memory and output size
+        # are measured separately
+        self.tracer.end(processing_progress['stage'], 'pipeline')
+        self.tracer.end('pipeline', child_peak_rss=tracing.peak_rss(children=True),
+                        output_bytes=tracing.directory_size(self.output_directory))
+
+        try:
+            self.tracer.write(bpy.path.abspath(context.scene.seurat_options.capture_output_path))
+        except OSError as error:
+            print(f"Could not write the processing trace: {error}")
+
+    def finish_modal(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        processing_progress['running'] = False
+        self.redraw_panels(context)
+
+    def redraw_panels(self, context):
+        for window in context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+
 
 def register():
     bpy.utils.register_class(SEURAT_OT_process_data)
 
 def unregister():
-    bpy.utils.unregister_class(SEURAT_OT_process_data)
\ No newline at end of file
+    bpy.utils.unregister_class(SEURAT_OT_process_data)
@@ -0,0 +1,598 @@
+import os
+import re
+import sys
+import json
+import time
+import ctypes
+import subprocess
+import bpy
+from . import manifest
+from . import preflight
+from . import processing
+from . import tracing
+
+
+# Queue state and calibration, stored in the queue directory
+QUEUE_FILE_NAME = "seurat_queue.json"
+QUEUE_VERSION = 1
+
+# Directory (inside the queue directory) with the output of every job
+LOG_DIRECTORY_NAME = "logs"
+
+# Seconds between two checks of the running jobs
+POLL_INTERVAL = 1.0
+
+# Values the pipeline uses when the command flags don't set them
+DEFAULT_PIPELINE_VALUES = {'texture_width': 1024, 'texture_height': 1024, 'triangle_count': 72000}
+
+# Memory model of a pipeline run before any calibration, deliberately
+# generous. The input pixels are the RGBD samples of every captured view
+BASE_MEMORY = 512 * 2 ** 20
+BYTES_PER_TEXEL = 48
+BYTES_PER_TRIANGLE = 4096
+BYTES_PER_INPUT_PIXEL = 64
+
+# The model is scaled by the largest ratio of observed peak memory to
+# modelled memory of this many recent jobs, plus a margin
+CALIBRATION_RUNS = 10
+CALIBRATION_MARGIN = 1.1
+
+# Fraction of the physical memory used when no memory budget is set
+DEFAULT_MEMORY_FRACTION = 0.8
+
+# Job states, jobs that were running when Blender exited are queued again
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+# State of the queue, shown in the Seurat panel
+queue_progress = {
+    'running': False,
+    'status': "",
+    'jobs': []
+}
+
+# Queues that are running, by directory. Jobs added while a queue runs are
+# added to it instead of a second copy of its state
+running_queues = {}
+
+
+class MEMORYSTATUSEX(ctypes.Structure):
+    _fields_ = [('dwLength', ctypes.c_uint32), ('dwMemoryLoad', ctypes.c_uint32)] + [
+        (name, ctypes.c_uint64) for name in (
+            'ullTotalPhys', 'ullAvailPhys', 'ullTotalPageFile', 'ullAvailPageFile',
+            'ullTotalVirtual', 'ullAvailVirtual', 'ullAvailExtendedVirtual')]
+
+
+def physical_memory():
+    """Returns the physical memory of the machine in bytes, or None if unknown"""
+    if os.name == 'nt':
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(status)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return None
+
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def command_flag_values(command):
+    """Reads the texture size and triangle count from a pipeline command.
+    Flags can be passed as "-name value" or "-name=value".
+    Returns:
+      A dict with the 'texture_width', 'texture_height' and 'triangle_count'.
+    """
+    values = dict(DEFAULT_PIPELINE_VALUES)
+    for index, argument in enumerate(command):
+        name, separator, value = argument.lstrip('-').partition('=')
+        if name not in values:
+            continue
+        if not separator:
+            value = command[index + 1] if index + 1 < len(command) else ""
+        try:
+            values[name] = int(value)
+        except ValueError:
+            pass
+    return values
+
+
+def job_features(manifest_path, command):
+    """Collects the sizes the memory use of a pipeline job depends on.
+    Raises:
+      ManifestError: The manifest is unreadable or invalid.
+    """
+    values = command_flag_values(command)
+    data = manifest.read_manifest(manifest_path)
+
+    input_pixels = 0
+    for view_group in data['view_groups']:
+        for view in view_group['views']:
+            camera = view['projective_camera']
+            input_pixels += camera['image_width'] * camera['image_height']
+
+    return {'texels': values['texture_width'] * values['texture_height'],
+            'triangles': values['triangle_count'],
+            'input_pixels': input_pixels}
+
+
+def model_memory(features):
+    """Memory use of a job according to the uncalibrated model, in bytes"""
+    return (BASE_MEMORY + features['texels'] * BYTES_PER_TEXEL + features['triangles'] * BYTES_PER_TRIANGLE +
+            features['input_pixels'] * BYTES_PER_INPUT_PIXEL)
+
+
+def poll_process(process):
+    """Checks if a job process exited and measures its peak memory.
+    POSIX processes are reaped with wait4, which reports the peak memory of
+    that one child. On Windows it's read from the process handle.
+    Returns:
+      A tuple of the exit code (None while running) and the peak memory in
+      bytes (None while running or if unknown).
+    """
+    if hasattr(os, 'wait4'):
+        try:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        except ChildProcessError:
+            return process.poll(), None
+        if pid == 0:
+            return None, None
+
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # Linux reports kilobytes, macOS bytes
+        peak = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        return process.returncode, peak
+
+    return_code = process.poll()
+    if return_code is None:
+        return None, None
+    return return_code, tracing.process_peak_rss(int(process._handle))
+
+
+def format_bytes(size):
+    return f"{size / 2 ** 30:.1f} GB" if size is not None else "unknown"
+
+
+class ProcessingQueue:
+    """Pipeline jobs run as parallel processes within a memory and core budget.
+    Every job's memory use is estimated from its texture size, triangle count
+    and input size, calibrated with the peak memory of finished jobs. The
+    state is saved after every change, jobs that were running when Blender
+    exited or crashed are queued again when the queue is loaded.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, QUEUE_FILE_NAME)
+        self.jobs = []
+        # (modelled bytes, peak bytes) of recent successful jobs
+        self.calibration = []
+        # Job ids mapped to their process and log file
+        self.processes = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as queue_file:
+                    data = json.load(queue_file)
+            except (OSError, ValueError):
+                print("Processing queue is unreadable, starting an empty queue")
+                return
+
+            if data.get('version') == QUEUE_VERSION:
+                self.jobs = data['jobs']
+                self.calibration = data['calibration']
+
+        for job in self.jobs:
+            if job['state'] == RUNNING:
+                print(f"Job {job['name']} was interrupted, it's queued again. Its pipeline process "
+                      f"{job['pid']} may still be running if Blender crashed")
+                job.update(state=QUEUED, pid=None)
+
+    def save(self):
+        # Write to a temporary file first, an interrupted write never
+        # corrupts the queue
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'w') as queue_file:
+            json.dump({'version': QUEUE_VERSION, 'jobs': self.jobs, 'calibration': self.calibration},
+                      queue_file, indent=2)
+        os.replace(temporary_path, self.path)
+
+    def unique_name(self, name):
+        # Numbered when the queue has a job with the same name, e.g. the same
+        # capture with other command flags
+        names = {job['name'] for job in self.jobs}
+        unique_name = name
+        number = 2
+        while unique_name in names:
+            unique_name = f"{name}_{number}"
+            number += 1
+        return unique_name
+
+    def add(self, name, manifest_path, output_directory, command, cores):
+        """Adds a job to the end of the queue.
+        Raises:
+          ManifestError: The manifest is unreadable or invalid.
+        """
+        job_id = max((job['id'] for job in self.jobs), default=0) + 1
+        features = job_features(manifest_path, command)
+        log_name = "%03d_%s.log" % (job_id, re.sub(r'[^\w.-]', '_', name))
+        job = {
+            'id': job_id, 'name': name, 'state': QUEUED, 'manifest_path': manifest_path,
+            'output_directory': output_directory, 'command': command, 'cores': cores,
+            'features': features, 'model_bytes': model_memory(features), 'estimate': None,
+            'log_path': os.path.join(self.directory, LOG_DIRECTORY_NAME, log_name),
+            'attempts': 0, 'pid': None, 'exit_code': None, 'peak_rss': None,
+            'start_time': None, 'end_time': None
+        }
+        self.jobs.append(job)
+        self.save()
+        return job
+
+    def calibration_factor(self):
+        # Without finished jobs the model is used as it is
+        ratios = [peak / model for model, peak in self.calibration[-CALIBRATION_RUNS:]]
+        return max(ratios) * CALIBRATION_MARGIN if ratios else 1.0
+
+    def estimate(self, job):
+        """Estimated peak memory of a job in bytes"""
+        return int(job['model_bytes'] * self.calibration_factor())
+
+    def jobs_in_state(self, state):
+        return [job for job in self.jobs if job['state'] == state]
+
+    def start_jobs(self, memory_budget, core_budget):
+        """Starts queued jobs in queue order while they fit in the budgets.
+        A job larger than the whole budget is started alone, so it still runs.
+        Returns:
+          The started jobs.
+        """
+        running = self.jobs_in_state(RUNNING)
+        free_memory = memory_budget - sum(job['estimate'] for job in running)
+        free_cores = core_budget - sum(job['cores'] for job in running)
+
+        started = []
+        for job in self.jobs_in_state(QUEUED):
+            estimate = self.estimate(job)
+            cores = min(job['cores'], core_budget)
+            alone = not running and not started
+            if not alone and (estimate > free_memory or cores > free_cores):
+                continue
+
+            if estimate > memory_budget:
+                print(f"Job {job['name']} needs about {format_bytes(estimate)}, more than the memory budget "
+                      f"of {format_bytes(memory_budget)}, it runs alone")
+
+            job['estimate'] = estimate
+            self.start(job)
+            if job['state'] != RUNNING:
+                continue
+            started.append(job)
+            free_memory -= estimate
+            free_cores -= cores
+
+        if started:
+            self.save()
+        return started
+
+    def start(self, job):
+        os.makedirs(job['output_directory'], exist_ok=True)
+        os.makedirs(os.path.dirname(job['log_path']), exist_ok=True)
+
+        job['attempts'] += 1
+        log_file = open(job['log_path'], 'a')
+        log_file.write(f"Attempt {job['attempts']}, estimated memory {format_bytes(job['estimate'])}\n"
+                       f"{subprocess.list2cmdline(job['command'])}\n")
+        log_file.flush()
+
+        # The output goes straight to the log, it survives a Blender crash
+        try:
+            process = subprocess.Popen(job['command'], stdout=log_file, stderr=subprocess.STDOUT,
+                                       stdin=subprocess.DEVNULL)
+        except OSError as error:
+            log_file.write(f"Could not start the pipeline: {error}\n")
+            log_file.close()
+            job.update(state=FAILED, exit_code=None, end_time=time.time())
+            return
+
+        self.processes[job['id']] = (process, log_file)
+        job.update(state=RUNNING, pid=process.pid, exit_code=None, peak_rss=None,
+                   start_time=time.time(), end_time=None)
+        print(f"Started job {job['name']} (estimated {format_bytes(job['estimate'])}), log: {job['log_path']}")
+
+    def poll(self):
+        """Checks the running jobs.
+        Returns:
+          The jobs that finished or failed since the last call.
+        """
+        done = []
+        for job in self.jobs_in_state(RUNNING):
+            if job['id'] not in self.processes:
+                continue
+            process, log_file = self.processes[job['id']]
+            exit_code, peak = poll_process(process)
+            if exit_code is None:
+                continue
+
+            log_file.close()
+            del self.processes[job['id']]
+            job.update(state=FINISHED if exit_code == 0 else FAILED, exit_code=exit_code,
+                       peak_rss=peak, pid=None, end_time=time.time())
+
+            # Successful runs calibrate the estimate of the following jobs
+            if exit_code == 0 and peak:
+                self.calibration.append((job['model_bytes'], peak))
+                del self.calibration[:-CALIBRATION_RUNS]
+            done.append(job)
+
+        if done:
+            self.save()
+        return done
+
+    def stop(self):
+        """Kills the running jobs and queues them again"""
+        for job in self.jobs_in_state(RUNNING):
+            if job['id'] in self.processes:
+                process, log_file = self.processes.pop(job['id'])
+                process.kill()
+                process.wait()
+                log_file.write("Stopped\n")
+                log_file.close()
+            job.update(state=QUEUED, pid=None)
+        self.save()
+
+    def clear(self):
+        """Removes every job that isn't running, the calibration is kept"""
+        self.jobs = self.jobs_in_state(RUNNING)
+        self.save()
+
+    def is_done(self):
+        return not self.jobs_in_state(QUEUED) and not self.jobs_in_state(RUNNING)
+
+    def status(self):
+        counts = {state: len(self.jobs_in_state(state)) for state in (QUEUED, RUNNING, FINISHED, FAILED)}
+        return (f"{counts[RUNNING]} running, {counts[QUEUED]} queued, "
+                f"{counts[FINISHED]} finished, {counts[FAILED]} failed")
+
+    def summary(self):
+        """Describes the result, time and memory use of every job"""
+        lines = [f"Processing queue: {self.status()}"]
+        for job in self.jobs:
+            line = f"  {job['name']}: {job['state']}"
+            if job['start_time'] is not None and job['end_time'] is not None:
+                line += f" in {job['end_time'] - job['start_time']:.1f} s"
+            if job['state'] in (FINISHED, FAILED):
+                line += f", peak memory {format_bytes(job['peak_rss'])} (estimated {format_bytes(job['estimate'])})"
+            if job['state'] == FAILED:
+                line += f", exit code {job['exit_code']}, see {job['log_path']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def load_queue(opt):
+    """Returns the queue in the queue path, the running one if it's running"""
+    directory = bpy.path.abspath(opt.processing_queue_path)
+    return running_queues.get(directory) or ProcessingQueue(directory)
+
+
+def capture_manifests(capture_output_path):
+    """Finds the manifests of a capture, including the capture box folders of a batch capture.
+    Returns:
+      A list of (name, manifest path) tuples.
+    """
+    manifests = []
+    capture_output_path = os.path.normpath(capture_output_path)
+    root_manifest = manifest.manifest_path(capture_output_path)
+    if os.path.isfile(root_manifest):
+        manifests.append((os.path.basename(capture_output_path), root_manifest))
+
+    if os.path.isdir(capture_output_path):
+        for entry in sorted(os.scandir(capture_output_path), key=lambda entry: entry.name):
+            if entry.is_dir() and os.path.isfile(manifest.manifest_path(entry.path)):
+                manifests.append((entry.name, manifest.manifest_path(entry.path)))
+    return manifests
+
+
+class SEURAT_OT_queue_processing(bpy.types.Operator):
+    """Add the captures in the capture output path to the processing queue, with the current Seurat command flags"""
+    bl_idname = "seurat.queue_processing"
+    bl_label = "Add to processing queue"
+
+    def execute(self, context):
+        opt = context.scene.seurat_options
+
+        binary_path = processing.pipeline_binary_path(opt)
+        binary_error = processing.pipeline_binary_error(opt, binary_path)
+        if binary_error is not None:
+            self.report({'ERROR'}, binary_error)
+            return {'CANCELLED'}
+
+        manifests = capture_manifests(bpy.path.abspath(opt.capture_output_path))
+        if not manifests:
+            self.report({'ERROR'}, "No manifest found in the capture output path")
+            return {'CANCELLED'}
+
+        processing_queue = load_queue(opt)
+        added = []
+        rejected = []
+        for name, manifest_path in manifests:
+            # Don't queue a long pipeline run on a broken capture
+            try:
+                errors, notes, image_count, check_time = preflight.validate_capture(manifest_path)
+            except manifest.ManifestError as error:
+                errors, notes = [str(error)], []
+            for note in notes:
+                print(f"{name}: {note}")
+            if errors:
+                for error in errors:
+                    print(error)
+                rejected.append(name)
+                continue
+
+            # Every job writes to its own folder in the mesh output path
+            name = processing_queue.unique_name(name)
+            cmd, output_directory = processing.pipeline_command(
+                opt, manifest_path, os.path.join(bpy.path.abspath(opt.mesh_output_path), name))
+            job = processing_queue.add(name, manifest_path, output_directory, cmd, opt.processing_job_cores)
+            added.append(name)
+            print(f"Queued {job['name']} ({manifest_path}), estimated memory "
+                  f"{format_bytes(processing_queue.estimate(job))}")
+
+        if rejected:
+            self.report({'ERROR'}, f"Not queued, the captured images have problems (see the system console): "
+                                   f"{', '.join(rejected)}")
+            return {'CANCELLED'} if not added else {'FINISHED'}
+
+        self.report({'INFO'}, f"Queued {', '.join(added)}")
+        return {'FINISHED'}
+
+
+class SEURAT_OT_run_processing_queue(bpy.types.Operator):
+    """Run the queued Seurat pipeline jobs in parallel within the memory and core budget"""
+    bl_idname = "seurat.run_processing_queue"
+    bl_label = "Run processing queue"
+
+    def execute(self, context):
+        # Run every job without returning control to the UI
+        if not self.start_queue(context):
+            return {'CANCELLED'}
+
+        try:
+            while not self.update_queue(context):
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            # Also on Ctrl+C in a background Blender, the jobs are queued again
+            self.processing_queue.stop()
+            queue_progress['running'] = False
+            running_queues.pop(self.processing_queue.directory, None)
+            raise
+        return self.finish_queue()
+
+    def invoke(self, context, event):
+        if not self.start_queue(context):
+            return {'CANCELLED'}
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(POLL_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            # Running jobs are queued again, the next run starts them over
+            self.processing_queue.stop()
+            self.finish_modal(context)
+            print(self.processing_queue.summary())
+            self.report({'WARNING'}, "Processing queue stopped")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            done = self.update_queue(context)
+        except Exception:
+            self.processing_queue.stop()
+            self.finish_modal(context)
+            raise
+
+        self.redraw_panels(context)
+        if not done:
+            return {'RUNNING_MODAL'}
+
+        self.finish_modal(context)
+        return self.finish_queue()
+
+    def start_queue(self, context):
+        opt = context.scene.seurat_options
+
+        if queue_progress['running']:
+            self.report({'ERROR'}, "The processing queue is already running")
+            return False
+
+        self.processing_queue = load_queue(opt)
+        if self.processing_queue.is_done():
+            self.report({'ERROR'}, "The processing queue has no queued jobs")
+            return False
+        running_queues[self.processing_queue.directory] = self.processing_queue
+
+        self.memory_budget = int(opt.processing_memory_budget * 2 ** 30)
+        if not self.memory_budget:
+            # Without a known memory size every job runs alone
+            self.memory_budget = int((physical_memory() or 0) * DEFAULT_MEMORY_FRACTION)
+        self.core_budget = opt.processing_core_budget or os.cpu_count() or 1
+
+        print(f"Running the processing queue with {format_bytes(self.memory_budget)} of memory and "
+              f"{self.core_budget} cores, memory estimates are scaled by "
+              f"{self.processing_queue.calibration_factor():.2f}")
+        queue_progress['running'] = True
+        return True
+
+    def update_queue(self, context):
+        # Returns True once every job finished or failed
+        processing_queue = self.processing_queue
+        for job in processing_queue.poll():
+            print(f"Job {job['name']} {job['state']} with exit code {job['exit_code']}, "
+                  f"peak memory {format_bytes(job['peak_rss'])} (estimated {format_bytes(job['estimate'])})")
+        processing_queue.start_jobs(self.memory_budget, self.core_budget)
+
+        queue_progress['status'] = processing_queue.status()
+        queue_progress['jobs'] = [f"{job['name']}: {time.time() - job['start_time']:.0f} s, "
+                                  f"about {format_bytes(job['estimate'])}"
+                                  for job in processing_queue.jobs_in_state(RUNNING)]
+        return processing_queue.is_done()
+
+    def finish_queue(self):
+        queue_progress['running'] = False
+        running_queues.pop(self.processing_queue.directory, None)
+        print(self.processing_queue.summary())
+
+        failed = self.processing_queue.jobs_in_state(FAILED)
+        if failed:
+            self.report({'ERROR'}, f"{len(failed)} processing job(s) failed, see the system console")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, "Processing queue finished")
+        return {'FINISHED'}
+
+    def finish_modal(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        queue_progress['running'] = False
+        running_queues.pop(self.processing_queue.directory, None)
+        self.redraw_panels(context)
+
+    def redraw_panels(self, context):
+        for window in context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+
+
+class SEURAT_OT_clear_processing_queue(bpy.types.Operator):
+    """Remove every job from the processing queue, the memory calibration is kept"""
+    bl_idname = "seurat.clear_processing_queue"
+    bl_label = "Clear processing queue"
+
+    def execute(self, context):
+        if queue_progress['running']:
+            self.report({'ERROR'}, "The processing queue is running, press Esc to stop it first")
+            return {'CANCELLED'}
+
+        load_queue(context.scene.seurat_options).clear()
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(SEURAT_OT_queue_processing)
+    bpy.utils.register_class(SEURAT_OT_run_processing_queue)
+    bpy.utils.register_class(SEURAT_OT_clear_processing_queue)
+
+
+def unregister():
+    bpy.utils.unregister_class(SEURAT_OT_queue_processing)
+    bpy.utils.unregister_class(SEURAT_OT_run_processing_queue)
+    bpy.utils.unregister_class(SEURAT_OT_clear_processing_queue)
@@ -0,0 +1,152 @@
+import json
+import struct
+import hashlib
+from mathutils import Vector
+from mathutils.kdtree import KDTree
+from . import journal
+from . import intersection
+
+
+# Object types that don't show up in renders
+NON_RENDERED_TYPES = {'CAMERA', 'EMPTY', 'ARMATURE', 'LATTICE', 'SPEAKER'}
+
+# Objects larger than this fraction of the far clip distance are tested
+# against every view instead of being looked up in the spatial index
+LARGE_OBJECT_FRACTION = 0.1
+
+
+def world_bounds(matrix, bound_box):
+    """Returns the world space bounding box of an object as two Vectors"""
+    local_min = Vector(bound_box[0])
+    local_max = Vector(bound_box[6])
+    center = matrix @ ((local_min + local_max) * 0.5)
+    half_extent = (local_max - local_min) * 0.5
+
+    extent = Vector([abs(matrix[axis][0]) * half_extent[0] + abs(matrix[axis][1]) * half_extent[1] +
+                     abs(matrix[axis][2]) * half_extent[2] for axis in range(3)])
+    return center - extent, center + extent
+
+
+def box_in_frustum(box_min, box_max, position, axis, sign, near_clip, far_clip):
+    """Checks if a box intersects the frustum of a 90 degree cube face.
+    The frustum looks along a world axis, a point is inside if its distance
+    along the axis is between the clip planes and at least its distance along
+    the other two axes.
+    Args:
+      axis: Index of the world axis the face looks along.
+      sign: 1 or -1, the direction along the axis.
+    """
+    low = [box_min[i] - position[i] for i in range(3)]
+    high = [box_max[i] - position[i] for i in range(3)]
+
+    if sign > 0:
+        depth_min, depth_max = low[axis], high[axis]
+    else:
+        depth_min, depth_max = -high[axis], -low[axis]
+    if depth_max < near_clip or depth_min > far_clip:
+        return False
+
+    # The deepest point of the box has the widest frustum cross section
+    depth = min(depth_max, far_clip)
+    for other in range(3):
+        if other == axis:
+            continue
+        closest = 0.0 if low[other] <= 0.0 <= high[other] else min(abs(low[other]), abs(high[other]))
+        if closest > depth:
+            return False
+    return True
+
+
+class SceneObjects:
+    """Content hashes and a spatial index of the rendered objects of a scene.
+    Instances are grouped under the object that instances them, like in the
+    capture box check. The world, lights and other objects that light every
+    face are combined into a single global hash.
+    """
+
+    def __init__(self, depsgraph, far_clip):
+        self.bounds = {}
+        global_hash = hashlib.sha1()
+
+        # The background and world lighting show up in every face
+        global_hash.update(json.dumps(journal.world_fingerprint(depsgraph.scene_eval.world), default=str).encode())
+
+        # Geometry is hashed once per object and shared by its instances
+        geometry_hashes = {}
+        owner_hashes = {}
+
+        for instance in depsgraph.object_instances:
+            obj = instance.object
+            if obj.type in NON_RENDERED_TYPES:
+                continue
+            if not instance.is_instance and obj.hide_render:
+                continue
+
+            if obj.type not in intersection.GEOMETRY_TYPES:
+                global_hash.update(json.dumps(journal.object_fingerprint(obj), default=str).encode())
+                continue
+
+            name = instance.parent.name if instance.is_instance else obj.name
+            if obj.name not in geometry_hashes:
+                geometry_hashes[obj.name] = journal.geometry_hash(obj)
+
+            matrix = instance.matrix_world.copy()
+            owner_hash = owner_hashes.setdefault(name, hashlib.sha1())
+            owner_hash.update(geometry_hashes[obj.name].encode())
+            owner_hash.update(struct.pack('<16d', *[value for row in matrix for value in row]))
+
+            box_min, box_max = world_bounds(matrix, obj.bound_box)
+            if name in self.bounds:
+                union_min, union_max = self.bounds[name]
+                box_min = Vector([min(a, b) for a, b in zip(union_min, box_min)])
+                box_max = Vector([max(a, b) for a, b in zip(union_max, box_max)])
+            self.bounds[name] = (box_min, box_max)
+
+        self.hashes = {name: owner_hash.hexdigest() for name, owner_hash in owner_hashes.items()}
+        self.global_hash = global_hash.hexdigest()
+
+        # Small objects are found by their center, large ones are always tested
+        large_radius = far_clip * LARGE_OBJECT_FRACTION
+        self.names = sorted(self.bounds)
+        self.large_objects = []
+        self.small_radius = 0.0
+        small_objects = []
+        for name in self.names:
+            box_min, box_max = self.bounds[name]
+            radius = (box_max - box_min).length * 0.5
+            if radius > large_radius:
+                self.large_objects.append(name)
+            else:
+                small_objects.append(name)
+                self.small_radius = max(self.small_radius, radius)
+
+        self.tree = KDTree(len(small_objects))
+        for index, name in enumerate(small_objects):
+            box_min, box_max = self.bounds[name]
+            self.tree.insert((box_min + box_max) * 0.5, index)
+        self.tree.balance()
+        self.small_objects = small_objects
+
+    def face_objects(self, position, face_directions, near_clip, far_clip):
+        """Finds the objects inside the frustum of every cube face at a position.
+        Args:
+          position: The camera position as a list of 3 floats.
+          face_directions: A dict mapping face names to the world axis aligned
+            view direction of that face.
+          near_clip: Distance of the near clipping plane.
+          far_clip: Distance of the far clipping plane.
+        Returns:
+          A dict mapping face names to sorted lists of object names.
+        """
+        # The frusta fit in a sphere around the position, a far clip cube's half diagonal
+        search_radius = far_clip * 3 ** 0.5 + self.small_radius
+        candidates = [self.small_objects[index] for _, index, _ in self.tree.find_range(position, search_radius)]
+        candidates += self.large_objects
+
+        faces = {}
+        for face, direction in face_directions.items():
+            axis = max(range(3), key=lambda i: abs(direction[i]))
+            sign = 1 if direction[axis] > 0 else -1
+            faces[face] = sorted(name for name in candidates if box_in_frustum(
+                *self.bounds[name], position, axis, sign, near_clip, far_clip))
+        return faces
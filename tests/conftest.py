@@ -0,0 +1,18 @@
+import os
+import sys
+import types
+
+
+# The repository is the addon package, it's imported as "seurat" so the
+# relative imports between its modules work. Only modules that don't import
+# bpy can be tested outside of Blender.
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'seurat' not in sys.modules:
+    package = types.ModuleType('seurat')
+    package.__path__ = [REPOSITORY_PATH]
+    sys.modules['seurat'] = package
+
+    # pytest imports the package's __init__.py under the directory name to
+    # look for setup functions, which fails without bpy
+    sys.modules.setdefault(os.path.basename(REPOSITORY_PATH), package)
@@ -0,0 +1,91 @@
+import sys
+import types
+import importlib
+from unittest import mock
+import pytest
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    # capture imports Blender's modules, only the class bases and the names
+    # used at import time are needed to drive the capture steps
+    bpy = types.ModuleType('bpy')
+    bpy.types = types.SimpleNamespace(Operator=object, Panel=object, PropertyGroup=object)
+    for name in ('props', 'app', 'path', 'utils', 'ops', 'data', 'context'):
+        setattr(bpy, name, mock.MagicMock())
+    mathutils = mock.MagicMock()
+    fake_modules = {'bpy': bpy, 'bpy.app': bpy.app, 'bpy.app.handlers': bpy.app.handlers,
+                    'mathutils': mathutils, 'mathutils.bvhtree': mathutils.bvhtree,
+                    'mathutils.kdtree': mathutils.kdtree}
+
+    loaded_modules = set(sys.modules)
+    for name, module in fake_modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    try:
+        yield importlib.import_module('seurat.capture')
+    finally:
+        # The addon modules hold the fakes, they're imported again by the next test
+        for name in set(sys.modules) - loaded_modules:
+            sys.modules.pop(name, None)
+
+
+def capture_operator(capture, box_steps):
+    operator = capture.SEURAT_OT_capture_data()
+    operator.output_path = ""
+    operator.capture_box = ""
+    operator.all_boxes = False
+    operator.box_capture_steps = box_steps
+    return operator
+
+
+def capture_context():
+    options = types.SimpleNamespace(capture_output_path="//capture/")
+    return types.SimpleNamespace(scene=types.SimpleNamespace(seurat_options=options))
+
+
+def box_steps(capture):
+    def steps(context, capture_box, output_path, box_report=None):
+        capture.CaptureProgress(12)
+        capture.capture_progress['batch'] = "Capture box 1/1: SeuratCaptureBox"
+        yield
+        yield
+        return {'FINISHED'}
+    return steps
+
+
+def test_progress_reset_after_execute(capture, monkeypatch):
+    # execute is used by the preview, the command line and distributed workers
+    monkeypatch.setattr(capture.boxes, 'find_capture_box', lambda context, name: object())
+    operator = capture_operator(capture, box_steps(capture))
+
+    assert operator.execute(capture_context()) == {'FINISHED'}
+    assert capture.capture_progress['running'] is False
+    assert capture.capture_progress['batch'] == ""
+
+
+def test_progress_reset_after_close(capture, monkeypatch):
+    # Cancelling a modal capture closes the steps
+    monkeypatch.setattr(capture.boxes, 'find_capture_box', lambda context, name: object())
+    operator = capture_operator(capture, box_steps(capture))
+
+    capture_steps = operator.capture_steps(capture_context())
+    next(capture_steps)
+    assert capture.capture_progress['running'] is True
+
+    capture_steps.close()
+    assert capture.capture_progress['running'] is False
+    assert capture.capture_progress['batch'] == ""
+
+
+def test_progress_reset_after_error(capture, monkeypatch):
+    def failing_steps(context, capture_box, output_path, box_report=None):
+        capture.CaptureProgress(12)
+        yield
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr(capture.boxes, 'find_capture_box', lambda context, name: object())
+    operator = capture_operator(capture, failing_steps)
+
+    with pytest.raises(RuntimeError):
+        operator.execute(capture_context())
+    assert capture.capture_progress['running'] is False
@@ -0,0 +1,100 @@
+import os
+import pytest
+from seurat import exr
+
+
+def write_reference_image(path, compression):
+    # Written by the OpenEXR library, the reader has to decode its output
+    OpenEXR = pytest.importorskip('OpenEXR')
+    numpy = pytest.importorskip('numpy')
+    depth = numpy.arange(20 * 6, dtype=numpy.float32).reshape(20, 6)
+    red = numpy.full((20, 6), 0.5, dtype=numpy.float16)
+    header = {'compression': getattr(OpenEXR, compression + '_COMPRESSION'), 'type': OpenEXR.scanlineimage}
+    with OpenEXR.File(header, {'Z': depth, 'R': red}) as exr_file:
+        exr_file.write(str(path))
+    return depth
+
+
+def test_read_header(tmp_path):
+    path = str(tmp_path / "image.exr")
+    exr.write_constant_image(path, 8, 4, {'R': 0.5, 'depth.V': 2.0}, comments="view group 3")
+    header = exr.read_header(path)
+
+    assert header['channels'] == {'R': exr.PIXEL_TYPE_FLOAT, 'depth.V': exr.PIXEL_TYPE_FLOAT}
+    assert exr.data_window_size(header) == (8, 4)
+    assert exr.compression_name(header) == 'NONE'
+    assert exr.is_scanline(header)
+    assert header['comments'] == "view group 3"
+
+
+def test_read_constant_image(tmp_path):
+    path = str(tmp_path / "image.exr")
+    exr.write_constant_image(path, 8, 4, {'R': 0.5, 'Z': 2.0})
+    header = exr.read_header(path)
+    exr.check_chunks(path, header)
+
+    assert list(exr.read_channel_samples(path, header, 'Z', 2)) == [2.0] * 16
+    assert list(exr.read_channel_samples(path, header, 'R', 2)) == [0.5] * 16
+
+
+@pytest.mark.parametrize('compression, lines', [('ZIP', list(range(20))), ('ZIPS', [5, 10, 15])])
+def test_read_reference_image(tmp_path, compression, lines):
+    path = tmp_path / "image.exr"
+    depth = write_reference_image(path, compression)
+    header = exr.read_header(str(path))
+
+    assert exr.compression_name(header) == compression
+    assert header['channels'] == {'R': exr.PIXEL_TYPE_HALF, 'Z': exr.PIXEL_TYPE_FLOAT}
+    exr.check_chunks(str(path), header)
+
+    # Three chunks spread over the image are sampled, ZIP chunks hold 16 lines
+    samples = exr.read_channel_samples(str(path), header, 'Z', 3)
+    assert list(samples) == depth[lines].ravel().tolist()
+    assert set(exr.read_channel_samples(str(path), header, 'R', 3)) == {0.5}
+
+
+def test_undecodable_compression(tmp_path):
+    path = tmp_path / "image.exr"
+    write_reference_image(path, 'PIZ')
+    header = exr.read_header(str(path))
+
+    assert exr.compression_name(header) not in exr.DECODABLE_COMPRESSIONS
+    exr.check_chunks(str(path), header)
+    with pytest.raises(exr.ExrError, match="PIZ"):
+        exr.read_channel_samples(str(path), header, 'Z', 3)
+
+
+def test_reconstruct_zip_data_without_numpy(monkeypatch):
+    data = bytes(range(7)) + bytes(range(250, 256))
+    reconstructed = exr.reconstruct_zip_data(data)
+    monkeypatch.setattr(exr, 'numpy', None)
+    assert exr.reconstruct_zip_data(data) == reconstructed
+
+
+def test_truncated_file(tmp_path):
+    path = str(tmp_path / "image.exr")
+    exr.write_constant_image(path, 8, 4, {'R': 0.5})
+    header = exr.read_header(path)
+    with open(path, 'r+b') as exr_file:
+        exr_file.truncate(os.path.getsize(path) - 4)
+
+    with pytest.raises(exr.ExrError, match="truncated"):
+        exr.check_chunks(path, header)
+
+
+def test_not_an_exr_file(tmp_path):
+    path = tmp_path / "image.exr"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(64))
+    with pytest.raises(exr.ExrError, match="not an OpenEXR file"):
+        exr.read_header(str(path))
+
+    path.write_bytes(b"v/1")
+    with pytest.raises(exr.ExrError, match="truncated"):
+        exr.read_header(str(path))
+
+
+def test_find_channel():
+    header = {'channels': {'ViewLayer.Depth.Z': 2, 'ViewLayer.Combined.R': 2, 'Z': 2}}
+    assert exr.find_channel(header, 'ViewLayer.Depth', ['V', 'Z']) == 'ViewLayer.Depth.Z'
+    assert exr.find_channel(header, '', ['Z']) == 'Z'
+    assert exr.find_channel(header, 'ViewLayer.Depth', ['R']) is None
@@ -0,0 +1,119 @@
+import json
+import pytest
+from seurat import manifest
+
+
+def write_manifest(tmp_path, view_groups, compact=False):
+    writer = manifest.ManifestWriter(
+        manifest.manifest_path(str(tmp_path)), headbox_center=[1.0, 2.0, 3.0], image_size=512,
+        near_clip=0.1, far_clip=100.0, depth_type='EYE_Z',
+        color_file_path_pattern="%(face)s_%(index)04d.exr",
+        depth_file_path_pattern="%(face)s_%(index)04d.exr", compact=compact)
+    try:
+        for index, position in enumerate(view_groups):
+            writer.write_view_group(index, position, image_sizes={'top': 128} if index == 0 else None)
+    finally:
+        writer.close()
+    return manifest.manifest_path(str(tmp_path))
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_round_trip(tmp_path, compact):
+    path = write_manifest(tmp_path, [[1.0, 2.0, 3.0], [2.0, 2.5, 3.0]], compact)
+    data = manifest.read_manifest(path)
+
+    assert len(data['view_groups']) == 2
+    views = data['view_groups'][1]['views']
+    assert len(views) == 6
+
+    # Positions are stored relative to the headbox center
+    camera = views[0]['projective_camera']
+    assert [camera['world_from_eye_matrix'][i] for i in (3, 7, 11)] == [1.0, 0.5, 0.0]
+    assert camera['image_width'] == camera['image_height'] == 512
+    assert camera['depth_type'] == 'EYE_Z'
+
+    images = views[0]['depth_image_file']
+    assert images['color'] == {'path': "front_0001.exr", 'channel_0': 'R', 'channel_1': 'G',
+                               'channel_2': 'B', 'channel_alpha': 'A'}
+    assert images['depth'] == {'path': "front_0001.exr", 'channel_0': 'R'}
+
+    top_camera = data['view_groups'][0]['views'][5]['projective_camera']
+    assert top_camera['image_width'] == 128
+
+
+def test_stream_matches_json_dump(tmp_path):
+    # The streamed layout is the same as dumping the whole manifest at once
+    path = write_manifest(tmp_path, [[1.0, 2.0, 3.0], [0.0, 0.0, 0.0]])
+    with open(path) as manifest_file:
+        text = manifest_file.read()
+    assert text == json.dumps(json.loads(text), indent=2) + "\n"
+
+
+def test_stream_is_valid_after_every_view_group(tmp_path):
+    stream = manifest.ManifestStream(manifest.manifest_path(str(tmp_path)))
+    try:
+        with open(stream.path) as manifest_file:
+            assert json.load(manifest_file) == {'view_groups': []}
+
+        stream.write({'views': []})
+        with open(stream.path) as manifest_file:
+            assert json.load(manifest_file) == {'view_groups': [{'views': []}]}
+    finally:
+        stream.close()
+
+
+def valid_manifest(tmp_path):
+    with open(write_manifest(tmp_path, [[1.0, 2.0, 3.0]])) as manifest_file:
+        return json.load(manifest_file)
+
+
+def test_valid_manifest_has_no_errors(tmp_path):
+    assert manifest.validate_manifest(valid_manifest(tmp_path)) == []
+
+
+def test_missing_view_groups():
+    assert manifest.validate_manifest({}) == ["the manifest has no view_groups list"]
+    assert manifest.validate_manifest({'view_groups': []}) == ["the manifest has no view groups"]
+    assert manifest.validate_manifest({'view_groups': [{}]}) == ["view group 0 has no views"]
+
+
+def test_invalid_camera(tmp_path):
+    data = valid_manifest(tmp_path)
+    camera = data['view_groups'][0]['views'][2]['projective_camera']
+    camera['image_width'] = 0
+    camera['clip_from_eye_matrix'] = camera['clip_from_eye_matrix'][:15]
+    camera['depth_type'] = 'Z'
+
+    assert manifest.validate_manifest(data) == [
+        "view 2 of view group 0 has an invalid image_width",
+        "view 2 of view group 0 has an invalid clip_from_eye_matrix",
+        "view 2 of view group 0 has an invalid depth_type"]
+
+
+def test_invalid_image_files(tmp_path):
+    data = valid_manifest(tmp_path)
+    images = data['view_groups'][0]['views'][0]['depth_image_file']
+    del images['color']['channel_alpha']
+    images['depth']['path'] = ""
+
+    assert manifest.validate_manifest(data) == [
+        "view 0 of view group 0 color has no channel_alpha",
+        "view 0 of view group 0 depth has no path"]
+
+
+def test_read_invalid_manifest(tmp_path):
+    path = tmp_path / manifest.MANIFEST_FILE_NAME
+    path.write_text('{"view_groups": []}')
+    with pytest.raises(manifest.ManifestError, match="no view groups"):
+        manifest.read_manifest(str(path))
+
+
+def test_read_unreadable_manifest(tmp_path):
+    path = tmp_path / manifest.MANIFEST_FILE_NAME
+    with pytest.raises(manifest.ManifestError, match="Could not read"):
+        manifest.read_manifest(str(path))
+
+    # An interrupted write leaves a truncated file
+    path.write_text('{"view_groups": [')
+    with pytest.raises(manifest.ManifestError, match="Could not read"):
+        manifest.read_manifest(str(path))
@@ -0,0 +1,129 @@
+import random
+import pytest
+from seurat import math_functions
+
+
+def naive_radical_inverse(a, base, permutation=None):
+    # Reverses one digit at a time, the reference for the table based version
+    reversed_digits = 0
+    base_n = 1
+    while a > 0:
+        digit = a % base
+        if permutation:
+            digit = permutation[digit]
+        reversed_digits = reversed_digits * base + digit
+        base_n *= base
+        a //= base
+    return reversed_digits / base_n
+
+
+def test_radical_inverse_known_values():
+    assert math_functions.radical_inverse(0, 2) == 0.0
+    assert math_functions.radical_inverse(1, 2) == 0.5
+    assert math_functions.radical_inverse(2, 2) == 0.25
+    assert math_functions.radical_inverse(3, 2) == 0.75
+    assert math_functions.radical_inverse(1, 3) == 1 / 3
+    assert math_functions.radical_inverse(3, 3) == 1 / 9
+
+    # Indices beyond the table size and the float mantissa stay exact
+    assert math_functions.radical_inverse(2 ** 40, 2) == 2.0 ** -41
+
+
+@pytest.mark.parametrize('base', [2, 3, 5, 7])
+def test_radical_inverse_matches_digit_reversal(base):
+    permutation = math_functions.scrambling_permutation(base, random.Random(1))
+    for a in range(2000):
+        assert math_functions.radical_inverse(a, base) == naive_radical_inverse(a, base)
+        assert (math_functions.radical_inverse(a, base, permutation) ==
+                naive_radical_inverse(a, base, permutation))
+
+
+def test_scrambling_permutation_keeps_zero():
+    permutation = math_functions.scrambling_permutation(5, random.Random(3))
+    assert permutation[0] == 0
+    assert sorted(permutation) == list(range(5))
+
+
+@pytest.mark.parametrize('sampler', sorted(math_functions.SAMPLERS))
+def test_samplers_in_unit_cube(sampler):
+    samples = math_functions.SAMPLERS[sampler](100)
+    assert len(samples) == 100
+    assert all(len(sample) == 3 for sample in samples)
+    assert all(0.0 <= value < 1.0 for sample in samples for value in sample)
+
+
+def test_hammersley_first_points():
+    assert math_functions.hammersley_samples(4) == [
+        [0.0, 0.0, 0.0], [0.25, 0.5, 1 / 3], [0.5, 0.25, 2 / 3], [0.75, 0.75, 1 / 9]]
+
+
+def test_sobol_points_are_stratified():
+    # Every dimension of the first 2^k points hits each interval of size 2^-k once
+    samples = math_functions.sobol_samples(16)
+    for dim in range(3):
+        assert sorted(sample[dim] for sample in samples) == [i / 16 for i in range(16)]
+
+
+def test_jitter_uses_every_cell_once():
+    samples = math_functions.stratified_jitter_samples(27)
+    cells = {tuple(int(value * 3) for value in sample) for sample in samples}
+    assert len(cells) == 27
+
+
+def test_samplers_are_deterministic():
+    assert math_functions.halton_samples(10) == math_functions.halton_samples(10)
+    assert math_functions.stratified_jitter_samples(10) == math_functions.stratified_jitter_samples(10)
+
+
+def test_camera_positions_in_headbox():
+    headbox_min, headbox_max = [-1.0, -2.0, 0.0], [1.0, 2.0, 3.0]
+    positions = math_functions.generate_camera_positions_python(headbox_min, headbox_max, 16)
+    assert len(positions) == 16
+
+    # The headbox center is always the first position
+    assert positions[0] == [0.0, 0.0, 1.5]
+    for position in positions:
+        assert all(low <= value <= high for low, value, high in zip(headbox_min, position, headbox_max))
+
+
+def test_single_camera_at_headbox_center():
+    assert math_functions.generate_camera_positions_python([0, 0, 0], [2, 2, 2], 1) == [[1.0, 1.0, 1.0]]
+
+
+def test_camera_positions_reject_zero_cameras():
+    with pytest.raises(ValueError):
+        math_functions.generate_camera_positions([0, 0, 0], [1, 1, 1], 0)
+
+
+def test_nearest_neighbor_order():
+    points = [[0, 0, 0], [5, 0, 0], [1, 0, 0], [2, 0, 0]]
+    assert math_functions.nearest_neighbor_order(points) == [0, 2, 3, 1]
+    assert math_functions.nearest_neighbor_order(points, first=1) == [1, 3, 2, 0]
+
+
+@pytest.mark.parametrize('base', [2, 3, 5])
+def test_radical_inverse_array_matches_python(base):
+    numpy = pytest.importorskip('numpy')
+    indices = numpy.arange(5000)
+    expected = [math_functions.radical_inverse(int(a), base) for a in indices]
+    assert math_functions.radical_inverse_array(indices, base).tolist() == expected
+
+
+@pytest.mark.parametrize('sampler', sorted(math_functions.SAMPLERS))
+@pytest.mark.parametrize('num_samples', [1, 7, 64, 100])
+def test_sampler_arrays_match_python(sampler, num_samples):
+    numpy = pytest.importorskip('numpy')
+    expected = math_functions.SAMPLERS[sampler](num_samples)
+    samples = math_functions.SAMPLER_ARRAYS[sampler](num_samples)
+    assert samples.shape == (num_samples, 3)
+    assert numpy.array_equal(samples, numpy.array(expected))
+
+
+@pytest.mark.parametrize('sampler', sorted(math_functions.SAMPLERS))
+def test_camera_position_arrays_match_python(sampler):
+    numpy = pytest.importorskip('numpy')
+    headbox_min, headbox_max = [-1.0, -2.0, -3.0], [1.0, 2.0, 3.0]
+    expected = math_functions.generate_camera_positions_python(headbox_min, headbox_max, 20, sampler)
+    positions, distances = math_functions.camera_position_arrays(headbox_min, headbox_max, 20, sampler)
+    assert numpy.allclose(positions, expected)
+    assert numpy.all(numpy.diff(distances) >= 0.0)
@@ -0,0 +1,131 @@
+import os
+import math
+import pytest
+from seurat import exr
+from seurat import manifest
+from seurat import math_functions
+from seurat import preflight
+
+
+NEAR_CLIP = 0.1
+FAR_CLIP = 100.0
+IMAGE_SIZE = 8
+
+
+def write_capture(output_path, depth=10.0, view_groups=1):
+    """Writes a manifest and packed color and depth images of every face"""
+    writer = manifest.ManifestWriter(
+        manifest.manifest_path(output_path), [0.0, 0.0, 0.0], IMAGE_SIZE, NEAR_CLIP, FAR_CLIP, 'EYE_Z',
+        "%(face)s_%(index)04d.exr", "%(face)s_%(index)04d.exr", depth_channel_name='Z')
+    try:
+        for index in range(view_groups):
+            writer.write_view_group(index, [0.0, 0.0, 0.0])
+            for face in math_functions.CUBE_FACES:
+                write_image(os.path.join(output_path, "%s_%04d.exr" % (face, index)), depth)
+    finally:
+        writer.close()
+    return manifest.manifest_path(output_path)
+
+
+def write_image(path, depth, size=IMAGE_SIZE):
+    exr.write_constant_image(path, size, size, {'R': 0.5, 'G': 0.5, 'B': 0.5, 'A': 1.0, 'Z': depth})
+
+
+def front_image(output_path):
+    return os.path.join(output_path, "front_0000.exr")
+
+
+def test_clip_planes():
+    matrix = math_functions.cube_face_projection_matrix(NEAR_CLIP, FAR_CLIP)
+    near_clip, far_clip = preflight.clip_planes(matrix)
+    assert near_clip == pytest.approx(NEAR_CLIP)
+    assert far_clip == pytest.approx(FAR_CLIP)
+
+
+def test_valid_capture(tmp_path):
+    errors, notes, image_count, _ = preflight.validate_capture(write_capture(str(tmp_path), view_groups=2))
+    assert errors == []
+    assert notes == []
+    assert image_count == 12
+
+
+@pytest.mark.parametrize('depth', [FAR_CLIP, 1e10, math.inf])
+def test_background_depth_is_valid(tmp_path, depth):
+    errors, _, _, _ = preflight.validate_capture(write_capture(str(tmp_path), depth))
+    assert errors == []
+
+
+def test_missing_image(tmp_path):
+    path = write_capture(str(tmp_path))
+    os.remove(front_image(str(tmp_path)))
+    errors, _, _, _ = preflight.validate_capture(path)
+    assert errors == [f"{front_image(str(tmp_path))} is missing"]
+
+
+def test_wrong_size(tmp_path):
+    path = write_capture(str(tmp_path))
+    write_image(front_image(str(tmp_path)), 10.0, size=4)
+    errors, _, _, _ = preflight.validate_capture(path)
+    assert errors == [f"{front_image(str(tmp_path))} is 4x4, the manifest expects 8x8"]
+
+
+def test_missing_channel(tmp_path):
+    path = write_capture(str(tmp_path))
+    exr.write_constant_image(front_image(str(tmp_path)), IMAGE_SIZE, IMAGE_SIZE, {'R': 0.5, 'G': 0.5, 'B': 0.5, 'Z': 1.0})
+    errors, _, _, _ = preflight.validate_capture(path)
+    assert errors == [f"{front_image(str(tmp_path))} has no channel(s) A"]
+
+
+def test_truncated_image(tmp_path):
+    path = write_capture(str(tmp_path))
+    image_path = front_image(str(tmp_path))
+    with open(image_path, 'r+b') as exr_file:
+        exr_file.truncate(os.path.getsize(image_path) - 4)
+    errors, _, _, _ = preflight.validate_capture(path)
+    assert errors == [f"{image_path} is truncated"]
+
+
+@pytest.mark.parametrize('depth, message', [
+    (0.01, "closer than the near clip"),
+    (500.0, "farther than the far clip"),
+    (math.nan, "NaN depth values")])
+def test_invalid_depth(tmp_path, depth, message):
+    errors, _, _, _ = preflight.validate_capture(write_capture(str(tmp_path), depth))
+    assert len(errors) == 6
+    assert all(message in error for error in errors)
+
+
+def test_depth_without_numpy(tmp_path, monkeypatch):
+    monkeypatch.setattr(exr, 'numpy', None)
+    monkeypatch.setattr(preflight, 'numpy', None)
+    write_capture(str(tmp_path))
+    path = front_image(str(tmp_path))
+    header = exr.read_header(path)
+
+    assert preflight.check_depth_values(path, header, 'Z', NEAR_CLIP, FAR_CLIP) is None
+    write_image(path, 500.0)
+    assert "farther than the far clip" in preflight.check_depth_values(path, header, 'Z', NEAR_CLIP, FAR_CLIP)
+
+
+def test_undecodable_depth_is_noted(tmp_path):
+    OpenEXR = pytest.importorskip('OpenEXR')
+    numpy = pytest.importorskip('numpy')
+    path = write_capture(str(tmp_path))
+
+    # Blender can write PIZ compressed images, their depth can't be sampled
+    header = {'compression': OpenEXR.PIZ_COMPRESSION, 'type': OpenEXR.scanlineimage}
+    channels = {name: numpy.ones((IMAGE_SIZE, IMAGE_SIZE), dtype=numpy.float32) for name in ('R', 'G', 'B', 'A', 'Z')}
+    for face in ('front', 'back'):
+        with OpenEXR.File(header, channels) as exr_file:
+            exr_file.write(os.path.join(str(tmp_path), "%s_0000.exr" % face))
+
+    errors, notes, _, _ = preflight.validate_capture(path)
+    assert errors == []
+    assert notes == ["depth not checked: compression PIZ (2 images)"]
+
+
+def test_invalid_manifest(tmp_path):
+    path = tmp_path / manifest.MANIFEST_FILE_NAME
+    path.write_text('{"view_groups": [{"views": []}]}')
+    with pytest.raises(manifest.ManifestError):
+        preflight.validate_capture(str(path))
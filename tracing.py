@@ -0,0 +1,257 @@
+import os
+import sys
+import csv
+import json
+import time
+import ctypes
+import threading
+import contextlib
+import bpy
+
+# Peak memory is read with getrusage on Linux and macOS
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Names of the files written next to the manifest, formatted with the run name
+TRACE_FILE_PATTERN = "%s_trace.json"
+SUMMARY_FILE_PATTERN = "%s_trace.csv"
+
+# Render handlers that mark the start and end of a stage, handlers that don't
+# exist in the running Blender version are skipped
+HANDLER_STAGES = [
+    ('render', 'render_pre', 'render_post'),
+    ('composite', 'composite_pre', 'composite_post')
+]
+
+# Render handlers recorded as instant events
+HANDLER_EVENTS = ['render_init', 'render_write', 'render_complete', 'render_cancel']
+
+SUMMARY_COLUMNS = ['stage', 'category', 'count', 'total_seconds', 'mean_seconds', 'max_seconds',
+                   'peak_rss_mb', 'bytes_written']
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [('cb', ctypes.c_uint32), ('PageFaultCount', ctypes.c_uint32)] + [
+        (name, ctypes.c_size_t) for name in (
+            'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+            'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+
+class IO_COUNTERS(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_uint64) for name in (
+        'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+        'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+
+def peak_rss(children=False):
+    """Returns the peak resident set size in bytes.
+    Args:
+      children: Measure the finished child processes instead of Blender.
+    Returns:
+      The peak size, or None if the platform doesn't report it.
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # Linux reports kilobytes, macOS bytes
+        return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+    if os.name == 'nt' and not children:
+        return process_peak_rss(ctypes.windll.kernel32.GetCurrentProcess())
+    return None
+
+
+def process_peak_rss(handle):
+    """Returns the peak working set of a Windows process in bytes.
+    Args:
+      handle: A handle of the process, it can have exited already.
+    Returns:
+      The peak size, or None if it can't be read.
+    """
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    if ctypes.windll.kernel32.K32GetProcessMemoryInfo(ctypes.c_void_p(handle), ctypes.byref(counters), counters.cb):
+        return counters.PeakWorkingSetSize
+    return None
+
+
+def bytes_written():
+    """Returns the number of bytes Blender has written so far, or None if unknown"""
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/io', 'r') as io_file:
+                for line in io_file:
+                    if line.startswith('wchar:'):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+
+    if os.name == 'nt':
+        counters = IO_COUNTERS()
+        kernel32 = ctypes.windll.kernel32
+        if kernel32.GetProcessIoCounters(kernel32.GetCurrentProcess(), ctypes.byref(counters)):
+            return counters.WriteTransferCount
+    return None
+
+
+def directory_size(path):
+    # Size of the files directly inside a directory, e.g. the pipeline output
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    except OSError:
+        return None
+
+
+def run_metadata(scene):
+    """Describes the environment of a run, stored in the trace and the summary"""
+    return {
+        'blender_version': bpy.app.version_string,
+        'render_engine': scene.render.engine,
+        'platform': sys.platform
+    }
+
+
+class Tracer:
+    """Records the stages of a capture or processing run as Chrome trace events.
+    Every stage is stored with its wall time, the peak RSS of Blender at its
+    end and the bytes Blender wrote during it. A disabled tracer records nothing.
+    """
+
+    def __init__(self, name, metadata, enabled=True):
+        self.name = name
+        self.metadata = metadata
+        self.enabled = enabled
+        self.events = []
+        self.open_stages = {}
+        self.handlers = []
+        self.pid = os.getpid()
+        self.start_time = time.perf_counter()
+
+    def timestamp(self):
+        # Chrome traces are in microseconds
+        return (time.perf_counter() - self.start_time) * 1e6
+
+    @contextlib.contextmanager
+    def stage(self, name, category='stage', **args):
+        """Context manager that records the enclosed code as a stage"""
+        if not self.enabled:
+            yield
+            return
+
+        start = (self.timestamp(), bytes_written())
+        try:
+            yield
+        finally:
+            self.add_stage(name, category, start, args)
+
+    def begin(self, name, category='stage', **args):
+        """Starts a stage that is ended by a later call to end"""
+        if self.enabled:
+            self.open_stages[(category, name)] = ((self.timestamp(), bytes_written()), args)
+
+    def end(self, name, category='stage', **args):
+        if (category, name) not in self.open_stages:
+            return
+        start, begin_args = self.open_stages.pop((category, name))
+        self.add_stage(name, category, start, dict(begin_args, **args))
+
+    def end_all(self):
+        for category, name in list(self.open_stages):
+            self.end(name, category)
+
+    def instant(self, name, category='event'):
+        if self.enabled:
+            self.events.append({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': self.timestamp(),
+                                'pid': self.pid, 'tid': threading.get_ident()})
+
+    def add_stage(self, name, category, start, args):
+        start_time, start_bytes = start
+        end_bytes = bytes_written()
+
+        args = dict(args, peak_rss=peak_rss())
+        if start_bytes is not None and end_bytes is not None:
+            args['bytes_written'] = end_bytes - start_bytes
+
+        self.events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': start_time,
+                            'dur': self.timestamp() - start_time, 'pid': self.pid,
+                            'tid': threading.get_ident(), 'args': args})
+
+    def install_handlers(self):
+        """Records renders and compositing through the render handlers"""
+        if not self.enabled:
+            return
+
+        for name, pre, post in HANDLER_STAGES:
+            self.add_handler(pre, lambda *args, name=name: self.begin(name, 'handler'))
+            self.add_handler(post, lambda *args, name=name: self.end(name, 'handler'))
+        for name in HANDLER_EVENTS:
+            self.add_handler(name, lambda *args, name=name: self.instant(name, 'handler'))
+
+    def add_handler(self, handler_name, function):
+        handlers = getattr(bpy.app.handlers, handler_name, None)
+        if handlers is not None:
+            handlers.append(function)
+            self.handlers.append((handlers, function))
+
+    def remove_handlers(self):
+        for handlers, function in self.handlers:
+            if function in handlers:
+                handlers.remove(function)
+        self.handlers = []
+
+    def summary(self):
+        """Aggregates the stages by name.
+        Returns:
+          A list of dicts with the SUMMARY_COLUMNS of every stage.
+        """
+        rows = {}
+        for event in self.events:
+            if event['ph'] != 'X':
+                continue
+
+            row = rows.setdefault((event['cat'], event['name']), {
+                'stage': event['name'], 'category': event['cat'], 'count': 0, 'total_seconds': 0.0,
+                'max_seconds': 0.0, 'peak_rss_mb': None, 'bytes_written': None})
+
+            seconds = event['dur'] / 1e6
+            row['count'] += 1
+            row['total_seconds'] += seconds
+            row['max_seconds'] = max(row['max_seconds'], seconds)
+
+            if event['args'].get('peak_rss') is not None:
+                row['peak_rss_mb'] = max(row['peak_rss_mb'] or 0.0, event['args']['peak_rss'] / 2 ** 20)
+            if event['args'].get('bytes_written') is not None:
+                row['bytes_written'] = (row['bytes_written'] or 0) + event['args']['bytes_written']
+
+        for row in rows.values():
+            row['mean_seconds'] = row['total_seconds'] / row['count']
+        return list(rows.values())
+
+    def write(self, directory):
+        """Writes the Chrome trace and the CSV summary to a directory.
+        Open stages are ended and the render handlers are removed first.
+        Returns:
+          The path of the trace file, or None if the tracer is disabled.
+        """
+        self.remove_handlers()
+        if not self.enabled:
+            return None
+        self.end_all()
+
+        trace_path = os.path.join(directory, TRACE_FILE_PATTERN % self.name)
+        with open(trace_path, 'w') as trace_file:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': self.metadata},
+                      trace_file)
+
+        # The run metadata is repeated on every row, so summaries of several
+        # runs can be concatenated and compared
+        with open(os.path.join(directory, SUMMARY_FILE_PATTERN % self.name), 'w', newline='') as summary_file:
+            writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_COLUMNS + list(self.metadata))
+            writer.writeheader()
+            for row in self.summary():
+                writer.writerow(dict(row, **self.metadata))
+
+        print(f"Wrote trace to {trace_path}")
+        return trace_path